@@ -0,0 +1,74 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Measure how long it takes to start evmapy for client-only commands,
+i.e. to import the modules needed by the console script.
+
+Usage: python benchmarks/import_time.py [RUNS]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure(statement, runs):
+    """
+    Run the given statement in a fresh interpreter the given number of
+    times and return the wall clock time of each run.
+
+    :param statement: Python statement to run
+    :type statement: str
+    :param runs: number of times to run the statement
+    :type runs: int
+    :returns: list of run times, in seconds
+    :rtype: list
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call([sys.executable, '-c', statement], cwd=root)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    """
+    Print median startup times of the interpreter alone, the console
+    script and the daemon.
+
+    :returns: None
+    """
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    statements = [
+        ('interpreter', 'pass'),
+        ('client', 'import evmapy.__main__'),
+        ('daemon', 'import evmapy.__main__, evmapy.multiplexer'),
+    ]
+    for (label, statement) in statements:
+        median = statistics.median(measure(statement, runs))
+        print("%-12s %7.1f ms" % (label, median * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -23,16 +23,16 @@ Functions used by the console script
 
 import argparse
 import logging
-import logging.handlers
 import os
 import sys
 
-import evdev
-
 import evmapy.controller
-import evmapy.multiplexer
 import evmapy.util
 
+# Modules which (directly or indirectly) import evdev, whose tables take
+# a long time to load, are only imported when they are really needed, so
+# that commands which just talk to the control socket start quickly
+
 
 def initialize_logging(appname, debug):
     """
@@ -54,9 +54,10 @@ def initialize_logging(appname, debug):
             stdout.setFormatter(formatter)
         logger.addHandler(stdout)
     else:
-        syslog = logging.handlers.SysLogHandler(
+        from logging import handlers
+        syslog = handlers.SysLogHandler(
             address='/dev/log',
-            facility=logging.handlers.SysLogHandler.LOG_DAEMON,
+            facility=handlers.SysLogHandler.LOG_DAEMON,
         )
         name = '%s[%d]' % (appname, os.getpid())
         formatter = logging.Formatter(name + ': %(message)s')
@@ -89,11 +90,19 @@ def main(argv=sys.argv[1:]):
                        help="load DEVICE configuration from FILE")
     group.add_argument("-D", "--debug", action='store_true',
                        help="run in debug mode")
+    parser.add_argument("-t", "--threaded", action='store_true',
+                        help="read each device in a separate thread")
+    parser.add_argument("-p", "--processes", metavar="N", type=int, default=1,
+                        help="distribute devices among N worker processes")
+    parser.add_argument("-H", "--handover", action='store_true',
+                        help="take over devices from a running instance")
     args = parser.parse_args(argv)
+    if args.handover and args.processes > 1:
+        exit("--handover cannot be used with worker processes")
     if args.list_all:
-        for dev_path in evdev.list_devices():
-            device = evdev.InputDevice(dev_path)
-            print("%s: %s" % (device.fn, device.name))
+        from evmapy import sysfs
+        for device in sysfs.list_devices():
+            print("%(path)s: %(name)s" % device)
     elif args.list:
         devices = evmapy.controller.perform_request({
             'command':  'list',
@@ -102,9 +111,11 @@ def main(argv=sys.argv[1:]):
         for device in devices:
             print("%(path)s: %(name)s" % device)
     elif args.generate:
-        exit(evmapy.config.create(args.generate))
+        from evmapy import config
+        exit(config.create(args.generate))
     elif args.generate_minimal:
-        exit(evmapy.config.create(args.generate_minimal, with_actions=False))
+        from evmapy import config
+        exit(config.create(args.generate_minimal, with_actions=False))
     elif args.configure:
         try:
             (dev_path, config_file) = args.configure.split(':')
@@ -122,7 +133,11 @@ def main(argv=sys.argv[1:]):
         logger.info("%s %s initializing", info['name'], info['version'])
         logger.info("running as user %s", info['user'].pw_name)
         logger.info("using configuration directory %s", info['config_dir'])
-        evmapy.multiplexer.Multiplexer().run()
+        from evmapy import multiplexer
+        multiplexer.Multiplexer(
+            threaded=args.threaded, processes=args.processes,
+            handover=args.handover
+        ).run()
 
 
 if __name__ == "__main__":  # pragma: no cover
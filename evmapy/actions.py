@@ -0,0 +1,547 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Functions compiling configured actions into dispatch tables
+"""
+
+import itertools
+import os
+import shlex
+
+import evmapy.curve
+import evmapy.ecodes
+import evmapy.util
+
+
+ACTION_DEFAULTS = {
+    'hold':     0.0,
+    'mode':     'all',
+    'repeat':   0.0,
+}
+
+AXIS_ACTION_DEFAULTS = {
+    'curve':        'linear',
+    'deadzone':     0.0,
+    'exponent':     2.0,
+    'invert':       False,
+    'saturation':   1.0,
+}
+# Default output value for full deflection of the input axis: a movement
+# distance per event for axis actions, a speed (in units per second) for
+# mouse actions
+AXIS_ACTION_SCALE = 10
+MOUSE_ACTION_SCALE = 1000
+
+# Output axes which can be targeted by actions; absolute ones are
+# reported in the range [-OUTPUT_ABS_MAX, OUTPUT_ABS_MAX]
+OUTPUT_ABS_LAST = 'ABS_HAT3Y'
+OUTPUT_REL_LAST = 'REL_MISC'
+OUTPUT_ABS_MAX = 32767
+# Buttons declared along with output axes, as udev only classifies input
+# devices reporting relative axes as mice if they have a left button and
+# ones reporting absolute axes as joysticks if they have a gamepad button
+OUTPUT_AXIS_BUTTONS = {
+    'EV_ABS':   'BTN_GAMEPAD',
+    'EV_REL':   'BTN_LEFT',
+}
+
+_ACTION_IDS = itertools.count()
+
+
+class ActionError(Exception):
+    """
+    Exception raised when an invalid action is found in the
+    configuration.
+    """
+    pass
+
+
+def get_capabilities(actions):
+    """
+    Return the types and codes of the output events which the given
+    actions may cause to be injected.
+
+    :param actions: actions to process
+    :type actions: iterable
+    :returns: dictionary mapping output event types to sets of event
+        codes
+    :rtype: dict
+    """
+    ev_key = evmapy.ecodes.ECODES['EV_KEY']
+    capabilities = {}
+    for action in actions:
+        if action['type'] == 'key':
+            events = [(ev_key, evmapy.ecodes.ECODES[key])
+                      for key in evmapy.util.as_list(action['target'])]
+        elif action['type'] == 'macro':
+            events = [(ev_key, code) for (_, code, _) in action['steps']]
+        elif action['type'] in ('axis', 'mouse'):
+            button = OUTPUT_AXIS_BUTTONS[
+                'EV_REL' if action['target'].startswith('REL_') else 'EV_ABS'
+            ]
+            events = [
+                (action['target_type'], action['target_code']),
+                (ev_key, evmapy.ecodes.ECODES[button]),
+            ]
+        else:
+            continue
+        for (etype, code) in events:
+            capabilities.setdefault(etype, set()).add(code)
+    return capabilities
+
+
+def get_event_type(event):
+    """
+    Return the type of the input events emitted for the given event.
+
+    :param event: processed event to get the input event type of
+    :type event: dict
+    :returns: input event type
+    :rtype: int
+    """
+    if 'threshold' in event:
+        return evmapy.ecodes.ECODES['EV_REL']
+    elif 'min' in event:
+        return evmapy.ecodes.ECODES['EV_ABS']
+    return evmapy.ecodes.ECODES['EV_KEY']
+
+
+def get_event_key(event):
+    """
+    Return the key under which the given event is stored in event and
+    dispatch tables. Codes of different input event types overlap (e.g.
+    *KEY_ESC* and *REL_Y* are both 1), so the type is part of the key.
+
+    :param event: processed event to get the key of
+    :type event: dict
+    :returns: *(type, code)* tuple
+    :rtype: tuple
+    """
+    return (get_event_type(event), event['code'])
+
+
+def compile_actions(actions, events):
+    """
+    Compile the given list of actions into a dispatch table.
+
+    :param actions: list of actions to compile
+    :type actions: list
+    :param events: list of all events defined in the configuration
+    :type events: list
+    :returns: dispatch table, i.e. a dictionary containing a *map*
+        dictionary (mapping *(type, code)* tuples of input events to
+        lists of actions they trigger), an *analog* dictionary (mapping
+        *(type, code)* tuples of input events to lists of *(action, lut,
+        minimum)* tuples), an *actions* list (of
+        all compiled actions) and an *ids* set (of their identifiers)
+    :rtype: dict
+    :raises evmapy.actions.ActionError: when an error is detected
+    """
+    table = {
+        'analog':   {get_event_key(event): [] for event in events},
+        'map':      {get_event_key(event): [] for event in events},
+    }
+    for action in actions:
+        init_action(action)
+        if action['type'] in ('axis', 'mouse'):
+            parse_axis_action(action, events, table['analog'])
+            continue
+        parse_triggered_action(action)
+        for trigger in action['trigger']:
+            try:
+                # Axis event
+                (event_name, suffix) = trigger.split(':', 1)
+            except ValueError:
+                # Button event
+                event_name = trigger
+                suffix = None
+            try:
+                event = next(e for e in events if e['name'] == event_name)
+            except StopIteration:
+                raise ActionError("unknown event '%s'" % event_name)
+            if suffix and suffix not in event.get('zone_names', ()):
+                raise ActionError("invalid event suffix '%s'" % suffix)
+            key = get_event_key(event)
+            if action not in table['map'][key]:
+                table['map'][key].append(action)
+    index_table(table)
+    return table
+
+
+def compile_layer(base, layer):
+    """
+    Combine the dispatch table of the base layer with the dispatch
+    table of another layer. Input events which trigger any action in
+    the latter no longer trigger actions in the former, except for
+    layer switching actions, so that momentary layers can always be
+    deactivated. Actions of the base layer which are triggered by any
+    such event are not considered to be part of the combined table, as
+    they can no longer be stopped.
+
+    :param base: dispatch table of the base layer
+    :type base: dict
+    :param layer: dispatch table of the other layer
+    :type layer: dict
+    :returns: combined dispatch table
+    :rtype: dict
+    """
+    table = {
+        'analog':   {},
+        'map':      {},
+    }
+    shadowed = set()
+    for key in base['map']:
+        if layer['map'][key] or layer['analog'][key]:
+            shadowed.update(
+                action['id'] for action in base['map'][key]
+                if action['type'] != 'layer'
+            )
+            shadowed.update(
+                action['id'] for (action, _, _) in base['analog'][key]
+            )
+            switches = [
+                action for action in base['map'][key]
+                if action['type'] == 'layer'
+            ]
+            table['map'][key] = layer['map'][key] + switches
+            table['analog'][key] = layer['analog'][key]
+        else:
+            table['map'][key] = base['map'][key]
+            table['analog'][key] = base['analog'][key]
+    index_table(table)
+    table['ids'] -= shadowed
+    return table
+
+
+def index_table(table):
+    """
+    Store a list of all actions found in the given dispatch table and a
+    set of their identifiers in that table.
+
+    :param table: dispatch table to index
+    :type table: dict
+    :returns: None
+    """
+    table['actions'] = []
+    table['ids'] = set()
+    found = [action for actions in table['map'].values()
+             for action in actions]
+    found.extend(action for entries in table['analog'].values()
+                 for (action, _, _) in entries)
+    for action in found:
+        if action['id'] not in table['ids']:
+            table['ids'].add(action['id'])
+            table['actions'].append(action)
+
+
+def init_action(action):
+    """
+    Set default values of optional action parameters and assign the
+    given action a unique identifier.
+
+    :param action: action to process
+    :type action: dict
+    :returns: None
+    """
+    for (parameter, default) in ACTION_DEFAULTS.items():
+        if parameter not in action:
+            action[parameter] = default
+    # Every action needs a unique identifier in order for the event
+    # multiplexer to be able to keep track of its timers; note that we
+    # can't directly compare the dictionaries as there may be identical
+    # actions configured for two different events and worker processes
+    # pass copies of actions; the process ID prevents clashes between
+    # actions parsed by different processes
+    action['id'] = (os.getpid(), next(_ACTION_IDS))
+    if 'repeat_delay' not in action:
+        action['repeat_delay'] = action['repeat']
+
+
+def parse_triggered_action(action):
+    """
+    Validate an action performed in response to its trigger(s) becoming
+    active and prepare it for tracking the state of its trigger(s).
+
+    :param action: action to process
+    :type action: dict
+    :returns: None
+    :raises evmapy.actions.ActionError: when an error is detected
+    """
+    action['trigger'] = evmapy.util.as_list(action['trigger'])
+    action['trigger_active'] = [False for trigger in action['trigger']]
+    action['sequence_cur'] = 1
+    action['sequence_done'] = False
+    if action['type'] == 'layer' and 'toggle' not in action:
+        action['toggle'] = False
+    if action['type'] in ('exec', 'pipe') and 'shell' not in action:
+        action['shell'] = False
+    validate_action(action)
+    if action['type'] == 'exec':
+        parse_exec(action)
+    elif action['type'] == 'pipe':
+        parse_pipe(action)
+    elif action['type'] == 'macro':
+        parse_macro(action)
+
+
+def parse_axis_action(action, events, analog):
+    """
+    Validate an action translating an input axis into an output axis or
+    pointer motion and compile its response curve into a lookup table.
+
+    :param action: action to process
+    :type action: dict
+    :param events: list of all events defined in the configuration
+    :type events: list
+    :param analog: dictionary mapping *(type, code)* tuples of input
+        events to lists of *(action, lut, minimum)* tuples, which the
+        processed action is added to
+    :type analog: dict
+    :returns: None
+    :raises evmapy.actions.ActionError: when an error is detected
+    """
+    for (parameter, default) in AXIS_ACTION_DEFAULTS.items():
+        if parameter not in action:
+            action[parameter] = default
+    if 'scale' not in action:
+        action['scale'] = (MOUSE_ACTION_SCALE if action['type'] == 'mouse'
+                           else AXIS_ACTION_SCALE)
+    validate_axis_action(action)
+    try:
+        event = next(e for e in events if e['name'] == action['trigger'])
+    except StopIteration:
+        raise ActionError("unknown event '%s'" % action['trigger'])
+    if 'min' not in event:
+        raise ActionError("'%s' is not an axis" % action['trigger'])
+    if event['min'] >= event['max']:
+        raise ActionError("invalid range for axis '%s'" % event['name'])
+    relative = action['target'].startswith('REL_')
+    action['target_type'] = evmapy.ecodes.ECODES['EV_REL' if relative
+                                                 else 'EV_ABS']
+    action['target_code'] = evmapy.ecodes.ECODES[action['target']]
+    # Pointer motion is integrated by the event multiplexer, so mouse
+    # actions only need to be reported when their velocity changes
+    action['relative'] = relative and action['type'] == 'axis'
+    action['value'] = 0
+    lut = evmapy.curve.build_lut(
+        event['min'], event['max'],
+        action['scale'] if relative else OUTPUT_ABS_MAX, action
+    )
+    analog[get_event_key(event)].append((action, lut, event['min']))
+
+
+def split_command(command):
+    """
+    Split the given command into an argument vector using shell-like
+    syntax (e.g. ``foo 'bar baz'`` becomes ``['foo', 'bar baz']``), so
+    that it can be run without spawning a shell.
+
+    :param command: command to split
+    :type command: str
+    :returns: argument vector
+    :rtype: list
+    :raises evmapy.actions.ActionError: when an error is detected
+    """
+    if not isinstance(command, str):
+        raise ActionError("invalid command '%s'" % command)
+    try:
+        argv = shlex.split(command)
+    except ValueError as exc:
+        raise ActionError("invalid command '%s': %s" % (command, exc))
+    if not argv:
+        raise ActionError("command cannot be empty")
+    return argv
+
+
+def parse_exec(action):
+    """
+    Compile the target of an exec action into a list of commands, each
+    of which is an argument vector. Commands of actions with *shell*
+    set to `True` are left intact to be interpreted by the shell.
+
+    :param action: exec action to process
+    :type action: dict
+    :returns: None
+    :raises evmapy.actions.ActionError: when an error is detected
+    """
+    commands = []
+    for command in evmapy.util.as_list(action['target']):
+        if action['shell'] and isinstance(command, str):
+            commands.append(command)
+        else:
+            commands.append(split_command(command))
+    action['commands'] = commands
+
+
+def parse_pipe(action):
+    """
+    Compile the command of a pipe action into the argument vector of
+    the helper program to start and its target into the data to write
+    to that program's standard input, one line per target item.
+
+    :param action: pipe action to process
+    :type action: dict
+    :returns: None
+    :raises evmapy.actions.ActionError: when an error is detected
+    """
+    if action['shell']:
+        action['argv'] = ['/bin/sh', '-c', action['command']]
+    else:
+        action['argv'] = split_command(action['command'])
+    lines = evmapy.util.as_list(action['target'])
+    for line in lines:
+        if not isinstance(line, str) or '\n' in line:
+            raise ActionError("invalid pipe line '%s'" % line)
+    action['data'] = ''.join(line + '\n' for line in lines).encode()
+
+
+def parse_macro(action):
+    """
+    Compile the target of a macro action into a list of steps, each of
+    which is a *(delay, code, value)* tuple specifying the number of
+    seconds to wait before the step and the key event to synthesize.
+    A macro target is a list of keys to press and release (e.g.
+    ``KEY_A``), keys to press (``+KEY_A``) or release (``-KEY_A``) and
+    numbers of seconds to wait between them.
+
+    :param action: macro action to process
+    :type action: dict
+    :returns: None
+    :raises evmapy.actions.ActionError: when an error is detected
+    """
+    steps = []
+    delay = 0.0
+    for step in evmapy.util.as_list(action['target']):
+        if type(step) in (float, int):
+            if step < 0:
+                raise ActionError("macro delay cannot be negative")
+            delay += step
+            continue
+        if not isinstance(step, str):
+            raise ActionError("invalid macro step '%s'" % step)
+        if step[:1] in ('+', '-'):
+            values = [int(step[0] == '+')]
+            key = step[1:]
+        else:
+            values = [1, 0]
+            key = step
+        if key not in evmapy.ecodes.ECODES:
+            raise ActionError("unknown key '%s'" % key)
+        for value in values:
+            steps.append((delay, evmapy.ecodes.ECODES[key], value))
+            delay = 0.0
+    if not steps:
+        raise ActionError("macro has to contain at least one key")
+    action['steps'] = steps
+
+
+def validate_action(action):
+    """
+    Perform some error checks on an action.
+
+    :param action: action to check
+    :type action: dict
+    :returns: None
+    :raises evmapy.actions.ActionError: when an error is detected
+    """
+    hold = action['hold']
+    trigger = action['trigger']
+    target = evmapy.util.as_list(action['target'])
+    if action['type'] not in ('axis', 'exec', 'key', 'layer', 'macro',
+                              'mouse', 'pipe'):
+        raise ActionError("invalid action type '%s'" % action['type'])
+    if (action['type'] == 'pipe') != ('command' in action):
+        raise ActionError("command has to be set for pipe actions only")
+    if action['mode'] not in ('all', 'any', 'sequence'):
+        raise ActionError("invalid action mode '%s'" % action['mode'])
+    if hold < 0:
+        raise ActionError("hold time cannot be negative")
+    if action['repeat'] < 0 or action['repeat_delay'] < 0:
+        raise ActionError("repeat interval cannot be negative")
+    if action['type'] == 'key':
+        for key in target:
+            if key not in evmapy.ecodes.ECODES:
+                raise ActionError("unknown key '%s'" % key)
+        if len(set(target)) != len(target):
+            raise ActionError("duplicate event(s) in action target")
+    if action['type'] == 'layer':
+        if not isinstance(action['target'], str):
+            raise ActionError("layer action target must be a single layer")
+        if hold > 0 or action['repeat'] > 0:
+            raise ActionError("layer actions cannot be delayed or repeated")
+    if action['mode'] == 'sequence':
+        if hold > 0:
+            raise ActionError("hold time cannot be positive for sequences")
+        if len(trigger) < 2:
+            raise ActionError("sequence must contain more than 1 event")
+    else:
+        if len(set(trigger)) != len(trigger):
+            raise ActionError("duplicate event(s) in action trigger")
+
+
+def validate_axis_action(action):
+    """
+    Perform some error checks on an action translating an input axis
+    into an output axis or pointer motion.
+
+    :param action: action to check
+    :type action: dict
+    :returns: None
+    :raises evmapy.actions.ActionError: when an error is detected
+    """
+    target = action['target']
+    if not isinstance(action['trigger'], str) or ':' in action['trigger']:
+        raise ActionError("axis action trigger must be a single axis")
+    if action['hold'] != 0:
+        raise ActionError("hold time cannot be set for axis actions")
+    if action['repeat'] != 0:
+        raise ActionError("repeat interval cannot be set for axis actions")
+    if not isinstance(target, str) or target not in evmapy.ecodes.ECODES:
+        raise ActionError("unknown axis '%s'" % target)
+    for (prefix, last) in (('ABS_', OUTPUT_ABS_LAST),
+                           ('REL_', OUTPUT_REL_LAST)):
+        if (target.startswith(prefix) and evmapy.ecodes.ECODES[target] <=
+                evmapy.ecodes.ECODES[last]):
+            break
+    else:
+        raise ActionError("unsupported output axis '%s'" % target)
+    if action['type'] == 'mouse' and not target.startswith('REL_'):
+        raise ActionError("mouse action target must be a relative axis")
+    if not 0 <= action['deadzone'] < action['saturation'] <= 1:
+        raise ActionError("invalid deadzone and saturation values")
+    if action['scale'] < 1:
+        raise ActionError("scale has to be positive")
+    if action['exponent'] <= 0:
+        raise ActionError("exponent has to be positive")
+    curve = action['curve']
+    if isinstance(curve, str):
+        if curve not in ('exponential', 'linear'):
+            raise ActionError("invalid curve '%s'" % curve)
+        return
+    previous = -1
+    for point in curve:
+        if (not isinstance(point, list) or len(point) != 2 or
+                not all(isinstance(c, (int, float)) for c in point) or
+                not 0 <= point[1] <= 1 or not previous < point[0] <= 1 or
+                point[0] < 0):
+            raise ActionError("invalid curve point %s" % point)
+        previous = point[0]
+    if not curve:
+        raise ActionError("curve must contain at least one point")
@@ -0,0 +1,134 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+
+"""
+:py:class:`ComboIndex` class implementation
+"""
+
+
+class ComboIndex(object):
+
+    """
+    Class keeping track of the state of all events which trigger
+    cross-device combos and evaluating those combos. Every such event is
+    assigned a single bit of an integer holding the global event state,
+    so that updating the state costs a single bitwise operation and
+    checking whether all (or any) triggers of a combo are active costs
+    a single mask comparison.
+
+    :param actions: list of actions processed by
+        :py:func:`evmapy.config.parse_combos()`
+    :type actions: list
+    """
+
+    def __init__(self, actions=()):
+        self._bits = {}
+        self._watchers = {}
+        self._state = 0
+        for action in actions:
+            action['active'] = False
+            action['mask'] = 0
+            action['sequence'] = []
+            action['sequence_cur'] = 0
+            for trigger in action['trigger']:
+                bit = self._bits.setdefault(trigger, len(self._bits))
+                action['mask'] |= 1 << bit
+                action['sequence'].append(bit)
+                watchers = self._watchers.setdefault(bit, [])
+                if action not in watchers:
+                    watchers.append(action)
+
+    def subscriptions(self, device_name):
+        """
+        Return the events emitted by the given input device whose state
+        changes should be reported to this index.
+
+        :param device_name: name of the input device
+        :type device_name: str
+        :returns: dictionary mapping normalized event names to *edge*
+            actions which should be reported along with the new state
+            of the event
+        :rtype: dict
+        """
+        subscriptions = {}
+        for (trigger, bit) in self._bits.items():
+            (trigger_device, _, event_name) = trigger.rpartition('/')
+            if trigger_device == device_name:
+                subscriptions[event_name] = {'type': 'edge', 'bit': bit}
+        return subscriptions
+
+    def update(self, bit, active):
+        """
+        Update the state of the event assigned the given bit and return
+        the actions to be performed as a result.
+
+        :param bit: bit assigned to the event
+        :type bit: int
+        :param active: whether the event is active or not
+        :type active: bool
+        :returns: list of *(action, start)* tuples
+        :rtype: list
+        """
+        if active:
+            self._state |= 1 << bit
+        else:
+            self._state &= ~(1 << bit)
+        pending = []
+        for action in self._watchers[bit]:
+            if action['mode'] == 'sequence':
+                pending.extend(self._advance(action, bit, active))
+                continue
+            matched = self._state & action['mask']
+            if action['mode'] == 'all':
+                matched = matched == action['mask']
+            if bool(matched) != action['active']:
+                action['active'] = bool(matched)
+                pending.append((action, action['active']))
+        return pending
+
+    @staticmethod
+    def _advance(action, bit, active):
+        """
+        Track the progress of a sequence combo.
+
+        :param action: sequence combo
+        :type action: dict
+        :param bit: bit assigned to the event whose state changed
+        :type bit: int
+        :param active: whether the event is active or not
+        :type active: bool
+        :returns: list of *(action, start)* tuples
+        :rtype: list
+        """
+        sequence = action['sequence']
+        if not active:
+            if action['active'] and bit == sequence[-1]:
+                action['active'] = False
+                return [(action, False)]
+            return []
+        if bit == sequence[action['sequence_cur']]:
+            action['sequence_cur'] += 1
+        else:
+            action['sequence_cur'] = int(bit == sequence[0])
+        if action['sequence_cur'] == len(sequence):
+            action['sequence_cur'] = 0
+            action['active'] = True
+            return [(action, True)]
+        return []
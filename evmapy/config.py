@@ -21,17 +21,44 @@
 Functions handling configuration generation, saving and loading
 """
 
+import bisect
 import copy
 import json
 import logging
 import os
 import re
 
-import evdev
-
+import evmapy.actions
+import evmapy.ecodes
 import evmapy.util
 
 
+TOP_LEVEL_DEFAULTS = {
+    # Maximum number of events processed per device in a single
+    # iteration of the event loop; this matches the number of events
+    # returned by a single read() call on an evdev device
+    'budget':       64,
+    # Number of seconds after a button event during which further events
+    # emitted by the same button are treated as switch bounce
+    'debounce':     0.0,
+    # Whether events which do not trigger any action are forwarded to a
+    # uinput device cloned from the (grabbed) input device
+    'passthrough':  False,
+    'priority':     0,
+}
+
+# Suffixes of the events emitted by relative axes for movement in the
+# negative and positive direction, respectively, and the default amount
+# of movement needed for emitting one such event
+RELATIVE_DIRECTIONS = ('-', '+')
+RELATIVE_THRESHOLD = 1
+
+# Name of the file defining actions triggered by events emitted by
+# several devices; sanitized device names never contain a dash, so it
+# cannot be mistaken for a device configuration file
+COMBOS_FILE = 'cross-device.json'
+
+
 class ConfigError(Exception):
 
     """
@@ -62,20 +89,33 @@ class ConfigError(Exception):
         return "%s: %s" % (self.path, self.error)
 
 
-def _get_device_config_path(device):
+def sanitize_name(name):
     """
-    Return the path to the default configuration file for the given
-    input device.
+    Transform the given input device name into a string which can be
+    safely used as a file name.
 
-    :param device: input device to get the default configuration file
-        path for
-    :type device: evdev.InputDevice
+    :param name: input device name to transform
+    :type name: str
+    :returns: sanitized input device name
+    :rtype: str
+    """
+    return re.sub(r'[^\w]', '.', name)
+
+
+def get_device_config_path(name):
+    """
+    Return the path to the default configuration file for the input
+    device with the given name.
+
+    :param name: name of the input device to get the default
+        configuration file path for
+    :type name: str
     :returns: path to the default configuration file for the given input
         device
     :rtype: str
     """
     info = evmapy.util.get_app_info()
-    config_filename = re.sub(r'[^\w]', '.', device.name) + '.json'
+    config_filename = sanitize_name(name) + '.json'
     return os.path.join(info['config_dir'], config_filename)
 
 
@@ -92,11 +132,13 @@ def create(dev_path, with_actions=True):
     :returns: nothing on success, error string otherwise
     :rtype: None or str
     """
+    # evdev takes long to import, so only do it when it is really needed
+    import evdev
     try:
         device = evdev.InputDevice(dev_path)
     except FileNotFoundError:
         return "No such device %s" % dev_path
-    config_path = _get_device_config_path(device)
+    config_path = get_device_config_path(device.name)
     if os.path.exists(config_path):
         return "%s already exists, not overwriting" % config_path
     config = generate(device)
@@ -131,7 +173,7 @@ def generate(device):
                 ('type', 'exec'),
                 ('target', 'echo %s' % event_name),
             ])
-            if event_type_id == evdev.ecodes.ecodes['EV_KEY']:
+            if event_type_id == evmapy.ecodes.ECODES['EV_KEY']:
                 config['buttons'].append(evmapy.util.ordered_dict([
                     ('name', event_name),
                     ('code', activator),
@@ -139,7 +181,16 @@ def generate(device):
                 action = action_base.copy()
                 action['trigger'] = event_name
                 config['actions'].append(action)
-            elif event_type_id == evdev.ecodes.ecodes['EV_ABS']:
+            elif event_type_id == evmapy.ecodes.ECODES['EV_REL']:
+                # Relative axes emit events continuously while moving,
+                # so no default actions (each of which would run a
+                # program for every unit of movement) are generated
+                relative_axes = config.setdefault('relative_axes', [])
+                relative_axes.append(evmapy.util.ordered_dict([
+                    ('name', event_name),
+                    ('code', activator),
+                ]))
+            elif event_type_id == evmapy.ecodes.ECODES['EV_ABS']:
                 config['axes'].append(evmapy.util.ordered_dict([
                     ('name', event_name),
                     ('code', event_names[1]),
@@ -199,12 +250,13 @@ def load(device, name, old_config=None):
         info = evmapy.util.get_app_info()
         path = os.path.join(info['config_dir'], os.path.basename(name))
     else:
-        path = _get_device_config_path(device)
+        path = get_device_config_path(device.name)
     try:
         config_input = read(path)
         if old_config:
-            for inheritable in ('axes', 'buttons'):
-                if inheritable not in config_input:
+            for inheritable in ('axes', 'buttons', 'relative_axes'):
+                if (inheritable not in config_input and
+                        inheritable in old_config):
                     config_input[inheritable] = old_config[inheritable]
         config = parse(config_input)
     except Exception as exc:
@@ -213,6 +265,25 @@ def load(device, name, old_config=None):
     return (config, config_input)
 
 
+def load_combos():
+    """
+    Load the actions triggered by events emitted by several devices.
+
+    :returns: list of processed actions
+    :rtype: list
+    :raises evmapy.config.ConfigError: if an error occurred while
+        loading the cross-device configuration file
+    """
+    info = evmapy.util.get_app_info()
+    path = os.path.join(info['config_dir'], COMBOS_FILE)
+    try:
+        actions = parse_combos(read(path))
+    except Exception as exc:
+        raise ConfigError(exc, path)
+    logging.getLogger().info("loaded %s", path)
+    return actions
+
+
 def read(path):
     """
     Read configuration file under the given path and return the
@@ -242,62 +313,186 @@ def parse(config_input):
     """
     config_input_copy = copy.deepcopy(config_input)
     validate_parameters(config_input_copy)
+    for (parameter, default) in TOP_LEVEL_DEFAULTS.items():
+        if parameter not in config_input_copy:
+            config_input_copy[parameter] = default
+    validate_top_level(config_input_copy)
     config = {
-        'events':   {},
-        'grab':     config_input_copy['grab'],
-        'map':      {},
-    }
-    defaults = {
-        'hold':     0.0,
-        'mode':     'all',
+        'budget':       config_input_copy['budget'],
+        'events':       {},
+        'grab':         config_input_copy['grab'],
+        'layer':        None,
+        'passthrough':  config_input_copy['passthrough'],
+        'priority':     config_input_copy['priority'],
+        'tables':       {},
     }
-    # Every action needs a unique identifier in order for the event
-    # multiplexer to be able to remove it from the list of delayed
-    # actions; note that we can't directly compare the dictionaries as
-    # there may be identical actions configured for two different events
-    current_id = 0
-    events = config_input_copy['axes'] + config_input_copy['buttons']
+    relative_axes = config_input_copy.get('relative_axes', [])
+    for event in relative_axes:
+        if 'threshold' not in event:
+            event['threshold'] = RELATIVE_THRESHOLD
+    events = (config_input_copy['axes'] + config_input_copy['buttons'] +
+              relative_axes)
     validate_events(events)
     for event in events:
-        try:
+        if 'threshold' in event:
+            # Relative axis event
+            idle = 0
+            event['accumulated'] = 0
+            event['zone_names'] = list(RELATIVE_DIRECTIONS)
+        elif 'min' in event:
             # Axis event
             idle = (event['min'] + event['max']) // 2
-        except KeyError:
+            parse_zones(event)
+            event['zone'] = bisect.bisect_left(event['thresholds'], idle)
+        else:
             # Button event
             idle = 0
+            debounce = event.get('debounce', config_input_copy['debounce'])
+            # Kernel timestamps are compared in microseconds
+            event['debounce'] = int(debounce * 1000000)
+            # End of the window during which changes are only recorded
+            # in 'raw' rather than reported
+            event['until'] = 0
+            event['raw'] = idle
         event['previous'] = idle
-        config['events'][event['code']] = event
-        config['map'][event['code']] = []
-    for action in config_input_copy['actions']:
-        for (parameter, default) in defaults.items():
-            if parameter not in action:
-                action[parameter] = default
-        action['trigger'] = evmapy.util.as_list(action['trigger'])
-        action['trigger_active'] = [False for trigger in action['trigger']]
-        action['sequence_cur'] = 1
-        action['sequence_done'] = False
-        validate_action(action)
-        for trigger in action['trigger']:
-            try:
-                # Axis event
-                (event_name, suffix) = trigger.split(':', 1)
-            except ValueError:
-                # Button event
-                event_name = trigger
-                suffix = None
-            try:
-                event = next(e for e in events if e['name'] == event_name)
-            except StopIteration:
-                raise ConfigError("unknown event '%s'" % event_name)
-            if suffix and suffix not in event:
-                raise ConfigError("invalid event suffix '%s'" % suffix)
-            if action not in config['map'][event['code']]:
-                config['map'][event['code']].append(action)
-        action['id'] = current_id
-        current_id += 1
+        config['events'][evmapy.actions.get_event_key(event)] = event
+    # All layers are compiled upfront, so that switching between them
+    # only requires swapping dispatch tables
+    base = compile_actions(config_input_copy['actions'], events)
+    config['tables'][None] = base
+    layers = config_input_copy.get('layers', {})
+    for (name, actions) in sorted(layers.items()):
+        if not isinstance(actions, list):
+            raise ConfigError("layer '%s' has to be a list of actions" % name)
+        validate_parameters({
+            'actions':  actions,
+            'axes':     [],
+            'buttons':  [],
+            'grab':     False,
+        })
+        config['tables'][name] = evmapy.actions.compile_layer(
+            base, compile_actions(actions, events)
+        )
+    for table in config['tables'].values():
+        for action in table['actions']:
+            if action['type'] == 'layer' and action['target'] not in layers:
+                raise ConfigError("unknown layer '%s'" % action['target'])
+        # Passthrough needs to tell mapped events apart from unmapped
+        # ones with a single lookup per event
+        table['mapped'] = {
+            key for key in table['map']
+            if table['map'][key] or table['analog'][key]
+        }
+    config['analog'] = base['analog']
+    config['map'] = base['map']
+    config['mapped'] = base['mapped']
+    config['capabilities'] = evmapy.actions.get_capabilities(
+        action for table in config['tables'].values()
+        for action in table['actions']
+    )
     return config
 
 
+def compile_actions(actions, events):
+    """
+    Compile the given list of actions into a dispatch table using
+    :py:func:`evmapy.actions.compile_actions()`.
+
+    :param actions: list of actions to compile
+    :type actions: list
+    :param events: list of all events defined in the configuration
+    :type events: list
+    :returns: dispatch table
+    :rtype: dict
+    :raises evmapy.config.ConfigError: when an invalid action is found
+    """
+    try:
+        return evmapy.actions.compile_actions(actions, events)
+    except evmapy.actions.ActionError as exc:
+        raise ConfigError(exc)
+
+
+def parse_combos(config_input):
+    """
+    Transform the given cross-device configuration dictionary into a
+    list of actions ready to use by the application. Each trigger of
+    these actions consists of an input device name and a name of an
+    event defined in the configuration of that device, separated by a
+    slash, e.g. *Foot Pedal/Left*.
+
+    :param config_input: configuration dictionary to process
+    :type config_input: dict
+    :returns: list of processed actions
+    :rtype: list
+    :raises evmapy.config.ConfigError: when an error is found while
+        processing the configuration
+    """
+    if not isinstance(config_input, dict) or list(config_input) != [
+            'actions']:
+        raise ConfigError("only 'actions' can be set for cross-device combos")
+    config_input_copy = copy.deepcopy(config_input)
+    validate_parameters(dict(
+        config_input_copy, axes=[], buttons=[], grab=False
+    ))
+    actions = config_input_copy['actions']
+    for action in actions:
+        evmapy.actions.init_action(action)
+        if action['type'] in ('axis', 'layer', 'mouse'):
+            raise ConfigError(
+                "%s actions cannot be cross-device combos" % action['type']
+            )
+        try:
+            evmapy.actions.parse_triggered_action(action)
+        except evmapy.actions.ActionError as exc:
+            raise ConfigError(exc)
+        for trigger in action['trigger']:
+            (device_name, _, event_name) = trigger.rpartition('/')
+            if not device_name or not event_name:
+                raise ConfigError(
+                    "invalid cross-device trigger '%s'" % trigger
+                )
+    return actions
+
+
+def parse_zones(event):
+    """
+    Compile the zones of an axis event into a sorted list of thresholds
+    which enables the zone containing any axis value to be found using
+    :py:func:`bisect.bisect_left()`: a value belongs to the *i*-th region
+    if it is greater than the *(i-1)*-th threshold and not greater than
+    the *i*-th one. Parts of the axis range which do not belong to any
+    configured zone are covered by unnamed regions. Axes without any
+    zones configured get two implicit ones, *min* and *max*, which cover
+    all values up to the minimum and from the maximum of the axis range,
+    respectively.
+
+    :param event: axis event to process
+    :type event: dict
+    :returns: None
+    :raises evmapy.config.ConfigError: when an error is detected
+    """
+    if 'hysteresis' not in event:
+        event['hysteresis'] = 0
+    if 'zones' not in event:
+        event['thresholds'] = [
+            event['min'], max(event['min'], event['max'] - 1)
+        ]
+        event['zone_names'] = ['min', None, 'max']
+    else:
+        validate_zones(event)
+        event['thresholds'] = []
+        event['zone_names'] = []
+        upper = None
+        for zone in event['zones']:
+            if upper is None or zone['min'] > upper + 1:
+                event['thresholds'].append(zone['min'] - 1)
+                event['zone_names'].append(None)
+            event['thresholds'].append(zone['max'])
+            event['zone_names'].append(zone['name'])
+            upper = zone['max']
+        event['zone_names'].append(None)
+
+
 def validate_parameters(config):
     """
     Perform some checks on the keys and types of values found in the
@@ -313,6 +508,7 @@ def validate_parameters(config):
         ('actions', 'action'),
         ('axes', 'axis'),
         ('buttons', 'button'),
+        ('relative_axes', 'relative axis'),
     ])
     required = {
         'top': [
@@ -336,21 +532,52 @@ def validate_parameters(config):
             ('code', int),
             ('name', str),
         ],
+        'relative_axes': [
+            ('code', int),
+            ('name', str),
+        ],
     }
     optional = {
-        'top':      [],
+        'top':      [
+            ('budget', int),
+            ('debounce', [float, int]),
+            ('layers', dict),
+            ('match', dict),
+            ('passthrough', bool),
+            ('priority', int),
+            ('relative_axes', list),
+        ],
         'actions':  [
+            ('command', str),
+            ('curve', [str, list]),
+            ('deadzone', [float, int]),
+            ('exponent', [float, int]),
             ('hold', [float, int]),
+            ('invert', bool),
             ('mode', str),
+            ('repeat', [float, int]),
+            ('repeat_delay', [float, int]),
+            ('saturation', [float, int]),
+            ('scale', int),
+            ('shell', bool),
+            ('toggle', bool),
+        ],
+        'axes':     [
+            ('hysteresis', int),
+            ('zones', list),
+        ],
+        'buttons':  [
+            ('debounce', [float, int]),
+        ],
+        'relative_axes': [
+            ('threshold', int),
         ],
-        'axes':     [],
-        'buttons':  [],
     }
     config_copy = config.copy()
     config_copy['top'] = [config]
     for (key, level) in level_names.items():
         valid = dict(required[key] + optional[key])
-        for obj in config_copy[key]:
+        for obj in config_copy.get(key, []):
             for (param, _) in required[key]:
                 if param not in obj:
                     raise ConfigError(
@@ -371,58 +598,105 @@ def validate_parameters(config):
                     )
 
 
+def validate_top_level(config):
+    """
+    Perform some error checks on top-level configuration parameters.
+
+    :param config: configuration dictionary read from configuration file
+    :type config: dict
+    :returns: None
+    :raises evmapy.config.ConfigError: when an error is detected
+    """
+    if config['budget'] < 1:
+        raise ConfigError("event budget has to be positive")
+    if config['debounce'] < 0:
+        raise ConfigError("debounce time cannot be negative")
+    if config['passthrough'] and not config['grab']:
+        raise ConfigError("passthrough requires the device to be grabbed")
+    validate_match(config.get('match', {}))
+
+
+def validate_match(match):
+    """
+    Perform some error checks on the device matching criteria.
+
+    :param match: device matching criteria
+    :type match: dict
+    :returns: None
+    :raises evmapy.config.ConfigError: when an error is detected
+    """
+    for (key, value) in match.items():
+        if key not in ('id', 'phys', 'uniq'):
+            raise ConfigError("unknown match parameter '%s'" % key)
+        if not isinstance(value, str):
+            raise ConfigError("'%s' has to be of type str" % key)
+        if key == 'id' and not re.match(
+                r'^[0-9a-fA-F]{4}:[0-9a-fA-F]{4}(:[0-9a-fA-F]{4})?$', value):
+            raise ConfigError("invalid device id '%s'" % value)
+
+
 def validate_events(events):
     """
-    Check a list of events for duplicates.
+    Check a list of events for duplicate names, duplicate codes of the
+    same event type, negative debounce times and non-positive relative
+    axis thresholds.
 
     :param events: list of events to check
     :type events: list
     :returns: None
-    :raises evmapy.config.ConfigError: when a duplicate event is found
+    :raises evmapy.config.ConfigError: when an error is detected
     """
-    unique = {
-        'name': [],
-        'code': [],
-    }
+    names = []
+    keys = []
     for event in events:
-        for key in unique:
-            if event[key] in unique[key]:
-                raise ConfigError(
-                    "duplicate event %s '%s'" % (key, event[key])
-                )
-            else:
-                unique[key].append(event[key])
-
-
-def validate_action(action):
+        if event['name'] in names:
+            raise ConfigError("duplicate event name '%s'" % event['name'])
+        names.append(event['name'])
+        if evmapy.actions.get_event_key(event) in keys:
+            raise ConfigError("duplicate event code '%s'" % event['code'])
+        keys.append(evmapy.actions.get_event_key(event))
+        if event.get('debounce', 0) < 0:
+            raise ConfigError("debounce time cannot be negative")
+        if event.get('threshold', 1) < 1:
+            raise ConfigError("relative axis threshold has to be positive")
+
+
+def validate_zones(event):
     """
-    Perform some error checks on an action.
+    Perform some error checks on the zones of an axis event.
 
-    :param action: action to check
-    :type action: dict
+    :param event: axis event to check
+    :type event: dict
     :returns: None
     :raises evmapy.config.ConfigError: when an error is detected
     """
-    hold = action['hold']
-    trigger = action['trigger']
-    target = evmapy.util.as_list(action['target'])
-    if action['type'] not in ('exec', 'key'):
-        raise ConfigError("invalid action type '%s'" % action['type'])
-    if action['mode'] not in ('all', 'any', 'sequence'):
-        raise ConfigError("invalid action mode '%s'" % action['mode'])
-    if hold < 0:
-        raise ConfigError("hold time cannot be negative")
-    if action['type'] == 'key':
-        for key in target:
-            if key not in evdev.ecodes.ecodes:
-                raise ConfigError("unknown key '%s'" % key)
-        if len(set(target)) != len(target):
-            raise ConfigError("duplicate event(s) in action target")
-    if action['mode'] == 'sequence':
-        if hold > 0:
-            raise ConfigError("hold time cannot be positive for sequences")
-        if len(trigger) < 2:
-            raise ConfigError("sequence must contain more than 1 event")
-    else:
-        if len(set(trigger)) != len(trigger):
-            raise ConfigError("duplicate event(s) in action trigger")
+    if event['hysteresis'] < 0:
+        raise ConfigError("hysteresis has to be non-negative")
+    if not event['zones']:
+        raise ConfigError("no zones defined for axis '%s'" % event['name'])
+    names = []
+    upper = None
+    for zone in event['zones']:
+        try:
+            valid = (
+                sorted(zone) == ['max', 'min', 'name'] and
+                isinstance(zone['name'], str) and
+                type(zone['min']) is int and
+                type(zone['max']) is int
+            )
+        except TypeError:
+            valid = False
+        if not valid:
+            raise ConfigError(
+                "zones have to be objects with 'name', 'min' and 'max'"
+            )
+        if zone['name'] in names:
+            raise ConfigError("duplicate zone name '%s'" % zone['name'])
+        names.append(zone['name'])
+        if zone['min'] > zone['max']:
+            raise ConfigError("invalid range for zone '%s'" % zone['name'])
+        if upper is not None and zone['min'] <= upper:
+            raise ConfigError(
+                "zones have to be sorted and must not overlap"
+            )
+        upper = zone['max']
@@ -46,8 +46,7 @@ def _get_control_socket_path():
     :returns: path to the control socket
     :rtype: str
     """
-    info = evmapy.util.get_app_info()
-    return os.path.join(info['config_dir'], '%s.socket' % info['name'])
+    return evmapy.util.get_app_info()['control_socket']
 
 
 def send_request(request):
@@ -115,11 +114,17 @@ class Controller(object):
 
     :param target: multiplexer to control
     :type target: evmapy.multiplexer.Multiplexer
+    :param control_fd: file descriptor of an already bound control
+        socket, passed by another instance
+    :type control_fd: int
     """
 
-    def __init__(self, target):
+    def __init__(self, target, control_fd=None):
         self._logger = logging.getLogger()
         self._target = target
+        if control_fd is not None:
+            self._socket = socket.socket(fileno=control_fd)
+            return
         try:
             control_socket_path = _get_control_socket_path()
             os.mkdir(os.path.dirname(control_socket_path))
@@ -199,14 +204,19 @@ class Controller(object):
                 TypeError):
             pass
 
-    def cleanup(self):
+    def cleanup(self, unlink=True):
         """
         Close the control socket and remove it from the filesystem.
 
+        :param unlink: whether to remove the control socket from the
+            filesystem (it should be kept if it was handed over to
+            another instance)
+        :type unlink: bool
         :returns: None
         """
         self._socket.close()
-        os.remove(_get_control_socket_path())
+        if unlink:
+            os.remove(_get_control_socket_path())
 
     def do_config(self, request):
         """
@@ -224,6 +234,18 @@ class Controller(object):
         self._target.load_device_config(request['device'], config_file)
         return None
 
+    def do_handover(self, request):
+        """
+        Hand all input devices, the uinput device, the control socket and
+        runtime state over to the instance listening on the given socket.
+
+        :param request: request issued by peer
+        :type request: dict
+        :returns: None
+        """
+        self._target.hand_over(request['socket'])
+        return None
+
     def do_list(self, _):
         """
         Return the list of currently handled devices.
@@ -0,0 +1,188 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+:py:class:`Coprocess` class implementation
+"""
+
+import os
+import select
+
+
+class CoprocessExitedException(Exception):
+    """
+    Exception raised when the program run by a :py:class:`Coprocess`
+    stops reading its standard input.
+    """
+    pass
+
+
+class Coprocess(object):
+
+    """
+    Class representing a long-running helper program whose standard
+    input is fed with data written by pipe actions. Data is buffered
+    and written without blocking; the part which does not fit into the
+    pipe is written once the given poll object reports the pipe as
+    writable again. While the program is running, the pipe is registered
+    with the poll object, which also reports the program exiting.
+
+    :param argv: argument vector of the program to run
+    :type argv: list
+    :param poll: poll object to register the pipe with
+    :type poll: select.poll
+    """
+
+    def __init__(self, argv, poll):
+        self.argv = argv
+        self._poll = poll
+        self.pid = None
+        self._write_fd = None
+        self._buffer = bytearray()
+
+    @property
+    def running(self):
+        """
+        Return whether the program has been started and is still
+        reading its standard input.
+
+        :returns: whether the program is running
+        :rtype: bool
+        """
+        return self._write_fd is not None
+
+    def fileno(self):
+        """
+        Return the file descriptor of the writing end of the pipe
+        connected to the program's standard input. This enables a
+        :py:class:`Coprocess` instance to be used directly with
+        :py:meth:`select.poll.poll()`.
+
+        :returns: file descriptor of the writing end of the pipe
+        :rtype: int
+        """
+        return self._write_fd
+
+    def start(self):
+        """
+        Start the program with its standard input connected to a pipe.
+
+        :returns: None
+        :raises OSError: when the program cannot be started
+        """
+        if self.pid is not None:
+            # The previous instance may not have exited yet when it was
+            # stopped
+            self._reap()
+        (read_fd, write_fd) = os.pipe()
+        try:
+            self.pid = os.posix_spawnp(
+                self.argv[0], self.argv, os.environ,
+                file_actions=[(os.POSIX_SPAWN_DUP2, read_fd, 0)]
+            )
+        except OSError:
+            os.close(write_fd)
+            raise
+        finally:
+            os.close(read_fd)
+        os.set_blocking(write_fd, False)
+        self._write_fd = write_fd
+        self._buffer = bytearray()
+        self._poll.register(self, 0)
+
+    def write(self, data):
+        """
+        Queue the given data for writing to the program's standard input
+        and write as much of the queue as possible without blocking.
+
+        :param data: data to write
+        :type data: bytes
+        :returns: None
+        :raises CoprocessExitedException: when the program is no longer
+            reading its standard input
+        """
+        self._buffer.extend(data)
+        self._flush()
+
+    def process(self):
+        """
+        Write queued data to the program's standard input once the pipe
+        becomes writable.
+
+        :returns: an empty list (to signal that no actions should be
+            performed)
+        :rtype: list
+        :raises CoprocessExitedException: when the program is no longer
+            reading its standard input
+        """
+        if not self._buffer:
+            # Nothing was waited for, so poll() only reported the pipe
+            # because its reading end got closed
+            raise CoprocessExitedException()
+        self._flush()
+        return []
+
+    def _flush(self):
+        """
+        Write as much queued data as possible without blocking and only
+        wait for the pipe to become writable if some data is left.
+        Errors (i.e. the program exiting) are reported by the poll
+        object regardless.
+
+        :returns: None
+        :raises CoprocessExitedException: when the program is no longer
+            reading its standard input
+        """
+        try:
+            while self._buffer:
+                written = os.write(self._write_fd, self._buffer)
+                del self._buffer[:written]
+        except BlockingIOError:
+            pass
+        except BrokenPipeError:
+            raise CoprocessExitedException()
+        self._poll.modify(self, select.POLLOUT if self._buffer else 0)
+
+    def stop(self):
+        """
+        Close the program's standard input and reap it if it has already
+        exited. A program which is still running is expected to exit
+        upon reading end-of-file. Data which has not been written yet is
+        discarded.
+
+        :returns: None
+        """
+        self._poll.unregister(self)
+        os.close(self._write_fd)
+        self._write_fd = None
+        self._buffer = bytearray()
+        self._reap()
+
+    def _reap(self):
+        """
+        Reap the program if it has exited, without waiting for it.
+
+        :returns: None
+        """
+        try:
+            (pid, _) = os.waitpid(self.pid, os.WNOHANG)
+        except ChildProcessError:
+            pid = self.pid
+        if pid:
+            self.pid = None
@@ -0,0 +1,125 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Functions compiling analog axis response curves into lookup tables
+"""
+
+import array
+import bisect
+import math
+
+
+def _shape(curve, exponent):
+    """
+    Return a function mapping a normalized deflection (from *0* to *1*)
+    to a normalized output value (from *0* to *1*) according to the
+    given response curve.
+
+    :param curve: *'linear'*, *'exponential'* or a list of *[x, y]*
+        points to interpolate linearly between
+    :type curve: str or list
+    :param exponent: exponent used by the *'exponential'* curve
+    :type exponent: float
+    :returns: response curve function
+    :rtype: callable
+    """
+    if curve == 'exponential':
+        return lambda x: x ** exponent
+    if curve == 'linear':
+        return lambda x: x
+    points = [tuple(point) for point in curve]
+    if points[0][0] > 0:
+        points.insert(0, (0, 0))
+    if points[-1][0] < 1:
+        points.append((1, 1))
+    xs = [x for (x, _) in points]
+
+    def interpolate(x):
+        """
+        Interpolate linearly between the surrounding points.
+        """
+        index = min(max(bisect.bisect_right(xs, x), 1), len(points) - 1)
+        ((x0, y0), (x1, y1)) = (points[index-1], points[index])
+        return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+    return interpolate
+
+
+def _response(shaping):
+    """
+    Return a function mapping a normalized deflection (from *-1* to *1*)
+    to a normalized output value (from *-1* to *1*) according to the
+    given shaping options.
+
+    :param shaping: dictionary containing the *deadzone* (normalized
+        deflection below which the output value is *0*), *saturation*
+        (normalized deflection above which the output value is full),
+        *invert* (whether to invert the output value), *curve* and
+        *exponent* (see :py:func:`_shape()`) shaping options, e.g. an
+        axis action
+    :type shaping: dict
+    :returns: response function
+    :rtype: callable
+    """
+    shape = _shape(shaping['curve'], shaping['exponent'])
+    deadzone = shaping['deadzone']
+    span = shaping['saturation'] - deadzone
+    sign = -1 if shaping['invert'] else 1
+
+    def respond(deflection):
+        """
+        Return the output value for the given deflection.
+        """
+        magnitude = abs(deflection)
+        if magnitude <= deadzone:
+            return 0.0
+        normalized = min((magnitude - deadzone) / span, 1.0)
+        return sign * math.copysign(shape(normalized), deflection)
+
+    return respond
+
+
+def build_lut(minimum, maximum, scale, shaping):
+    """
+    Precompute the output value for every possible value of an input
+    axis, so that translating an input event is a single table lookup.
+    Input values are normalized to the range from *-1* to *1*, with the
+    middle of the input range being *0*.
+
+    :param minimum: lowest value reported by the input axis
+    :type minimum: int
+    :param maximum: highest value reported by the input axis
+    :type maximum: int
+    :param scale: output value for full deflection
+    :type scale: int
+    :param shaping: shaping options (see :py:func:`_response()`)
+    :type shaping: dict
+    :returns: lookup table whose *n*-th element is the output value for
+        input value *minimum + n*
+    :rtype: array.array
+    """
+    respond = _response(shaping)
+    center = (minimum + maximum) / 2
+    half_range = (maximum - minimum) / 2
+    lut = array.array('i')
+    for value in range(minimum, maximum + 1):
+        output = respond((value - center) / half_range)
+        lut.append(int(round(output * scale)))
+    return lut
@@ -0,0 +1,256 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Functions and classes enabling a running instance to hand its input
+devices, uinput device, control socket and runtime state over to a new
+instance without closing any of them
+"""
+
+import array
+import fcntl
+import os
+import pickle
+import socket
+import stat
+import struct
+
+import evdev
+
+import evmapy.controller
+import evmapy.ecodes
+import evmapy.util
+
+
+# Maximum size of a single message sent over the handover socket
+CHUNK_SIZE = 65536
+# Number of file descriptors passed in a single message (the kernel
+# refuses to pass more than 253 at once)
+FDS_PER_MESSAGE = 250
+# Number of seconds to wait for the other instance
+TIMEOUT = 5.0
+# struct input_event layout
+EVENT_FORMAT = 'llHHi'
+# ioctl destroying a uinput device
+UI_DEV_DESTROY = 0x5502
+
+_HEADER = struct.Struct('!II')
+_ACK = b'\1'
+
+
+class HandoverError(Exception):
+    """
+    Exception raised when handing over to another instance fails.
+    """
+    pass
+
+
+class HandedOverException(Exception):
+    """
+    Exception raised once everything has been handed over to the new
+    instance, so that the current one stops.
+    """
+    pass
+
+
+def receive():
+    """
+    Ask the running instance to hand everything over to the current one
+    and wait for it to do so.
+
+    :returns: *(state, fds)* tuple containing the runtime state of the
+        running instance and the file descriptors it passed
+    :rtype: tuple
+    :raises HandoverError: when no instance is running or the handover
+        fails
+    """
+    info = evmapy.util.get_app_info()
+    socket_name = '%s-handover.%d.socket' % (info['name'], os.getpid())
+    socket_path = os.path.join(info['config_dir'], socket_name)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+    try:
+        listener.bind(socket_path)
+        os.chmod(socket_path, stat.S_IRUSR | stat.S_IWUSR)
+        listener.listen(1)
+        listener.settimeout(TIMEOUT)
+        evmapy.controller.send_request({
+            'command':  'handover',
+            'socket':   socket_path,
+            'wait':     False,
+        })
+        (connection, _) = listener.accept()
+        with connection:
+            connection.settimeout(TIMEOUT)
+            retval = _receive_state(connection)
+            connection.send(_ACK)
+            return retval
+    except OSError as exc:
+        raise HandoverError(str(exc) or exc.__class__.__name__)
+    finally:
+        listener.close()
+        try:
+            os.remove(socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def _receive_state(connection):
+    """
+    Receive runtime state and file descriptors sent by :py:func:`send()`.
+
+    :param connection: socket to receive data from
+    :type connection: socket.socket
+    :returns: *(state, fds)* tuple
+    :rtype: tuple
+    :raises HandoverError: when the other instance sends invalid data
+        or disconnects prematurely
+    """
+    header = connection.recv(_HEADER.size)
+    if len(header) != _HEADER.size:
+        raise HandoverError("invalid header received")
+    (length, count) = _HEADER.unpack(header)
+    fds = array.array('i')
+    while len(fds) < count:
+        # Passed file descriptors must not leak into programs started by
+        # this instance, just like the ones it opens itself
+        (_, ancdata, _, _) = connection.recvmsg(
+            1, socket.CMSG_SPACE(FDS_PER_MESSAGE * fds.itemsize),
+            socket.MSG_CMSG_CLOEXEC
+        )
+        if not ancdata:
+            raise HandoverError("no file descriptors received")
+        for (level, msg_type, data) in ancdata:
+            if level == socket.SOL_SOCKET and msg_type == socket.SCM_RIGHTS:
+                fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+    data = b''
+    while len(data) < length:
+        chunk = connection.recv(CHUNK_SIZE)
+        if not chunk:
+            raise HandoverError("connection closed prematurely")
+        data += chunk
+    return (pickle.loads(data), list(fds))
+
+
+def send(socket_path, state, fds):
+    """
+    Send the given runtime state and file descriptors to the instance
+    listening on the given socket and wait for it to confirm their
+    receipt.
+
+    :param socket_path: path to the socket the new instance listens on
+    :type socket_path: str
+    :param state: runtime state to send
+    :type state: dict
+    :param fds: file descriptors to pass
+    :type fds: list
+    :returns: None
+    :raises HandoverError: when the handover fails
+    """
+    data = pickle.dumps(state)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET) as sock:
+            sock.settimeout(TIMEOUT)
+            sock.connect(socket_path)
+            sock.send(_HEADER.pack(len(data), len(fds)))
+            for start in range(0, len(fds), FDS_PER_MESSAGE):
+                batch = array.array('i', fds[start:start+FDS_PER_MESSAGE])
+                sock.sendmsg(
+                    [b'\0'], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, batch)]
+                )
+            for start in range(0, len(data), CHUNK_SIZE):
+                sock.send(data[start:start+CHUNK_SIZE])
+            if sock.recv(len(_ACK)) != _ACK:
+                raise HandoverError("receipt not confirmed")
+    except OSError as exc:
+        raise HandoverError(str(exc) or exc.__class__.__name__)
+
+
+def adopt_device(path, fdesc):
+    """
+    Return an :py:class:`evdev.InputDevice` instance using the given
+    file descriptor, passed by another instance, to read events. Any
+    grab held through that file descriptor is retained.
+
+    :param path: path to the input device
+    :type path: str
+    :param fdesc: file descriptor passed by another instance
+    :type fdesc: int
+    :returns: input device using the given file descriptor
+    :rtype: evdev.InputDevice
+    :raises OSError: when the input device is no longer available
+    """
+    try:
+        device = evdev.InputDevice(path)
+    except OSError:
+        os.close(fdesc)
+        raise
+    # Replace the freshly opened file description with the passed one;
+    # os.dup2() makes the duplicate inheritable unless told otherwise
+    os.dup2(fdesc, device.fd, inheritable=False)
+    os.close(fdesc)
+    return device
+
+
+class AdoptedUInput(object):
+
+    """
+    Class providing the subset of the :py:class:`evdev.UInput` interface
+    used by :py:class:`evmapy.multiplexer.Multiplexer` for a uinput
+    device created by another instance.
+
+    :param fdesc: file descriptor of the uinput device
+    :type fdesc: int
+    """
+
+    def __init__(self, fdesc):
+        self.fd = fdesc     # pylint: disable=invalid-name
+
+    def write(self, etype, code, value):
+        """
+        Inject an input event into the input subsystem.
+
+        :param etype: event type
+        :type etype: int
+        :param code: event code
+        :type code: int
+        :param value: event value
+        :type value: int
+        :returns: None
+        """
+        os.write(self.fd, struct.pack(EVENT_FORMAT, 0, 0, etype, code, value))
+
+    def syn(self):
+        """
+        Inject a synchronization event into the input subsystem.
+
+        :returns: None
+        """
+        self.write(
+            evmapy.ecodes.ECODES['EV_SYN'], evmapy.ecodes.ECODES['SYN_REPORT'],
+            0
+        )
+
+    def close(self):
+        """
+        Destroy the uinput device.
+
+        :returns: None
+        """
+        fcntl.ioctl(self.fd, UI_DEV_DESTROY)
+        os.close(self.fd)
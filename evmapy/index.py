@@ -0,0 +1,219 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+:py:class:`ConfigIndex` class implementation
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+
+import evmapy.config
+import evmapy.util
+
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _inotify_init(path):
+    """
+    Start watching the given directory for files being written, moved
+    or deleted.
+
+    :param path: path to the directory to watch
+    :type path: str
+    :returns: inotify file descriptor or `None` if inotify is not
+        available
+    :rtype: int
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        inotify_fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (AttributeError, OSError):
+        return None
+    if inotify_fd < 0:
+        return None
+    mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+    if libc.inotify_add_watch(inotify_fd, path.encode(), mask) < 0:
+        os.close(inotify_fd)
+        return None
+    return inotify_fd
+
+
+def _inotify_names(data):
+    """
+    Return the names of the files which the given inotify events refer
+    to.
+
+    :param data: raw inotify events read from an inotify file descriptor
+    :type data: bytes
+    :returns: list of file names
+    :rtype: list
+    """
+    names = []
+    offset = 0
+    while offset < len(data):
+        (_, _, _, length) = IN_EVENT_HEADER.unpack_from(data, offset)
+        offset += IN_EVENT_HEADER.size
+        names.append(data[offset:offset+length].rstrip(b'\0').decode())
+        offset += length
+    return names
+
+
+class ConfigIndex(object):
+
+    """
+    Class mapping input devices to their default configuration files.
+    Devices are matched by their sanitized names (i.e. configuration
+    file names) and, if a configuration file contains a *match* object,
+    by their IDs, physical paths or unique identifiers. The index is
+    rebuilt whenever a configuration file is written, moved or deleted.
+
+    :param on_change: function to call (without arguments) after the
+        index gets rebuilt due to a configuration file change
+    :type on_change: callable
+    """
+
+    def __init__(self, on_change):
+        self._on_change = on_change
+        self._logger = logging.getLogger()
+        self._config_dir = evmapy.util.get_app_info()['config_dir']
+        self._names = {}
+        self._matchers = {}
+        self._inotify_fd = _inotify_init(self._config_dir)
+        self.rebuild()
+
+    @property
+    def watched(self):
+        """
+        Return whether configuration file changes are detected
+        automatically.
+
+        :returns: whether configuration file changes are detected
+            automatically
+        :rtype: bool
+        """
+        return self._inotify_fd is not None
+
+    def fileno(self):
+        """
+        Return the inotify file descriptor. This enables a
+        :py:class:`ConfigIndex` instance to be used directly with
+        :py:meth:`select.poll.poll()`.
+
+        :returns: inotify file descriptor
+        :rtype: int
+        """
+        return self._inotify_fd
+
+    def process(self):
+        """
+        Rebuild the index if any configuration file has changed.
+
+        :returns: an empty list (to signal that no actions should be
+            performed)
+        :rtype: list
+        """
+        names = []
+        try:
+            while True:
+                names.extend(_inotify_names(os.read(self._inotify_fd, 4096)))
+        except BlockingIOError:
+            pass
+        if any(name.endswith('.json') for name in names):
+            self.rebuild()
+            self._on_change()
+        return []
+
+    def rebuild(self):
+        """
+        Scan the configuration directory and rebuild the index.
+
+        :returns: None
+        """
+        self._names = {}
+        self._matchers = {}
+        try:
+            filenames = sorted(os.listdir(self._config_dir))
+        except FileNotFoundError:
+            filenames = []
+        for filename in filenames:
+            if not filename.endswith('.json'):
+                continue
+            self._names[filename[:-len('.json')]] = filename
+            path = os.path.join(self._config_dir, filename)
+            try:
+                match = evmapy.config.read(path).get('match', {})
+                evmapy.config.validate_match(match)
+            except Exception as exc:
+                self._logger.debug("%s: not indexed: %s", path, exc)
+                continue
+            for (key, value) in match.items():
+                self._matchers[(key, value.lower())] = filename
+
+    def lookup(self, info):
+        """
+        Return the name of the default configuration file for the given
+        input device.
+
+        :param info: input device information, as returned by
+            :py:func:`evmapy.sysfs.list_devices()`
+        :type info: dict
+        :returns: name of the configuration file or `None` if the given
+            input device is not configured
+        :rtype: str
+        """
+        if self._matchers:
+            ids = [
+                '%04x:%04x:%04x' % (
+                    info.get('vendor', 0), info.get('product', 0),
+                    info.get('version', 0)
+                ),
+                '%04x:%04x' % (info.get('vendor', 0), info.get('product', 0)),
+            ]
+            candidates = [
+                ('uniq', info.get('uniq', '')),
+                ('phys', info.get('phys', '')),
+                ('id', ids[0]),
+                ('id', ids[1]),
+            ]
+            for (key, value) in candidates:
+                if value:
+                    try:
+                        return self._matchers[(key, value.lower())]
+                    except KeyError:
+                        pass
+        return self._names.get(evmapy.config.sanitize_name(info['name']))
+
+    def cleanup(self):
+        """
+        Stop watching the configuration directory.
+
+        :returns: None
+        """
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
@@ -21,7 +21,7 @@
 :py:class:`Multiplexer` class implementation
 """
 
-import logging
+import concurrent.futures
 import os
 import select
 import signal
@@ -29,12 +29,23 @@ import time
 
 import evdev
 
+import evmapy.combo
 import evmapy.config
 import evmapy.controller
+import evmapy.coprocess
+import evmapy.handover
+import evmapy.index
+import evmapy.performer
+import evmapy.reader
+import evmapy.shard
 import evmapy.source
+import evmapy.sysfs
 import evmapy.util
 
 
+MAX_PROBE_THREADS = 8
+
+
 class SIGHUPReceivedException(Exception):
     """
     Exception raised when a SIGHUP signal is received.
@@ -49,7 +60,7 @@ class SIGTERMReceivedException(Exception):
     pass
 
 
-class Multiplexer(object):
+class Multiplexer(evmapy.performer.Performer):
 
     """
     Class monitoring input device file descriptors and the control
@@ -57,31 +68,67 @@ class Multiplexer(object):
     reading, its associated object (:py:class:`evmapy.source.Source` or
     :py:class:`evmapy.controller.Controller` instance, respectively) is
     asked to process pending data. If the result of this processing in
-    an action list, these actions are then performed.
+    an action list, these actions are then performed by the
+    :py:class:`evmapy.performer.Performer` base class.
+
+    In threaded mode, events emitted by each input device are read and
+    processed by a separate :py:class:`evmapy.reader.Reader` thread and
+    the resulting actions are passed back to the thread running the
+    :py:class:`Multiplexer` loop, which performs all of them.
+
+    If more than one process is requested, input devices are distributed
+    among worker processes, each of which runs its own
+    :py:class:`Multiplexer` loop and passes the actions resulting from
+    processing events back to the coordinating process, which performs
+    all of them and handles the control socket.
+
+    A running :py:class:`Multiplexer` can hand its input devices, uinput
+    device, control socket and runtime state over to a new one, which
+    then continues where the former stopped.
+
+    :param threaded: whether to run in threaded mode
+    :type threaded: bool
+    :param processes: number of worker processes to use (*1* means that
+        all input devices are handled by the current process)
+    :type processes: int
+    :param handover: whether to take over from a running instance
+    :type handover: bool
     """
 
-    def __init__(self):
+    def __init__(self, threaded=False, processes=1, handover=False):
+        super().__init__()
         self._fds = {}
-        self._delayed = []
-        self._logger = logging.getLogger()
+        self._backlog = []
         self._poll = None
-        self._uinput = None
+        self._pipes = {}
+        self._handoff = None
+        self._index = None
+        self._readers = {}
+        self._links = {}
+        self._shard = None
+        self._handed_over = False
         try:
             signal.signal(signal.SIGHUP, signal.SIG_IGN)
             info = evmapy.util.get_app_info()
             app_with_user = (info['name'], info['user'].pw_name)
+            (state, fds) = self._take_over() if handover else (None, [])
             # Create the control socket
-            self._controller = evmapy.controller.Controller(self)
-            # Try to open /dev/uinput, failing gracefully
-            try:
-                self._uinput = evdev.UInput(name='%s (%s)' % app_with_user)
-            except evdev.uinput.UInputError as exc:
-                self._logger.warning(
-                    "injecting keypresses will not be possible: %s", str(exc)
-                )
+            self._controller = evmapy.controller.Controller(
+                self, fds[0] if state else None
+            )
+            if state and state['uinput']:
+                self._uinput = evmapy.handover.AdoptedUInput(fds[1])
+                self._capabilities = state['capabilities']
             # Start processing events from all configured devices
+            self._combos = self._load_combos()
             self._poll = select.poll()
-            self._scan_devices()
+            if processes > 1:
+                self._start_workers(processes, threaded)
+            else:
+                self._start_processing(threaded, state, fds)
+            # The uinput device is only created once the events it has
+            # to be able to inject are known
+            self._update_uinput()
             # Start monitoring the control socket
             self._fds[self._controller.fileno()] = self._controller
             self._poll.register(self._controller, select.POLLIN)
@@ -93,11 +140,328 @@ class Multiplexer(object):
             self._logger.exception("unhandled exception while initializing:")
             raise
 
+    def _load_combos(self):
+        """
+        Load cross-device combos, failing gracefully.
+
+        :returns: index of cross-device combos
+        :rtype: evmapy.combo.ComboIndex
+        """
+        try:
+            actions = evmapy.config.load_combos()
+        except evmapy.config.ConfigError as exc:
+            if not exc.not_found:
+                self._logger.error(str(exc))
+            actions = []
+        self._require_capabilities(evmapy.actions.get_capabilities(actions))
+        return evmapy.combo.ComboIndex(actions)
+
+    def _take_over(self):
+        """
+        Ask the running instance to hand everything over to this one.
+
+        :returns: *(state, fds)* tuple containing the runtime state of the
+            running instance and the file descriptors it passed or
+            *(None, [])* if taking over failed
+        :rtype: tuple
+        """
+        try:
+            (state, fds) = evmapy.handover.receive()
+        except evmapy.handover.HandoverError as exc:
+            self._logger.warning("unable to take over: %s", str(exc))
+            return (None, [])
+        self._logger.info(
+            "took over %d device(s) from running instance",
+            len(state['devices'])
+        )
+        return (state, fds)
+
+    def _start_processing(self, threaded, state=None, fds=None):
+        """
+        Start processing events emitted by all configured devices.
+
+        :param threaded: whether to process events emitted by each
+            device in a separate thread
+        :type threaded: bool
+        :param state: runtime state passed by the instance taken over
+            from
+        :type state: dict
+        :param fds: file descriptors passed by the instance taken over
+            from
+        :type fds: list
+        :returns: None
+        """
+        if threaded:
+            self._handoff = evmapy.reader.Handoff(self._remove_device)
+            self._fds[self._handoff.fileno()] = self._handoff
+            self._poll.register(self._handoff, select.POLLIN)
+        self._index = evmapy.index.ConfigIndex(self._scan_devices)
+        if self._index.watched:
+            self._fds[self._index.fileno()] = self._index
+            self._poll.register(self._index, select.POLLIN)
+        if state:
+            self._adopt_devices(state, fds)
+        self._scan_devices()
+
+    def _adopt_devices(self, state, fds):
+        """
+        Start processing events emitted by the devices passed by the
+        instance taken over from, restoring its runtime state.
+
+        :param state: runtime state passed by the instance taken over
+            from
+        :type state: dict
+        :param fds: file descriptors passed by the instance taken over
+            from
+        :type fds: list
+        :returns: None
+        """
+        self._combos = state['combos']
+        self._timers = state['timers']
+        self._motion = state['motion']
+        self._keys = state['keys']
+        for device_state in state['devices']:
+            passthrough = device_state['passthrough']
+            try:
+                device = evmapy.handover.adopt_device(
+                    device_state['path'], fds[device_state['fd']]
+                )
+            except OSError:
+                self._logger.debug(
+                    "%s disappeared during handover", device_state['path']
+                )
+                if passthrough is not None:
+                    # Closing the last file descriptor destroys the
+                    # passthrough device
+                    os.close(fds[passthrough])
+                continue
+            if passthrough is not None:
+                passthrough = evmapy.handover.AdoptedUInput(fds[passthrough])
+            source = evmapy.source.Source(
+                device, state=device_state['source'], passthrough=passthrough
+            )
+            self._add_source(source)
+            if source.pending and not self._handoff:
+                self._backlog.append(source)
+
+    def hand_over(self, socket_path):
+        """
+        Hand all input devices, the uinput device, the control socket and
+        runtime state over to the instance listening on the given socket
+        and stop once it confirms their receipt.
+
+        :param socket_path: path to the socket the new instance listens
+            on
+        :type socket_path: str
+        :returns: None
+        :raises evmapy.handover.HandedOverException: when the handover
+            succeeds
+        """
+        if self._links:
+            self._logger.error("handover is impossible with worker processes")
+            return
+        sources = self.devices
+        for source in sources:
+            self._remove_device(source, quiet=True)
+        fds = [self._controller.fileno()]
+        if self._uinput:
+            fds.append(self._uinput.fd)
+        devices = []
+        for source in sources:
+            device_state = {
+                'fd':           len(fds),
+                'path':         source.device['path'],
+                'source':       source.export_state(),
+                'passthrough':  None,
+            }
+            fds.append(source.device['fd'])
+            if source.passthrough:
+                # Events keep being forwarded to the same device
+                device_state['passthrough'] = len(fds)
+                fds.append(source.passthrough.fd)
+            devices.append(device_state)
+        state = {
+            'uinput':   self._uinput is not None,
+            'devices':  devices,
+            'timers':   self._timers,
+            'motion':   self._motion,
+            'combos':   self._combos,
+            'capabilities': self._capabilities,
+            'keys':     self._keys,
+        }
+        try:
+            evmapy.handover.send(socket_path, state, fds)
+        except evmapy.handover.HandoverError as exc:
+            self._logger.error("handover failed: %s", str(exc))
+            for source in sources:
+                self._add_source(source)
+                if source.pending and not self._handoff:
+                    self._backlog.append(source)
+            return
+        self._handed_over = True
+        raise evmapy.handover.HandedOverException()
+
+    def _start_workers(self, count, threaded):
+        """
+        Fork the given number of worker processes, each of which handles
+        a subset of all configured devices.
+
+        :param count: number of worker processes to fork
+        :type count: int
+        :param threaded: whether worker processes should process events
+            emitted by each device in a separate thread
+        :type threaded: bool
+        :returns: None
+        """
+        for index in range(count):
+            (ours, theirs) = evmapy.shard.Link.pair()
+            pid = os.fork()
+            if pid == 0:
+                ours.close()
+                self._run_worker(theirs, (index, count), threaded)
+            theirs.close()
+            link = evmapy.shard.Link(ours, self, pid)
+            self._links[link] = []
+            self._fds[link.fileno()] = link
+            self._poll.register(link, select.POLLIN)
+        self._logger.info("started %d worker process(es)", count)
+
+    def _run_worker(self, sock, shard, threaded):
+        """
+        Run a :py:meth:`select.poll.poll()` loop in a worker process,
+        handling the devices belonging to the given shard and passing
+        the resulting actions to the coordinating process. This method
+        never returns.
+
+        :param sock: socket connected to the coordinating process
+        :type sock: socket.socket
+        :param shard: *(index, count)* tuple specifying which devices
+            should be handled by this worker process
+        :type shard: tuple
+        :param threaded: whether to process events emitted by each
+            device in a separate thread
+        :type threaded: bool
+        :returns: None
+        """
+        status = 0
+        try:
+            for link in self._links:
+                link.close()
+            self._links = {}
+            self._fds = {}
+            self._poll = select.poll()
+            self._shard = shard
+            self._upstream = evmapy.shard.Link(sock, self)
+            self._fds[self._upstream.fileno()] = self._upstream
+            self._poll.register(self._upstream, select.POLLIN)
+            self._start_processing(threaded)
+            self._run()
+        except (KeyboardInterrupt, SIGTERMReceivedException,
+                evmapy.shard.LinkClosedException):
+            pass
+        except:
+            self._logger.exception("unhandled exception in worker:")
+            status = 1
+        finally:
+            for source in self.devices:
+                self._remove_device(source, quiet=True)
+            os._exit(status)
+
+    def _remove_link(self, link):
+        """
+        Stop communicating with the worker process at the other end of
+        the given link and stop all actions it can no longer stop.
+
+        :param link: link to the worker process
+        :type link: evmapy.shard.Link
+        :returns: None
+        """
+        del self._fds[link.fileno()]
+        self._poll.unregister(link)
+        del self._links[link]
+        link.close()
+        os.waitpid(link.pid, 0)
+        self._abandon_worker(link.pid)
+
+    def do_actions(self, _, actions):
+        """
+        Return actions passed by a worker process so that they get
+        performed.
+
+        :param actions: list of actions to be performed
+        :type actions: list
+        :returns: list of actions to be performed
+        :rtype: list
+        """
+        return actions
+
+    def do_abandon(self, _, actions):
+        """
+        Stop actions which a worker process can no longer stop.
+
+        :param actions: list of actions to stop
+        :type actions: list
+        :returns: None
+        """
+        self._abandon_actions(actions)
+
+    def do_capabilities(self, _, capabilities):
+        """
+        Make sure the uinput device is able to inject the events which
+        actions configured in a worker process may cause to be injected.
+
+        :param capabilities: dictionary mapping event types to sets of
+            event codes
+        :type capabilities: dict
+        :returns: None
+        """
+        self._require_capabilities(capabilities)
+        self._update_uinput()
+
+    def do_devices(self, link, devices):
+        """
+        Update the list of devices handled by the worker process at the
+        other end of the given link.
+
+        :param link: link to the worker process
+        :type link: evmapy.shard.Link
+        :param devices: information about devices handled by the worker
+            process
+        :type devices: list
+        :returns: None
+        """
+        self._links[link] = [
+            evmapy.shard.RemoteSource(link, device) for device in devices
+        ]
+        self._log_device_count()
+
+    def do_config(self, _, dev_path, config_file):
+        """
+        Load configuration for a device as requested by the coordinating
+        process.
+
+        :param dev_path: path to the device to configure
+        :type dev_path: str
+        :param config_file: name of the configuration file to load
+        :type config_file: str
+        :returns: None
+        """
+        self.load_device_config(dev_path, config_file)
+
+    def do_scan(self, _):
+        """
+        Rescan devices as requested by the coordinating process.
+
+        :returns: None
+        """
+        self._scan_devices()
+
     @property
     def devices(self):
         """
         Return a list of handled :py:class:`evmapy.source.Source`
-        instances.
+        instances (or :py:class:`evmapy.shard.RemoteSource` instances
+        representing devices handled by worker processes).
 
         :returns: list of handled :py:class:`evmapy.source.Source`
             instances
@@ -107,48 +471,155 @@ class Multiplexer(object):
         for processor in self._fds.values():
             if getattr(processor, 'device', 'socket') != 'socket':
                 retval.append(processor)
+        for remote_sources in self._links.values():
+            retval.extend(remote_sources)
         return retval
 
     def _log_device_count(self):
         """
-        Log the number of currently handled devices.
+        Log the number of currently handled devices. In a worker
+        process, also inform the coordinating process about the devices
+        currently handled.
 
         :returns: None
         """
+        if self._upstream:
+            self._upstream.send(
+                'devices', [source.device for source in self.devices]
+            )
         self._logger.info("handling %d device(s)", len(self.devices))
 
     def _scan_devices(self):
         """
         Scan all evdev devices in the system and attempt to subscribe to
-        their events.
+        their events. If worker processes are used, they are requested
+        to do that instead.
 
         :returns: None
         """
+        if self._links:
+            for link in self._links:
+                link.send('scan')
+            return
         self._logger.info("scanning devices...")
+        if not self._index.watched:
+            self._index.rebuild()
         processed_devices = [source.device['path'] for source in self.devices]
-        for dev_path in evdev.list_devices():
-            if dev_path not in processed_devices:
-                self._add_device(dev_path)
+        candidates = []
+        for info in evmapy.sysfs.list_devices():
+            dev_path = info['path']
+            if self._shard:
+                (index, count) = self._shard
+                if evmapy.shard.get_shard(dev_path, count) != index:
+                    continue
+            if dev_path in processed_devices:
+                continue
+            config_file = self._index.lookup(info)
+            if not config_file:
+                # Don't even open devices which are not configured
+                continue
+            candidates.append((dev_path, config_file))
+        sources = self._open_devices(candidates)
+        for source in sources:
+            self._require_capabilities(source.capabilities)
+        self._update_uinput()
+        for source in sources:
+            self._add_source(source)
         self._log_device_count()
 
-    def _add_device(self, path):
+    def _open_devices(self, candidates):
+        """
+        Open the given devices and load their configuration. As opening
+        some devices (e.g. Bluetooth ones) and loading large
+        configuration files may be slow, this is done by a pool of
+        threads when more than one device is to be opened.
+
+        :param candidates: list of *(path, config_file)* tuples
+            specifying the devices to open and the names of their
+            default configuration files
+        :type candidates: list
+        :returns: list of :py:class:`evmapy.source.Source` instances
+            associated with the devices which were successfully opened
+        :rtype: list
         """
-        Start processing events emitted by the device under the given
-        path.
+        if len(candidates) > 1:
+            workers = min(len(candidates), MAX_PROBE_THREADS)
+            with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+                sources = list(pool.map(
+                    lambda candidate: self._open_device(*candidate),
+                    candidates
+                ))
+        else:
+            sources = [self._open_device(*c) for c in candidates]
+        return [source for source in sources if source]
+
+    def _open_device(self, path, config_file=None):
+        """
+        Open the device under the given path and load its configuration.
 
-        :param path: path to device whose events to listen to
+        :param path: path to the device to open
         :type path: str
-        :returns: None
+        :param config_file: name of the default configuration file for
+            the device
+        :type config_file: str
+        :returns: :py:class:`evmapy.source.Source` instance associated
+            with the device or `None` if it could not be opened or
+            configured
+        :rtype: evmapy.source.Source
         """
-        device = evdev.InputDevice(path)
+        try:
+            device = evdev.InputDevice(path)
+        except OSError as exc:
+            # E.g. insufficient permissions or a device which disappeared
+            # since the last scan
+            self._logger.warning("unable to open %s: %s", path, exc)
+            return None
         self._logger.debug("trying to add %s (%s)", device.fn, device.name)
         try:
-            source = evmapy.source.Source(device)
-            self._fds[source.device['fd']] = source
-            self._poll.register(source.device['fd'], select.POLLIN)
+            return evmapy.source.Source(device, config_file)
         except evmapy.config.ConfigError as exc:
+            device.close()
             if not exc.not_found:
                 self._logger.error(str(exc))
+        except evmapy.source.DeviceRemovedException:
+            device.close()
+            self._logger.debug("%s disappeared while being added", path)
+        return None
+
+    def _add_source(self, source):
+        """
+        Start processing events emitted by the device associated with
+        the given source.
+
+        :param source: source to start listening to
+        :type source: evmapy.source.Source
+        :returns: None
+        """
+        source.subscribe(self._combos.subscriptions(source.device['name']))
+        self._fds[source.device['fd']] = source
+        if self._handoff:
+            reader = evmapy.reader.Reader(source, self._handoff)
+            self._readers[source.device['fd']] = reader
+            reader.start()
+        else:
+            self._poll.register(source.device['fd'], select.POLLIN)
+            self._schedule_settle(source)
+
+    def _schedule_settle(self, source):
+        """
+        Schedule a timer reporting changes of debounced buttons held
+        back by the given source once their debounce windows end, if
+        there are any.
+
+        :param source: source to schedule the timer for
+        :type source: evmapy.source.Source
+        :returns: None
+        """
+        deadline = source.deadline
+        if deadline is not None:
+            self._timers.schedule(
+                ('settle', source.device['fd']), deadline, ('settle', source)
+            )
 
     def _remove_device(self, source, quiet=False):
         """
@@ -161,9 +632,24 @@ class Multiplexer(object):
         :type quiet: bool
         :returns: None
         """
+        if self._fds.get(source.device['fd']) is not source:
+            # Device has already been removed
+            return
         del self._fds[source.device['fd']]
-        self._poll.unregister(source.device['fd'])
+        self._timers.cancel(('settle', source.device['fd']))
+        if source.device['fd'] in self._readers:
+            self._readers.pop(source.device['fd']).stop()
+        else:
+            self._poll.unregister(source.device['fd'])
+        if source in self._backlog:
+            self._backlog.remove(source)
         if not quiet:
+            source.cleanup()
+            # Events emitted by a disconnected device can't be active
+            self._perform_normal_actions(
+                [(edge, False) for edge in source.edges]
+            )
+            self._abandon_actions(source.actions)
             self._logger.info("removed %(path)s (%(name)s)", source.device)
             self._log_device_count()
 
@@ -180,6 +666,8 @@ class Multiplexer(object):
             self._logger.info("user requested shutdown")
         except SIGTERMReceivedException:
             self._logger.info("SIGTERM received")
+        except evmapy.handover.HandedOverException:
+            self._logger.info("handed over to new instance")
         except:
             self._logger.exception("unhandled exception:")
             raise
@@ -187,10 +675,24 @@ class Multiplexer(object):
             # Always cleanup, even if an unhandled exception was raised
             del self._fds[self._controller.fileno()]
             self._poll.unregister(self._controller)
-            self._controller.cleanup()
+            self._controller.cleanup(unlink=not self._handed_over)
+            for link in list(self._links):
+                self._remove_link(link)
             for source in self.devices:
                 self._remove_device(source, quiet=True)
-            if self._uinput:
+            if self._handoff:
+                del self._fds[self._handoff.fileno()]
+                self._poll.unregister(self._handoff)
+                self._handoff.cleanup()
+            if self._index:
+                if self._index.watched:
+                    del self._fds[self._index.fileno()]
+                    self._poll.unregister(self._index)
+                self._index.cleanup()
+            for coprocess in self._pipes.values():
+                if coprocess.running:
+                    self._stop_pipe(coprocess)
+            if self._uinput and not self._handed_over:
                 self._uinput.close()
             self._logger.info("quitting")
 
@@ -220,12 +722,17 @@ class Multiplexer(object):
         signal.signal(signal.SIGHUP, raise_signal_exception)
         signal.signal(signal.SIGTERM, raise_signal_exception)
         while True:
-            # Calculate time until the next delayed action triggers
-            try:
-                now = time.time()
-                timeout = max(0, (self._delayed[0]['when'] - now) * 1000)
-            except IndexError:
+            # Calculate time until the next timer fires
+            deadline = self._timers.next_deadline()
+            if deadline is None:
                 timeout = None
+            else:
+                timeout = max(0, (deadline - time.time()) * 1000)
+            # Sources which exhausted their event budget during the
+            # previous iteration still have events queued, so don't
+            # block if there are any
+            if self._backlog:
+                timeout = 0
             # Wait for either an input event or the moment when the next
             # delayed action should be triggered, whichever comes first
             try:
@@ -234,119 +741,143 @@ class Multiplexer(object):
                 self._logger.info("SIGHUP received")
                 self._scan_devices()
                 continue
-            for (fdesc, _) in results:
-                try:
-                    processor = self._fds[fdesc]
-                    actions = processor.process()
-                except evmapy.source.DeviceRemovedException:
-                    self._remove_device(processor)
-                    continue
-                if actions:
-                    self._perform_normal_actions(actions)
-            if not results:
-                # It's time for the next delayed action
-                self._perform_delayed_actions()
-
-    def _perform_normal_actions(self, actions):
+            backlog = self._backlog
+            self._backlog = []
+            processors = [self._fds[fdesc] for (fdesc, _) in results]
+            for processor in backlog:
+                if processor not in processors:
+                    processors.append(processor)
+            self._process_all(processors)
+            now = time.time()
+            if not results and not backlog and deadline is not None:
+                # poll() timed out, so the next timer is due even if the
+                # clock disagrees due to timeout rounding
+                now = max(now, deadline)
+            self._run_timers(now)
+
+    def _process_all(self, processors):
         """
-        Start/stop actions requested by a source in response to the
-        events it processed.
+        Ask the given processors to process pending data, in descending
+        order of their priorities, and perform the resulting actions.
+        Sources which still have events queued afterwards are scheduled
+        for processing in the next loop iteration.
 
-        :param actions: list of *(action, start)* tuples, each of which
-            specifies which action to start (if *start* is *True*) or
-            stop (if *start* is *False*)
-        :type actions: list
+        :param processors: list of objects to process pending data of
+        :type processors: list
         :returns: None
         """
-        for (action, start) in actions:
-            self._logger.debug("action=%s, start=%s", action, start)
-            if action['hold'] == 0:
-                if start:
-                    if action['type'] == 'key':
-                        self._uinput_synthesize(action, press=True)
-                    elif action['type'] == 'exec':
-                        self._execute_program(action)
-                else:
-                    if action['type'] == 'key':
-                        self._uinput_synthesize(action, press=False)
-            else:
-                if start:
-                    # Schedule delayed action to trigger after hold time
-                    action['when'] = time.time() + action['hold']
-                    action['direction'] = 'down'
-                    self._delayed.append(action)
-                else:
-                    # Cancel delayed action
-                    try:
-                        index = next(
-                            i for (i, a) in enumerate(self._delayed)
-                            if a['id'] == action['id']
-                        )
-                        del self._delayed[index]
-                    except StopIteration:
-                        # Action has already been removed from the queue
-                        # by _perform_delayed_actions()
-                        pass
-
-    def _perform_delayed_actions(self):
-        """
-        Perform the next queued delayed action.
+        processors.sort(key=lambda p: getattr(p, 'priority', 0), reverse=True)
+        for processor in processors:
+            if processor not in self._fds.values():
+                # Removed while an earlier processor was handled, e.g. a
+                # helper program which exited while being written to
+                continue
+            try:
+                actions = processor.process()
+            except evmapy.source.DeviceRemovedException:
+                self._remove_device(processor)
+                continue
+            except evmapy.shard.LinkClosedException:
+                if processor is self._upstream:
+                    raise
+                self._logger.error("worker process %d exited", processor.pid)
+                self._remove_link(processor)
+                continue
+            except evmapy.coprocess.CoprocessExitedException:
+                self._logger.info("helper program %d exited", processor.pid)
+                self._stop_pipe(processor)
+                continue
+            if getattr(processor, 'pending', False):
+                self._backlog.append(processor)
+            if getattr(processor, 'device', 'socket') != 'socket':
+                self._schedule_settle(processor)
+            if actions:
+                self._perform_normal_actions(actions)
 
+    def _timer_settle(self, source, when):
+        """
+        Perform the actions resulting from changes of debounced buttons
+        which the given source held back until the end of their debounce
+        windows.
+
+        :param source: source holding the changes back
+        :type source: evmapy.source.Source
+        :param when: time at which the timer was due
+        :type when: float
         :returns: None
         """
-        action = self._delayed[0]
-        if action['type'] == 'key':
-            if action['direction'] == 'down':
-                # Simulate a key press and queue its release in 30 ms to
-                # make the synthesized event semi-realistic
-                self._uinput_synthesize(action, press=True)
-                action['when'] = time.time() + 0.03
-                action['direction'] = 'up'
-                self._delayed.append(action)
-            else:
-                self._uinput_synthesize(action, press=False)
-        elif action['type'] == 'exec':
-            self._execute_program(action)
-        del self._delayed[0]
+        self._perform_normal_actions(source.settle(when))
+        self._schedule_settle(source)
 
-    def _uinput_synthesize(self, action, press):
+    def _perform_once(self, action):
         """
-        Inject a fake key press into the input subsystem using uinput
+        Perform an action once, writing the data of pipe actions to their
+        helper programs, which are monitored by the
+        :py:meth:`select.poll.poll()` loop.
 
-        :param action: action dictionary containing a `target` key which
-            specifies the key to synthesize
+        :param action: action to perform
         :type action: dict
-        :param press: whether to simulate a key press (`True`) or a key
-            release (`False`)
-        :type press: bool
         :returns: None
         """
-        if not self._uinput:
-            return
-        keys = evmapy.util.as_list(action['target'])
-        for key in keys:
-            etype = evdev.ecodes.ecodes['EV_KEY']
-            ecode = evdev.ecodes.ecodes[key]
-            self._logger.debug(
-                "writing: code %02d, type %02d, val %02d", ecode, etype, press
+        if action['type'] == 'pipe':
+            self._write_pipe(action)
+        else:
+            super()._perform_once(action)
+
+    def _write_pipe(self, action):
+        """
+        Write the data associated with the given action to the standard
+        input of its helper program, starting the latter first if it is
+        not running yet (or any more). Actions with identical commands
+        share a single helper program.
+
+        :param action: action dictionary containing `argv` and `data`
+            keys which specify the helper program and the data to write
+            to it, respectively
+        :type action: dict
+        :returns: None
+        """
+        key = tuple(action['argv'])
+        coprocess = self._pipes.get(key)
+        if not coprocess:
+            coprocess = evmapy.coprocess.Coprocess(
+                action['argv'], self._poll
             )
-            self._uinput.write(etype, ecode, int(press))
-            self._logger.debug("writing: code 00, type 00, val 00")
-            self._uinput.syn()
+            self._pipes[key] = coprocess
+        if not coprocess.running:
+            self._logger.debug("starting: %r", coprocess.argv)
+            try:
+                coprocess.start()
+            except OSError as exc:
+                self._logger.error(
+                    "unable to run '%s': %s", coprocess.argv[0], exc.strerror
+                )
+                return
+            self._fds[coprocess.fileno()] = coprocess
+        self._logger.debug("writing to %d: %r", coprocess.pid, action['data'])
+        try:
+            coprocess.write(action['data'])
+        except evmapy.coprocess.CoprocessExitedException:
+            self._logger.error(
+                "helper program %d exited, data not written", coprocess.pid
+            )
+            self._stop_pipe(coprocess)
 
-    def _execute_program(self, action):
+    def _stop_pipe(self, coprocess):
         """
-        Run external program(s) associated with the given action.
+        Stop monitoring the standard input of the given helper program
+        and close it. The program is started again by the next action
+        writing to it.
 
-        :param action: action dictionary containing a `target` key which
-            specifies the command(s) to be run
-        :type action: dict
+        :param coprocess: helper program to stop
+        :type coprocess: evmapy.coprocess.Coprocess
         :returns: None
         """
-        commands = evmapy.util.as_list(action['target'])
-        for command in commands:
-            self._logger.debug("running: '%s'", command)
-            os.system(command)
+        if self._fds.get(coprocess.fileno()) is not coprocess:
+            # Helper program has already been stopped
+            return
+        del self._fds[coprocess.fileno()]
+        coprocess.stop()
 
     def load_device_config(self, dev_path, config_file):
         """
@@ -364,10 +895,22 @@ class Multiplexer(object):
         """
         for source in self.devices:
             if source.device['path'] == dev_path:
+                loader = self._readers.get(source.device['fd'], source)
+                # The actions of the previous configuration can't be
+                # stopped by their triggers any more once it is replaced
+                actions = source.actions
                 try:
-                    source.load_config(config_file)
+                    loader.load_config(config_file)
                 except evmapy.config.ConfigError as exc:
                     self._logger.error(
                         "%s: failed to load %s",
                         source.device['path'], str(exc)
                     )
+                    continue
+                except evmapy.source.DeviceRemovedException:
+                    self._abandon_actions(actions)
+                    self._remove_device(source)
+                    continue
+                self._abandon_actions(actions)
+                self._require_capabilities(source.capabilities)
+                self._update_uinput()
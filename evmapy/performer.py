@@ -0,0 +1,593 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+:py:class:`Performer` class implementation
+"""
+
+import logging
+import os
+import time
+
+import evdev
+
+import evmapy.actions
+import evmapy.timer
+import evmapy.util
+
+
+# Number of times per second pointer motion is integrated and reported
+# while any mouse action is active
+MOUSE_RATE = 250
+# Number of seconds after which a key pressed by a delayed action is
+# released
+RELEASE_DELAY = 0.03
+
+
+def _uinput_capabilities(required):
+    """
+    Return the capabilities of a uinput device able to inject the given
+    events.
+
+    :param required: dictionary mapping event types to sets of event
+        codes which the uinput device has to be able to inject
+    :type required: dict
+    :returns: dictionary mapping event types to lists of event codes
+        (or *(code, absinfo)* tuples for absolute axes)
+    :rtype: dict
+    """
+    absinfo = evdev.AbsInfo(
+        value=0, min=-evmapy.actions.OUTPUT_ABS_MAX,
+        max=evmapy.actions.OUTPUT_ABS_MAX, fuzz=0, flat=0, resolution=0
+    )
+    capabilities = {}
+    for (etype, codes) in required.items():
+        if etype == evdev.ecodes.EV_ABS:
+            capabilities[etype] = [(code, absinfo) for code in sorted(codes)]
+        else:
+            capabilities[etype] = sorted(codes)
+    return capabilities
+
+
+class Performer(object):
+
+    """
+    Base class of :py:class:`evmapy.multiplexer.Multiplexer` which
+    performs the actions passed to it, injecting events using a uinput
+    device able to inject all events required so far. Delayed, repeated
+    and timed actions are driven by a :py:class:`evmapy.timer.TimerQueue`
+    which the subclass is responsible for running. Keys are tracked per
+    action holding them, so that they can be released once the actions
+    holding them get abandoned.
+
+    In a worker process (i.e. when a link to the coordinating process is
+    set up), actions are passed to the coordinating process instead of
+    being performed.
+
+    Pipe actions are performed by the subclass, which monitors their
+    helper programs, by overriding :py:meth:`_perform_once()`.
+    """
+
+    def __init__(self):
+        self._timers = evmapy.timer.TimerQueue()
+        self._motion = {}
+        self._axes = {}
+        self._combos = None
+        self._logger = logging.getLogger()
+        self._uinput = None
+        self._capabilities = {}
+        self._uinput_stale = False
+        self._keys = {}
+        self._upstream = None
+
+    def _require_capabilities(self, capabilities):
+        """
+        Make sure the uinput device will be able to inject the given
+        events. If it is not, it is marked for being rebuilt by
+        :py:meth:`_update_uinput()`. In a worker process, the missing
+        events are reported to the coordinating process instead.
+
+        :param capabilities: dictionary mapping event types to sets of
+            event codes
+        :type capabilities: dict
+        :returns: None
+        """
+        missing = {}
+        for (etype, codes) in capabilities.items():
+            known = self._capabilities.setdefault(etype, set())
+            if not known.issuperset(codes):
+                missing[etype] = set(codes) - known
+                known.update(codes)
+        if not missing:
+            return
+        if self._upstream:
+            self._upstream.send('capabilities', missing)
+        else:
+            self._uinput_stale = True
+
+    def _update_uinput(self):
+        """
+        Replace the uinput device with one able to inject all events
+        required so far, if any of them were added since it was created.
+        The new device is created before the old one is destroyed, so
+        that there is always a device to inject events with.
+
+        :returns: None
+        """
+        if not self._uinput_stale:
+            return
+        self._uinput_stale = False
+        info = evmapy.util.get_app_info()
+        try:
+            uinput = evdev.UInput(
+                events=_uinput_capabilities(self._capabilities),
+                name='%s (%s)' % (info['name'], info['user'].pw_name)
+            )
+        except evdev.uinput.UInputError as exc:
+            self._logger.warning(
+                "injecting keypresses will not be possible: %s", str(exc)
+            )
+            return
+        if self._uinput:
+            self._uinput.close()
+        self._uinput = uinput
+        # Keys held on the old device were released by the kernel when
+        # it was destroyed
+        for code in sorted(self._keys):
+            self._uinput.write(evdev.ecodes.ecodes['EV_KEY'], code, 1)
+            self._uinput.syn()
+        self._logger.debug(
+            "uinput device able to inject %d event(s) created",
+            sum(len(codes) for codes in self._capabilities.values())
+        )
+
+    def _can_inject(self, etype, code):
+        """
+        Return whether an event of the given type and code can be
+        injected, rebuilding the uinput device first if it is not able
+        to inject it.
+
+        :param etype: event type
+        :type etype: int
+        :param code: event code
+        :type code: int
+        :returns: whether the event can be injected
+        :rtype: bool
+        """
+        if code not in self._capabilities.get(etype, ()):
+            self._require_capabilities({etype: {code}})
+            self._update_uinput()
+        return self._uinput is not None
+
+    def _run_timers(self, now):
+        """
+        Handle all timers which are due at the given time. A timer whose
+        payload is *(kind, data)* is handled by the method called
+        *_timer_<kind>*, which is passed the data (usually an action)
+        and the time at which the timer was due.
+
+        :param now: current time
+        :type now: float
+        :returns: None
+        """
+        for (when, (kind, data)) in self._timers.pop_due(now):
+            getattr(self, '_timer_' + kind)(data, when)
+
+    def _perform_normal_actions(self, actions):
+        """
+        Start/stop actions requested by a source in response to the
+        events it processed.
+
+        :param actions: list of *(action, start)* tuples, each of which
+            specifies which action to start (if *start* is *True*) or
+            stop (if *start* is *False*); for axis actions, *start* is
+            the value to set the output axis to
+        :type actions: list
+        :returns: None
+        """
+        if self._upstream:
+            self._upstream.send('actions', actions)
+            return
+        for (action, start) in actions:
+            self._logger.debug("action=%s, start=%s", action, start)
+            if action['type'] == 'edge':
+                # An event triggering cross-device combos changed state
+                self._perform_normal_actions(
+                    self._combos.update(action['bit'], start)
+                )
+            elif action['type'] == 'axis':
+                # start is the output axis value for axis actions
+                self._uinput_move(action, start)
+                if start:
+                    self._axes[action['id']] = action
+                else:
+                    self._axes.pop(action['id'], None)
+            elif action['type'] == 'mouse':
+                # start is the pointer velocity for mouse actions
+                self._set_motion(action, start)
+            elif action['hold'] == 0 and not action['repeat']:
+                if start:
+                    if action['type'] == 'key':
+                        # Held until the trigger is released
+                        self._uinput_synthesize(action, press=True)
+                    else:
+                        self._perform_once(action)
+                else:
+                    if action['type'] == 'key':
+                        self._uinput_synthesize(action, press=False)
+            else:
+                now = time.time()
+                if start and action['hold'] > 0:
+                    # Schedule delayed action to trigger after hold time
+                    self._timers.schedule(
+                        ('hold', action['id']), now + action['hold'],
+                        ('hold', action)
+                    )
+                elif start:
+                    self._timer_hold(action, now)
+                else:
+                    # Cancel delayed or repeated action (unless it has
+                    # already been performed)
+                    self._timers.cancel(('hold', action['id']))
+
+    def _abandon_actions(self, actions):
+        """
+        Stop the given actions, whose triggers can no longer stop them
+        because the device they were configured for got removed or
+        loaded another configuration.
+
+        :param actions: list of actions to stop
+        :type actions: list
+        :returns: None
+        """
+        if self._upstream:
+            self._upstream.send('abandon', actions)
+            return
+        for action in actions:
+            # Deflected input axes would keep the pointer moving or the
+            # output axis deflected
+            if action['type'] == 'mouse':
+                self._set_motion(action, 0)
+            elif action['type'] == 'axis' and action['value']:
+                self._uinput_move(action, 0)
+                self._axes.pop(action['id'], None)
+        self._release_actions({action['id'] for action in actions})
+
+    def _abandon_worker(self, pid):
+        """
+        Stop all actions performed on behalf of the worker process with
+        the given PID, which exited without stopping them. Actions are
+        told apart by their identifiers, which start with the PID of the
+        process which parsed them.
+
+        :param pid: PID of the worker process
+        :type pid: int
+        :returns: None
+        """
+        owned = [action for (action, _, _) in self._motion.values()
+                 if action['id'][0] == pid]
+        owned.extend(action for action in self._axes.values()
+                     if action['id'][0] == pid)
+        self._abandon_actions(owned)
+        ids = {key[1] for key in self._timers
+               if key[0] in ('hold', 'release', 'macro')}
+        ids.update(holder for holders in self._keys.values()
+                   for holder in holders)
+        self._release_actions({i for i in ids if i[0] == pid})
+
+    def _release_actions(self, ids):
+        """
+        Cancel the timers of the actions with the given identifiers and
+        release all keys they hold.
+
+        :param ids: identifiers of the actions to release
+        :type ids: set
+        :returns: None
+        """
+        for action_id in ids:
+            # Pending presses, repetitions and macro steps would never
+            # be cancelled; keys they pressed are released below
+            for kind in ('hold', 'release', 'macro'):
+                self._timers.cancel((kind, action_id))
+        for (code, holders) in list(self._keys.items()):
+            for holder in holders & ids:
+                self._uinput_key(code, 0, holder)
+
+    def _timer_hold(self, action, when):
+        """
+        Perform a delayed or repeated action whose hold time has elapsed
+        and, if the action is repeated, schedule its first repetition.
+
+        :param action: action to perform
+        :type action: dict
+        :param when: time at which the action was due
+        :type when: float
+        :returns: None
+        """
+        self._perform_once(action)
+        if action['repeat']:
+            # Repetitions share the timer key of the hold time, so that
+            # releasing the trigger cancels whichever one is pending
+            self._timers.schedule(
+                ('hold', action['id']), when + action['repeat_delay'],
+                ('repeat', action)
+            )
+
+    def _timer_repeat(self, action, when):
+        """
+        Perform the next repetition of a repeated action and schedule
+        the one after it.
+
+        :param action: action to perform
+        :type action: dict
+        :param when: time at which the repetition was due
+        :type when: float
+        :returns: None
+        """
+        self._perform_once(action)
+        # Keep a fixed rate, but don't try to catch up after stalls
+        next_time = max(when + action['repeat'], time.time())
+        self._timers.schedule(
+            ('hold', action['id']), next_time, ('repeat', action)
+        )
+
+    def _perform_once(self, action):
+        """
+        Perform a key, exec or macro action once, i.e. press and release
+        the key(s), run the program or start playing back the macro.
+
+        :param action: action to perform
+        :type action: dict
+        :returns: None
+        """
+        if action['type'] == 'key':
+            # Simulate a key press and queue its release in 30 ms to
+            # make the synthesized event semi-realistic; repeated keys
+            # need to be released before they are pressed again
+            delay = RELEASE_DELAY
+            if action['repeat']:
+                delay = min(delay, action['repeat'] / 2)
+            if self._timers.cancel(('release', action['id'])):
+                # The previous press has not been released yet
+                self._uinput_synthesize(action, press=False)
+            self._uinput_synthesize(action, press=True)
+            self._timers.schedule(
+                ('release', action['id']), time.time() + delay,
+                ('release', action)
+            )
+        elif action['type'] == 'exec':
+            self._execute_program(action)
+        elif action['type'] == 'macro':
+            self._start_macro(action)
+
+    def _start_macro(self, action):
+        """
+        Start playing back a macro from its first step. If the macro is
+        already being played back, that playback is cancelled and all
+        keys it pressed are released first.
+
+        :param action: macro action to start
+        :type action: dict
+        :returns: None
+        """
+        key = ('macro', action['id'])
+        playing = self._timers.get(key)
+        if playing:
+            (_, (_, index)) = playing
+            pressed = []
+            for (_, code, value) in action['steps'][:index]:
+                if value:
+                    pressed.append(code)
+                elif code in pressed:
+                    pressed.remove(code)
+            for code in pressed:
+                self._uinput_key(code, 0, action['id'])
+        self._timers.schedule(
+            key, time.time() + action['steps'][0][0], ('macro', (action, 0))
+        )
+
+    def _timer_macro(self, playback, when):
+        """
+        Perform the next step of a macro and schedule the one after it.
+
+        :param playback: *(action, index)* tuple specifying the macro
+            being played back and the index of the step to perform
+        :type playback: tuple
+        :param when: time at which the step was due
+        :type when: float
+        :returns: None
+        """
+        (action, index) = playback
+        steps = action['steps']
+        (_, code, value) = steps[index]
+        self._uinput_key(code, value, action['id'])
+        index += 1
+        if index < len(steps):
+            self._timers.schedule(
+                ('macro', action['id']), when + steps[index][0],
+                ('macro', (action, index))
+            )
+
+    def _timer_release(self, action, _):
+        """
+        Release the key(s) pressed by a delayed action.
+
+        :param action: action whose key(s) to release
+        :type action: dict
+        :returns: None
+        """
+        self._uinput_synthesize(action, press=False)
+
+    def _set_motion(self, action, velocity):
+        """
+        Update the pointer velocity requested by a mouse action and arm
+        the motion timer if the pointer should move.
+
+        :param action: mouse action
+        :type action: dict
+        :param velocity: requested velocity, in units per second
+        :type velocity: int
+        :returns: None
+        """
+        if velocity:
+            remainder = self._motion.get(action['id'], (None, 0, 0.0))[2]
+            self._motion[action['id']] = (action, velocity, remainder)
+            if ('motion', None) not in self._timers:
+                self._timers.schedule(
+                    ('motion', None), time.time() + 1 / MOUSE_RATE,
+                    ('motion', None)
+                )
+        else:
+            self._motion.pop(action['id'], None)
+            if not self._motion:
+                self._timers.cancel(('motion', None))
+
+    def _timer_motion(self, _, when):
+        """
+        Move the pointer according to the velocities requested by all
+        active mouse actions and rearm the motion timer for as long as
+        any of them is active. Fractional movement is carried over to
+        the next tick.
+
+        :param when: time at which the timer was due
+        :type when: float
+        :returns: None
+        """
+        moved = False
+        for (key, (action, velocity, remainder)) in self._motion.items():
+            delta = velocity / MOUSE_RATE + remainder
+            whole = int(delta)
+            self._motion[key] = (action, velocity, delta - whole)
+            if whole and self._can_inject(
+                    action['target_type'], action['target_code']):
+                self._uinput.write(
+                    action['target_type'], action['target_code'], whole
+                )
+                moved = True
+        if moved:
+            self._uinput.syn()
+        if self._motion:
+            # Keep a fixed rate, but don't try to catch up after stalls
+            next_tick = max(when + 1 / MOUSE_RATE, time.time())
+            self._timers.schedule(
+                ('motion', None), next_tick, ('motion', None)
+            )
+
+    def _uinput_synthesize(self, action, press):
+        """
+        Inject a fake key press into the input subsystem using uinput
+
+        :param action: action dictionary containing a `target` key which
+            specifies the key to synthesize
+        :type action: dict
+        :param press: whether to simulate a key press (`True`) or a key
+            release (`False`)
+        :type press: bool
+        :returns: None
+        """
+        keys = evmapy.util.as_list(action['target'])
+        for key in keys:
+            self._uinput_key(
+                evdev.ecodes.ecodes[key], int(press), action['id']
+            )
+
+    def _uinput_key(self, code, value, holder):
+        """
+        Inject a single key event into the input subsystem using uinput.
+        A key is held for as long as any action which pressed it has not
+        released it yet, so it is only pressed when its first holder
+        presses it and only released when its last holder releases it;
+        events which would not change the state of the key are skipped.
+
+        :param code: code of the key
+        :type code: int
+        :param value: 1 to press the key, 0 to release it
+        :type value: int
+        :param holder: identifier of the action pressing or releasing
+            the key
+        :type holder: tuple
+        :returns: None
+        """
+        # Rebuilding the uinput device presses all held keys again, so
+        # this has to happen before the state of the key is updated
+        injectable = self._can_inject(evdev.ecodes.ecodes['EV_KEY'], code)
+        holders = self._keys.get(code, set())
+        if value:
+            if holder in holders:
+                return
+            holders.add(holder)
+            self._keys[code] = holders
+            if len(holders) > 1:
+                return
+        else:
+            if holder not in holders:
+                return
+            holders.remove(holder)
+            if holders:
+                return
+            del self._keys[code]
+        if not injectable:
+            return
+        self._logger.debug("writing: key %d, value %d", code, value)
+        self._uinput.write(evdev.ecodes.ecodes['EV_KEY'], code, value)
+        self._uinput.syn()
+
+    def _uinput_move(self, action, value):
+        """
+        Inject an axis event into the input subsystem using uinput.
+
+        :param action: action dictionary containing the type and code of
+            the output axis
+        :type action: dict
+        :param value: value to set the output axis to (absolute axes) or
+            to move it by (relative axes)
+        :type value: int
+        :returns: None
+        """
+        if not self._can_inject(action['target_type'], action['target_code']):
+            return
+        self._uinput.write(action['target_type'], action['target_code'], value)
+        self._uinput.syn()
+
+    def _execute_program(self, action):
+        """
+        Run external program(s) associated with the given action.
+
+        Commands are spawned directly, without a shell, unless the
+        action explicitly requests one. Either way, each command is
+        waited for before the next one is run.
+
+        :param action: action dictionary containing a `commands` key
+            which specifies the command(s) to be run
+        :type action: dict
+        :returns: None
+        """
+        for command in action['commands']:
+            self._logger.debug("running: %r", command)
+            if action['shell']:
+                os.system(command)
+                continue
+            try:
+                pid = os.posix_spawnp(command[0], command, os.environ)
+            except OSError as exc:
+                self._logger.error(
+                    "unable to run '%s': %s", command[0], exc.strerror
+                )
+                continue
+            os.waitpid(pid, 0)
@@ -0,0 +1,200 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+:py:class:`Reader` and :py:class:`Handoff` class implementations
+"""
+
+import collections
+import os
+import select
+import threading
+import time
+
+import evmapy.source
+
+
+class Handoff(object):
+
+    """
+    Class passing actions generated by :py:class:`Reader` threads to the
+    thread running a :py:class:`evmapy.multiplexer.Multiplexer` loop.
+    Actions are stored in a queue and a byte is written to a pipe
+    whenever the queue is appended to, which enables a
+    :py:class:`Handoff` instance to be used directly with
+    :py:meth:`select.poll.poll()`.
+
+    :param on_removed: function to call with a
+        :py:class:`evmapy.source.Source` instance as its sole argument
+        when the input device associated with it gets disconnected
+    :type on_removed: callable
+    """
+
+    def __init__(self, on_removed):
+        self._on_removed = on_removed
+        self._records = collections.deque()
+        (self._read_fd, self._write_fd) = os.pipe()
+        for fdesc in (self._read_fd, self._write_fd):
+            os.set_blocking(fdesc, False)
+
+    def fileno(self):
+        """
+        Return the file descriptor of the reading end of the wakeup
+        pipe.
+
+        :returns: file descriptor of the reading end of the wakeup pipe
+        :rtype: int
+        """
+        return self._read_fd
+
+    def put(self, source, actions):
+        """
+        Queue actions generated by the given source.
+
+        :param source: source which generated the actions
+        :type source: evmapy.source.Source
+        :param actions: list of actions to be performed or `None` if the
+            input device associated with the source got disconnected
+        :type actions: list
+        :returns: None
+        """
+        self._records.append((source, actions))
+        try:
+            os.write(self._write_fd, b'\0')
+        except BlockingIOError:
+            # The pipe is full, so a wakeup is already pending
+            pass
+
+    def process(self):
+        """
+        Return all queued actions, in the order they were queued in.
+
+        :returns: list of actions to be performed
+        :rtype: list
+        """
+        try:
+            while os.read(self._read_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        pending = []
+        while self._records:
+            (source, actions) = self._records.popleft()
+            if actions is None:
+                self._on_removed(source)
+            else:
+                pending.extend(actions)
+        return pending
+
+    def cleanup(self):
+        """
+        Close the wakeup pipe.
+
+        :returns: None
+        """
+        os.close(self._read_fd)
+        os.close(self._write_fd)
+
+
+class Reader(threading.Thread):
+
+    """
+    Thread reading and processing events emitted by the input device
+    associated with the given :py:class:`evmapy.source.Source` and
+    passing the resulting actions to the given :py:class:`Handoff`.
+
+    :param source: source to process events of
+    :type source: evmapy.source.Source
+    :param handoff: object to pass the resulting actions to
+    :type handoff: Handoff
+    """
+
+    def __init__(self, source, handoff):
+        super().__init__(name=source.device['path'], daemon=True)
+        self._source = source
+        self._handoff = handoff
+        self._lock = threading.Lock()
+        (self._stop_read_fd, self._stop_write_fd) = os.pipe()
+
+    def run(self):
+        """
+        Wait for events to be emitted by the input device and process
+        them until the device gets disconnected or :py:meth:`stop()` is
+        called. Changes of debounced buttons held back by the source are
+        reported once their debounce windows end, even if no further
+        events are emitted.
+
+        :returns: None
+        """
+        fds = [self._source.device['fd'], self._stop_read_fd]
+        while True:
+            with self._lock:
+                deadline = self._source.deadline
+            if deadline is None:
+                timeout = None
+            else:
+                timeout = max(0, deadline - time.time())
+            (readable, _, _) = select.select(fds, [], [], timeout)
+            if self._stop_read_fd in readable:
+                return
+            actions = []
+            with self._lock:
+                try:
+                    if readable:
+                        actions.extend(self._source.process())
+                        while self._source.pending:
+                            actions.extend(self._source.process())
+                    deadline = self._source.deadline
+                    if deadline is not None:
+                        now = time.time()
+                        if not readable:
+                            # select() timed out, so the window has ended
+                            # even if the clock disagrees due to rounding
+                            now = max(now, deadline)
+                        actions.extend(self._source.settle(now))
+                except evmapy.source.DeviceRemovedException:
+                    self._handoff.put(self._source, None)
+                    return
+            if actions:
+                self._handoff.put(self._source, actions)
+
+    def load_config(self, name=None):
+        """
+        Load configuration for the associated source once it is not
+        processing any events.
+
+        :param name: name of the configuration file to load
+        :type name: str
+        :returns: None
+        :raises evmapy.config.ConfigError: if an error occurred while
+            loading the specified configuration file
+        """
+        with self._lock:
+            self._source.load_config(name)
+
+    def stop(self):
+        """
+        Stop the thread and wait for it to finish.
+
+        :returns: None
+        """
+        os.write(self._stop_write_fd, b'\0')
+        self.join()
+        os.close(self._stop_read_fd)
+        os.close(self._stop_write_fd)
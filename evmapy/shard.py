@@ -0,0 +1,185 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Classes used for distributing input devices among worker processes
+"""
+
+import pickle
+import re
+import socket
+import zlib
+
+
+class LinkClosedException(Exception):
+    """
+    Exception raised when the process at the other end of a
+    :py:class:`Link` exits.
+    """
+    pass
+
+
+def get_shard(dev_path, shards):
+    """
+    Return the index of the worker process which should handle the
+    device under the given path.
+
+    :param dev_path: path to the device to assign to a worker process
+    :type dev_path: str
+    :param shards: number of worker processes
+    :type shards: int
+    :returns: index of the worker process to handle the device
+    :rtype: int
+    """
+    # Spread /dev/input/eventX devices evenly using their numbers
+    match = re.search(r'(\d+)$', dev_path)
+    if match:
+        return int(match.group(1)) % shards
+    return zlib.crc32(dev_path.encode()) % shards
+
+
+class Link(object):
+
+    """
+    Class representing one end of a connection between the coordinating
+    process and a worker process. Messages are tuples whose first
+    element is the name of the message; those received are processed by
+    the `do_<name>` method of the given target.
+
+    :param sock: connected socket to use
+    :type sock: socket.socket
+    :param target: object processing received messages
+    :param pid: PID of the process at the other end of the link, if
+        it is a child of the current process
+    :type pid: int
+    """
+
+    def __init__(self, sock, target, pid=None):
+        self._socket = sock
+        self._target = target
+        self.pid = pid
+
+    @classmethod
+    def pair(cls):
+        """
+        Return a pair of connected sockets suitable for creating a
+        :py:class:`Link` in both the coordinating process and a worker
+        process.
+
+        :returns: pair of connected sockets
+        :rtype: tuple
+        """
+        return socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+
+    def fileno(self):
+        """
+        Return the socket's file descriptor. This enables a
+        :py:class:`Link` instance to be used directly with
+        :py:meth:`select.poll.poll()`.
+
+        :returns: socket's file descriptor
+        :rtype: int
+        """
+        return self._socket.fileno()
+
+    def send(self, *message):
+        """
+        Send a message to the process at the other end of the link.
+
+        :param message: message name followed by its arguments
+        :returns: None
+        """
+        self._socket.send(pickle.dumps(message))
+
+    def process(self):
+        """
+        Receive and process a message sent by the process at the other
+        end of the link.
+
+        :returns: list of actions to be performed
+        :rtype: list
+        :raises LinkClosedException: when the process at the other end
+            of the link exits
+        """
+        data = self._socket.recv(1 << 20)
+        if not data:
+            raise LinkClosedException()
+        (name, *args) = pickle.loads(data)
+        retval = getattr(self._target, 'do_' + name)(self, *args)
+        return retval or []
+
+    def close(self):
+        """
+        Close the link.
+
+        :returns: None
+        """
+        self._socket.close()
+
+
+class RemoteSource(object):
+
+    """
+    Class representing an :py:class:`evmapy.source.Source` instance
+    living in a worker process.
+
+    :param link: link to the worker process handling the device
+    :type link: Link
+    :param device: device information as provided by
+        :py:attr:`evmapy.source.Source.device`
+    :type device: dict
+    """
+
+    def __init__(self, link, device):
+        self._link = link
+        self.device = device
+
+    @property
+    def actions(self):
+        """
+        Return the actions configured for the device. These are stopped
+        by the worker process itself, so nothing is returned.
+
+        :returns: empty list
+        :rtype: list
+        """
+        return []
+
+    @property
+    def capabilities(self):
+        """
+        Return the types and codes of the output events which actions
+        configured for the device may cause to be injected. These are
+        reported by the worker process itself, so nothing is returned.
+
+        :returns: empty dictionary
+        :rtype: dict
+        """
+        return {}
+
+    def load_config(self, name=None):
+        """
+        Ask the worker process to load configuration from the given
+        file.
+
+        :param name: name of the configuration file to load
+        :type name: str
+        :returns: None
+        """
+        self._link.send('config', self.device['path'], name)
@@ -21,8 +21,12 @@
 :py:class:`Source` class implementation
 """
 
+import bisect
+import collections
 import errno
 import logging
+import os
+import struct
 
 import evdev
 
@@ -30,6 +34,11 @@ import evmapy.config
 import evmapy.util
 
 
+# Layout of struct input_event, used for forwarding events to uinput
+# devices in bulk
+_INPUT_EVENT = struct.Struct('llHHi')
+
+
 class DeviceRemovedException(Exception):
     """
     Exception raised when the associated input device gets disconnected.
@@ -46,21 +55,81 @@ class Source(object):
 
     :param device: input device to use
     :type device: evdev.InputDevice
+    :param default_config: name of the default configuration file for
+        the input device (`None` causes the name of the input device to
+        be used for determining it)
+    :type default_config: str
+    :param state: runtime state exported by another instance using
+        :py:meth:`export_state()` (if given, it is used instead of
+        loading the default configuration file)
+    :type state: dict
+    :param passthrough: passthrough device created by the instance which
+        exported `state`, if any
+    :type passthrough: evmapy.handover.AdoptedUInput
     """
 
-    def __init__(self, device):
+    def __init__(self, device, default_config=None, state=None,
+                 passthrough=None):
         self.device = {
             'fd':   device.fd,
             'name': device.name,
             'path': device.fn,
         }
         self._device = device
+        self._default_config = default_config
         self._config = {}
         self._raw_config = None
         self._grabbed = False
         self._event_history = [None, None]
+        self._queue = collections.deque()
+        self._dropped = False
+        self._frame = {}
+        self._held_back = set()
+        self._subscriptions = {}
+        self._passthrough = None
+        self._mapped = set()
+        self._forwarded = set()
+        self._outbox = []
         self._logger = logging.getLogger()
-        self.load_config()
+        if state:
+            self._default_config = state['default_config']
+            self._config = state['config']
+            self._raw_config = state['raw_config']
+            self._grabbed = state['grabbed']
+            self._event_history = state['event_history']
+            self._queue = state['queue']
+            self._dropped = state['dropped']
+            self._frame = state['frame']
+            self._held_back = state['held_back']
+            self._outbox = state['outbox']
+            if passthrough:
+                self._passthrough = passthrough
+                self._forwarded = state['forwarded']
+            self._setup_passthrough()
+        else:
+            self.load_config()
+
+    def export_state(self):
+        """
+        Return the runtime state of this source, enabling another
+        instance to continue processing events where this one stopped.
+
+        :returns: runtime state of this source
+        :rtype: dict
+        """
+        return {
+            'default_config':   self._default_config,
+            'config':           self._config,
+            'raw_config':       self._raw_config,
+            'grabbed':          self._grabbed,
+            'event_history':    self._event_history,
+            'queue':            self._queue,
+            'dropped':          self._dropped,
+            'frame':            self._frame,
+            'held_back':        self._held_back,
+            'outbox':           self._outbox,
+            'forwarded':        self._forwarded,
+        }
 
     def load_config(self, name=None):
         """
@@ -74,8 +143,10 @@ class Source(object):
             loading the specified configuration file
         """
         (self._config, self._raw_config) = evmapy.config.load(
-            self._device, name, self._raw_config
+            self._device, name or self._default_config, self._raw_config
         )
+        self._held_back = set()
+        self._seed_state()
         if self._config['grab'] is True and self._grabbed is False:
             self._device.grab()
             self._grabbed = True
@@ -84,10 +155,198 @@ class Source(object):
             self._device.ungrab()
             self._grabbed = False
             self._logger.info("%s: device ungrabbed", self.device['path'])
+        self._setup_passthrough()
+
+    def _setup_passthrough(self):
+        """
+        Create or destroy the uinput device which events not triggering
+        any action are forwarded to, as requested by the current
+        configuration.
+
+        :returns: None
+        """
+        if not self._config['passthrough']:
+            self.cleanup()
+            return
+        if not self._passthrough:
+            try:
+                self._passthrough = evdev.UInput.from_device(
+                    self._device, name='%s (passthrough)' % self.device['name']
+                )
+            except evdev.uinput.UInputError as exc:
+                self._logger.warning(
+                    "%s: passthrough will not be possible: %s",
+                    self.device['path'], str(exc)
+                )
+                return
+            self._logger.info(
+                "%s: passthrough enabled", self.device['path']
+            )
+        self._update_mapped()
+
+    def _update_mapped(self):
+        """
+        Update the set of *(type, code)* tuples identifying input events
+        which should not be forwarded to the passthrough device, i.e.
+        those which trigger actions in the current layer or cross-device
+        combos.
+
+        :returns: None
+        """
+        mapped = set(self._config['mapped'])
+        subscribed = {name.split(':', 1)[0] for name in self._subscriptions}
+        for (key, event_info) in self._config['events'].items():
+            if event_info['name'] in subscribed:
+                mapped.add(key)
+        self._mapped = mapped
+
+    def cleanup(self):
+        """
+        Destroy the passthrough device, if any. Keys forwarded to it are
+        released by the kernel.
+
+        :returns: None
+        """
+        if self._passthrough:
+            self._passthrough.close()
+            self._passthrough = None
+            self._forwarded.clear()
+            self._outbox = []
+
+    def subscribe(self, subscriptions):
+        """
+        Start reporting state changes of the given events, which trigger
+        cross-device combos.
+
+        :param subscriptions: dictionary mapping normalized event names
+            to *edge* actions, as returned by
+            :py:meth:`evmapy.combo.ComboIndex.subscriptions()`
+        :type subscriptions: dict
+        :returns: None
+        """
+        self._subscriptions = subscriptions
+        if self._passthrough:
+            self._update_mapped()
+
+    @property
+    def edges(self):
+        """
+        Return the *edge* actions reported by this source.
+
+        :returns: list of *edge* actions
+        :rtype: list
+        """
+        return list(self._subscriptions.values())
+
+    @property
+    def actions(self):
+        """
+        Return all actions configured for the input device, in all
+        layers.
+
+        :returns: list of actions
+        :rtype: list
+        """
+        actions = {}
+        for table in self._config['tables'].values():
+            for action in table['actions']:
+                actions[action['id']] = action
+        return list(actions.values())
+
+    @property
+    def passthrough(self):
+        """
+        Return the uinput device which events not triggering any action
+        are forwarded to.
+
+        :returns: passthrough device or `None` if passthrough is disabled
+        :rtype: evdev.UInput
+        """
+        return self._passthrough
+
+    @property
+    def capabilities(self):
+        """
+        Return the types and codes of the output events which actions
+        configured for the input device may cause to be injected.
+
+        :returns: dictionary mapping output event types to sets of event
+            codes
+        :rtype: dict
+        """
+        return self._config['capabilities']
+
+    @property
+    def pending(self):
+        """
+        Return whether any events read from the input device are still
+        waiting to be processed.
+
+        :returns: whether any events are waiting to be processed
+        :rtype: bool
+        """
+        return len(self._queue) > 0
+
+    @property
+    def priority(self):
+        """
+        Return the priority with which events emitted by the input
+        device should be processed.
+
+        :returns: priority of the input device (higher values are
+            processed first)
+        :rtype: int
+        """
+        return self._config['priority']
+
+    @property
+    def deadline(self):
+        """
+        Return the time at which the first debounce window of a button
+        whose last change is being held back ends, i.e. when
+        :py:meth:`settle()` should be called.
+
+        :returns: time in seconds since the epoch or `None` if no change
+            is being held back
+        :rtype: float
+        """
+        if not self._held_back:
+            return None
+        events = self._config['events']
+        return min(events[key]['until'] for key in self._held_back) / 1000000
+
+    def settle(self, now):
+        """
+        Translate changes of debounced buttons which were held back until
+        the end of their debounce windows into actions to be performed,
+        so that e.g. the release ending a tap shorter than the window is
+        not lost while no further events arrive.
+
+        :param now: current time, in seconds since the epoch
+        :type now: float
+        :returns: list of actions to be performed
+        :rtype: list
+        """
+        timestamp = round(now * 1000000)
+        pending = []
+        events = self._config['events']
+        for key in sorted(self._held_back):
+            changes = self._settle_button(events[key], timestamp)
+            if changes:
+                self._held_back.discard(key)
+                pending.extend(self._dispatch(key, changes))
+        return pending
 
     def process(self):
         """
-        Translate input events into actions to be performed.
+        Translate input events into actions to be performed. No more
+        than the configured number of events is processed in a single
+        call; the remaining ones are kept queued until the next call.
+        Movement of relative axes is summed up until the end of each
+        frame, so that devices reporting it at high rates only cause
+        one lookup per axis per frame. If passthrough is enabled, events
+        which do not trigger any action are forwarded to the passthrough
+        device one frame at a time.
 
         :returns: list of actions to be performed
         :rtype: list
@@ -95,84 +354,557 @@ class Source(object):
         pending = []
         for event in self._pending_events():
             self._logger.debug(event)
-            supported_events = [
-                evdev.ecodes.ecodes['EV_ABS'],
-                evdev.ecodes.ecodes['EV_KEY'],
-            ]
-            if event.type not in supported_events:
+            if event.type == evdev.ecodes.ecodes['EV_SYN']:
+                if event.code == evdev.ecodes.ecodes['SYN_DROPPED']:
+                    self._logger.warning(
+                        "%s: events dropped, resynchronizing",
+                        self.device['path']
+                    )
+                    self._dropped = True
+                    self._frame.clear()
+                    self._outbox = []
+                elif event.code == evdev.ecodes.ecodes['SYN_REPORT']:
+                    if self._dropped:
+                        # End of the incomplete frame
+                        self._dropped = False
+                        pending.extend(self._synchronize(event))
+                    else:
+                        pending.extend(self._end_frame())
+                        self._flush_outbox()
                 continue
-            (event_name, event_active) = self._normalize_event(event)
-            if not event_name:
+            if self._dropped:
                 continue
+            if self._passthrough:
+                self._forward(event)
+            pending.extend(self._process_event(event))
+        return pending
+
+    def _process_event(self, event):
+        """
+        Translate a single input event into actions to be performed.
+
+        :param event: event to process
+        :type event: evdev.events.InputEvent
+        :returns: list of actions to be performed
+        :rtype: list
+        """
+        pending = []
+        supported_events = [
+            evdev.ecodes.ecodes['EV_ABS'],
+            evdev.ecodes.ecodes['EV_KEY'],
+        ]
+        if event.type == evdev.ecodes.ecodes['EV_REL']:
+            if (event.type, event.code) in self._config['events']:
+                self._frame[event.code] = (
+                    self._frame.get(event.code, 0) + event.value
+                )
+            return pending
+        if event.type not in supported_events:
+            return pending
+        if event.type == evdev.ecodes.ecodes['EV_ABS']:
+            pending.extend(self._process_analog(event))
+        pending.extend(self._dispatch(
+            (event.type, event.code), self._normalize_event(event)
+        ))
+        return pending
+
+    def _end_frame(self):
+        """
+        Translate the movement of relative axes summed up during the
+        frame which just ended into actions to be performed.
+
+        :returns: list of actions to be performed
+        :rtype: list
+        """
+        pending = []
+        for (code, delta) in sorted(self._frame.items()):
+            key = (evdev.ecodes.ecodes['EV_REL'], code)
+            if delta:
+                pending.extend(self._dispatch(
+                    key, self._normalize_relative(
+                        self._config['events'][key], delta
+                    )
+                ))
+        self._frame.clear()
+        return pending
+
+    def _forward(self, event):
+        """
+        Queue the given event for forwarding to the passthrough device
+        unless it triggers any action. Releases of keys whose presses
+        were forwarded are always forwarded, so that switching layers or
+        loading configuration never leaves a key stuck.
+
+        :param event: event to forward
+        :type event: evdev.events.InputEvent
+        :returns: None
+        """
+        if event.type == evdev.ecodes.ecodes['EV_KEY']:
+            if event.value == evdev.KeyEvent.key_hold:
+                # The passthrough device repeats keys by itself
+                return
+            if event.code in self._forwarded:
+                if not event.value:
+                    self._forwarded.discard(event.code)
+                    self._outbox.append(event)
+                return
+            if (event.type, event.code) in self._mapped:
+                return
+            if event.value:
+                self._forwarded.add(event.code)
+        elif (event.type, event.code) in self._mapped:
+            return
+        self._outbox.append(event)
+
+    def _flush_outbox(self):
+        """
+        Write all events queued for forwarding, followed by a
+        *SYN_REPORT* event, to the passthrough device in a single
+        system call.
+
+        :returns: None
+        """
+        if not self._outbox:
+            return
+        self._outbox.append(evdev.events.InputEvent(
+            0, 0, evdev.ecodes.ecodes['EV_SYN'],
+            evdev.ecodes.ecodes['SYN_REPORT'], 0
+        ))
+        os.write(self._passthrough.fd, b''.join(
+            _INPUT_EVENT.pack(e.sec, e.usec, e.type, e.code, e.value)
+            for e in self._outbox
+        ))
+        self._outbox = []
+
+    def _dispatch(self, key, changes):
+        """
+        Translate state changes of the event with the given type and
+        code into actions to be performed.
+
+        :param key: *(type, code)* tuple of the input event
+        :type key: tuple
+        :param changes: list of *(event name, event state)* tuples
+        :type changes: list
+        :returns: list of actions to be performed
+        :rtype: list
+        """
+        pending = []
+        for (event_name, event_active) in changes:
             if event_active:
                 self._event_history[0] = self._event_history[1]
                 self._event_history[1] = event_name
-            for action in self._config['map'][event.code]:
-                pending.extend(
-                    self._process_action(action, event_name, event_active)
-                )
+            for action in self._config['map'][key]:
+                for (result, start) in self._process_action(
+                        action, event_name, event_active):
+                    if result['type'] == 'layer':
+                        pending.extend(self._switch_layer(result, start))
+                    else:
+                        pending.append((result, start))
+            edge = self._subscriptions.get(event_name)
+            if edge:
+                pending.append((edge, event_active))
         return pending
 
-    def _pending_events(self):
+    def _switch_layer(self, action, start):
         """
-        Return a generator yielding pending input events and raising an
-        exception if the device is no longer available.
+        Activate or deactivate the layer targeted by the given layer
+        switching action. Momentary layers are active for as long as
+        the action is; toggled layers are switched on and off by
+        subsequent starts of the action.
 
-        :returns: generator yielding pending input events
-        :rtype: generator
+        :param action: layer switching action
+        :type action: dict
+        :param start: whether the action was started or stopped
+        :type start: bool
+        :returns: list of actions to be performed
+        :rtype: list
+        """
+        current = self._config['layer']
+        if action['toggle']:
+            if not start:
+                return []
+            layer = None if current == action['target'] else action['target']
+        elif start:
+            layer = action['target']
+        elif current == action['target']:
+            layer = None
+        else:
+            return []
+        return self._activate_layer(layer)
+
+    def _activate_layer(self, layer):
+        """
+        Swap the dispatch tables of the current configuration for those
+        of the given layer and stop all running actions which can no
+        longer be stopped by the events triggering them. Trigger state
+        is retained, so keys held while switching layers are still
+        considered to be held, except that actions which were shadowed
+        by the previous layer forget triggers released in the meantime,
+        as they could not see these releases.
+
+        :param layer: name of the layer to activate (`None` activates
+            the base layer)
+        :type layer: str
+        :returns: list of actions to be performed
+        :rtype: list
+        """
+        old = self._config['tables'][self._config['layer']]
+        new = self._config['tables'][layer]
+        self._config['layer'] = layer
+        self._config['map'] = new['map']
+        self._config['analog'] = new['analog']
+        self._config['mapped'] = new['mapped']
+        if self._passthrough:
+            self._update_mapped()
+        self._logger.debug(
+            "%s: activated layer %s", self.device['path'], layer
+        )
+        pending = []
+        for action in old['actions']:
+            if action['id'] in new['ids'] or action['type'] == 'layer':
+                continue
+            if action['type'] in ('axis', 'mouse'):
+                if action['value']:
+                    action['value'] = 0
+                    pending.append((action, 0))
+            elif action['mode'] == 'sequence':
+                if action['sequence_done']:
+                    action['sequence_done'] = False
+                    pending.append((action, False))
+            elif action['mode'] == 'any':
+                if any(action['trigger_active']):
+                    pending.append((action, False))
+            elif all(action['trigger_active']):
+                pending.append((action, False))
+        active = self._active_events()
+        for action in new['actions']:
+            if action['id'] in old['ids']:
+                continue
+            if action['type'] in ('axis', 'mouse'):
+                continue
+            if action['mode'] != 'sequence':
+                action['trigger_active'] = [
+                    was_active and trigger in active for (trigger, was_active)
+                    in zip(action['trigger'], action['trigger_active'])
+                ]
+        return pending
+
+    def _active_events(self):
+        """
+        Return the normalized names of all currently active events.
+
+        :returns: set of normalized event names
+        :rtype: set
+        """
+        active = set()
+        for event_info in self._config['events'].values():
+            if 'threshold' in event_info:
+                # Relative axis events are only active momentarily
+                continue
+            if 'zone' in event_info:
+                zone_name = event_info['zone_names'][event_info['zone']]
+                if zone_name:
+                    active.add(event_info['name'] + ':' + zone_name)
+            elif event_info['previous']:
+                active.add(event_info['name'])
+        return active
+
+    def _process_analog(self, event):
+        """
+        Translate an axis event into output axis values using the
+        precomputed lookup tables of all actions triggered by that axis.
+
+        :param event: axis event to process
+        :type event: evdev.events.InputEvent
+        :returns: list of *(action, value)* tuples
+        :rtype: list
+        """
+        pending = []
+        for (action, lut, minimum) in self._config['analog'].get(
+                (event.type, event.code), ()):
+            index = min(max(event.value - minimum, 0), len(lut) - 1)
+            value = lut[index]
+            # Relative axes report movement, so keep reporting it for
+            # as long as the input axis is deflected
+            if value != action['value'] or (action['relative'] and value):
+                action['value'] = value
+                pending.append((action, value))
+        return pending
+
+    def _seed_state(self):
+        """
+        Bring the state of the freshly loaded configuration in line with
+        the current state of the input device, so that keys held and
+        axes deflected while the configuration was loaded neither cause
+        nor prevent any action from being performed.
+
+        :returns: None
+        :raises DeviceRemovedException: when the input device is no
+            longer available
+        """
+        for event in self._query_state():
+            self._process_event(event)
+        self._event_history = [None, None]
+
+    def _synchronize(self, report):
+        """
+        Query the input device for the current state of all its keys and
+        axes and generate the actions which would have been caused by the
+        events lost due to an event buffer overrun.
+
+        :param report: event ending the incomplete frame, used for
+            timestamping synthesized events
+        :type report: evdev.events.InputEvent
+        :returns: list of actions to be performed
+        :rtype: list
         :raises DeviceRemovedException: when the input device is no
             longer available
         """
+        pending = []
+        self._event_history = [None, None]
+        for event in self._query_state(report.sec, report.usec):
+            if self._passthrough:
+                self._forward(event)
+            pending.extend(self._process_event(event))
+        self._flush_outbox()
+        return pending
+
+    def _query_state(self, sec=0, usec=0):
+        """
+        Return a list of synthesized events which represent the
+        differences between the current state of the input device and the
+        state last seen by this source.
+
+        :param sec: seconds part of synthesized events' timestamps
+        :type sec: int
+        :param usec: microseconds part of synthesized events' timestamps
+        :type usec: int
+        :returns: list of synthesized events
+        :rtype: list
+        :raises DeviceRemovedException: when the input device is no
+            longer available
+        """
+        ev_abs = evdev.ecodes.ecodes['EV_ABS']
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
         try:
-            for event in self._device.read():
-                yield event
+            active_keys = set(self._device.active_keys())
+            axes = self._query_axes()
         except OSError as exc:
             if exc.errno == errno.ENODEV:
                 raise DeviceRemovedException()
             else:
                 raise
+        events = []
+        for ((etype, code), event_info) in sorted(
+                self._config['events'].items()):
+            if etype == ev_abs:
+                if code not in axes:
+                    continue
+                value = axes[code]
+            elif etype == ev_key:
+                value = int(code in active_keys)
+            else:
+                # Relative axes have no state to query
+                continue
+            if value != event_info['previous']:
+                events.append(
+                    evdev.events.InputEvent(sec, usec, etype, code, value)
+                )
+        # Releases of keys forwarded to the passthrough device may have
+        # been lost as well
+        for code in sorted(self._forwarded - active_keys):
+            if (ev_key, code) not in self._config['events']:
+                events.append(
+                    evdev.events.InputEvent(sec, usec, ev_key, code, 0)
+                )
+        return events
+
+    def _query_axes(self):
+        """
+        Query the input device for the current values of all configured
+        axes. Each axis is queried separately, as the axis information
+        returned by :py:meth:`evdev.InputDevice.capabilities()` is only
+        read when the input device is opened.
+
+        :returns: dictionary mapping axis codes to their current values
+        :rtype: dict
+        :raises OSError: when the input device cannot be queried
+        """
+        axes = {}
+        for (etype, code) in self._config['events']:
+            if etype != evdev.ecodes.ecodes['EV_ABS']:
+                continue
+            try:
+                axes[code] = self._device.absinfo(code).value
+            except OSError as exc:
+                if exc.errno != errno.EINVAL:
+                    raise
+                # The input device does not report this axis
+        return axes
+
+    def _pending_events(self):
+        """
+        Return a generator yielding at most `budget` pending input events
+        and raising an exception if the device is no longer available.
+        The input device is only read from once all previously read
+        events have been processed.
+
+        :returns: generator yielding pending input events
+        :rtype: generator
+        :raises DeviceRemovedException: when the input device is no
+            longer available
+        """
+        if not self._queue:
+            try:
+                self._queue.extend(self._device.read())
+            except OSError as exc:
+                if exc.errno == errno.ENODEV:
+                    raise DeviceRemovedException()
+                else:
+                    raise
+        budget = self._config['budget']
+        while self._queue and budget > 0:
+            budget -= 1
+            yield self._queue.popleft()
 
     def _normalize_event(self, event):
         """
-        Translate an event structure into a tuple containing the
-        normalized name of the event and its new state (active or not).
+        Translate an event structure into a list of tuples, each of
+        which contains the normalized name of an event and its new state
+        (active or not). An axis event causes the zone it left to become
+        inactive and the zone it entered to become active.
 
         :param event: event to process
         :type event: evdev.events.InputEvent
-        :returns: normalized event name and event state
-        :rtype: tuple
+        :returns: list of *(event name, event state)* tuples
+        :rtype: list
         """
-        retval = (None, None)
+        retval = []
+        key = (event.type, event.code)
         try:
-            event_info = self._config['events'][event.code]
+            event_info = self._config['events'][key]
         except KeyError:
             return retval
         name = event_info['name']
         previous = event_info['previous']
         current = event.value
-        if 'min' in event_info and 'max' in event_info:
+        if 'zone' in event_info:
             # Axis event
-            minimum = event_info['min']
-            maximum = event_info['max']
-            if previous > minimum and current <= minimum:
-                retval = (name + ':min', True)
-            elif previous <= minimum and current > minimum:
-                retval = (name + ':min', False)
-            elif previous < maximum and current >= maximum:
-                retval = (name + ':max', True)
-            elif previous >= maximum and current < maximum:
-                retval = (name + ':max', False)
+            zone = self._find_zone(event_info, current)
+            if zone != event_info['zone']:
+                names = event_info['zone_names']
+                if names[event_info['zone']]:
+                    retval.append(
+                        (name + ':' + names[event_info['zone']], False)
+                    )
+                if names[zone]:
+                    retval.append((name + ':' + names[zone], True))
+                event_info['zone'] = zone
         else:
             # Button event
             if current == evdev.KeyEvent.key_hold:
                 return retval
-            elif current > previous:
-                retval = (name, True)
+            if event_info['debounce']:
+                timestamp = event.sec * 1000000 + event.usec
+                # A change held back until the end of the previous window
+                # has to be reported before the current one
+                retval.extend(self._settle_button(event_info, timestamp))
+                previous = event_info['previous']
+                event_info['raw'] = current
+                if timestamp < event_info['until'] or current == previous:
+                    # Switch bounce or a change to be reported once the
+                    # window ends
+                    if current == previous:
+                        self._held_back.discard(key)
+                    else:
+                        self._held_back.add(key)
+                    return retval
+                event_info['until'] = timestamp + event_info['debounce']
+                self._held_back.discard(key)
+            if current > previous:
+                retval.append((name, True))
             else:
-                retval = (name, False)
+                retval.append((name, False))
         event_info['previous'] = current
         return retval
 
+    @staticmethod
+    def _settle_button(event_info, timestamp):
+        """
+        Translate the change of the given debounced button which was
+        held back until the end of its debounce window into a list of
+        tuples, each of which contains the normalized name of an event
+        and its new state. The list is empty unless the button's state
+        differs from the one last reported and the window has ended by
+        the given time.
+
+        :param event_info: button event to settle
+        :type event_info: dict
+        :param timestamp: current time, in microseconds
+        :type timestamp: int
+        :returns: list of *(event name, event state)* tuples
+        :rtype: list
+        """
+        if event_info['raw'] == event_info['previous']:
+            return []
+        if timestamp < event_info['until']:
+            return []
+        event_info['previous'] = event_info['raw']
+        return [(event_info['name'], bool(event_info['raw']))]
+
+    @staticmethod
+    def _normalize_relative(event_info, delta):
+        """
+        Add the given movement of a relative axis to the movement
+        accumulated so far and translate every full threshold crossed
+        into a pair of tuples, each of which contains the normalized
+        name of an event and its new state, reporting a momentary
+        activation of that event. Movement accumulated in one direction
+        is discarded when the axis starts moving in the other one.
+
+        :param event_info: relative axis event to process
+        :type event_info: dict
+        :param delta: movement of the axis during the last frame
+        :type delta: int
+        :returns: list of *(event name, event state)* tuples
+        :rtype: list
+        """
+        accumulated = event_info['accumulated']
+        if (accumulated > 0) != (delta > 0):
+            accumulated = 0
+        accumulated += delta
+        (crossed, remainder) = divmod(
+            abs(accumulated), event_info['threshold']
+        )
+        event_info['accumulated'] = remainder if delta > 0 else -remainder
+        direction = evmapy.config.RELATIVE_DIRECTIONS[int(delta > 0)]
+        name = event_info['name'] + ':' + direction
+        return [(name, True), (name, False)] * crossed
+
+    @staticmethod
+    def _find_zone(event_info, value):
+        """
+        Return the index of the zone of the given axis which the given
+        value belongs to. The current zone is only left once the value
+        gets past its boundary by more than the configured hysteresis.
+
+        :param event_info: axis event to find the zone of
+        :type event_info: dict
+        :param value: axis value
+        :type value: int
+        :returns: index of the zone the value belongs to
+        :rtype: int
+        """
+        thresholds = event_info['thresholds']
+        current = event_info['zone']
+        zone = bisect.bisect_left(thresholds, value)
+        hysteresis = event_info['hysteresis']
+        if zone > current and value - hysteresis <= thresholds[current]:
+            zone = current
+        elif zone < current and value + hysteresis > thresholds[current - 1]:
+            zone = current
+        return zone
+
     def _process_action(self, action, event_name, event_active):
         """
         Process the given event in the context of the given action.
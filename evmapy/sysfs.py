@@ -0,0 +1,115 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Functions enumerating input devices using sysfs
+"""
+
+import glob
+import os
+import re
+
+import evdev
+
+
+SYSFS_INPUT_DIR = '/sys/class/input'
+DEV_INPUT_DIR = '/dev/input'
+
+
+def _read_attribute(device_dir, attribute):
+    """
+    Return the contents of the given sysfs attribute file, stripped of
+    surrounding whitespace.
+
+    :param device_dir: sysfs directory of the input device
+    :type device_dir: str
+    :param attribute: path to the attribute file, relative to
+        `device_dir`
+    :type attribute: str
+    :returns: contents of the attribute file (an empty string if it
+        can't be read)
+    :rtype: str
+    """
+    try:
+        with open(os.path.join(device_dir, attribute)) as attribute_file:
+            return attribute_file.read().strip()
+    except OSError:
+        return ''
+
+
+def _event_number(path):
+    """
+    Return the number of the given event device node, used for sorting.
+
+    :param path: path to an event device node or its sysfs directory
+    :type path: str
+    :returns: number of the event device node
+    :rtype: int
+    """
+    match = re.search(r'(\d+)$', path)
+    return int(match.group(1)) if match else -1
+
+
+def read_device(class_dir):
+    """
+    Return information about the input device whose event node is
+    represented by the given sysfs directory, without opening the event
+    node itself.
+
+    :param class_dir: sysfs directory of the event node, e.g.
+        `/sys/class/input/event0`
+    :type class_dir: str
+    :returns: input device information
+    :rtype: dict
+    """
+    device_dir = os.path.join(class_dir, 'device')
+    info = {
+        'path':     os.path.join(DEV_INPUT_DIR, os.path.basename(class_dir)),
+        'name':     _read_attribute(device_dir, 'name'),
+        'phys':     _read_attribute(device_dir, 'phys'),
+        'uniq':     _read_attribute(device_dir, 'uniq'),
+    }
+    for attribute in ('bustype', 'vendor', 'product', 'version'):
+        value = _read_attribute(device_dir, os.path.join('id', attribute))
+        info[attribute] = int(value, 16) if value else 0
+    return info
+
+
+def list_devices():
+    """
+    Return information about all input devices with an event node
+    present in the system. sysfs is used if available, otherwise every
+    event node is opened in order to determine the name of its device.
+
+    :returns: list of input device information dictionaries (see
+        :py:func:`read_device()`), sorted by event node number
+    :rtype: list
+    """
+    if not os.path.isdir(SYSFS_INPUT_DIR):
+        retval = []
+        for dev_path in evdev.list_devices():
+            device = evdev.InputDevice(dev_path)
+            retval.append({
+                'path': dev_path,
+                'name': device.name,
+            })
+            device.close()
+        return sorted(retval, key=lambda info: _event_number(info['path']))
+    class_dirs = glob.glob(os.path.join(SYSFS_INPUT_DIR, 'event*'))
+    return [read_device(d) for d in sorted(class_dirs, key=_event_number)]
@@ -0,0 +1,129 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+:py:class:`TimerQueue` class implementation
+"""
+
+import heapq
+
+
+class TimerQueue(object):
+
+    """
+    Class keeping track of timers, each of which is identified by a
+    unique key and carries an arbitrary payload. Timers are kept in a
+    heap ordered by their deadlines, so that finding the next deadline
+    and popping due timers is cheap regardless of how many timers are
+    armed. Cancelled timers are only marked as such and get discarded
+    once they reach the top of the heap.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._timers = {}
+        self._sequence = 0
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __iter__(self):
+        # Iterate over a copy, so that timers can be cancelled meanwhile
+        return iter(list(self._timers))
+
+    def get(self, key):
+        """
+        Return the payload of the timer with the given key.
+
+        :param key: unique timer key
+        :type key: hashable
+        :returns: payload of the timer or `None` if it is not armed
+        """
+        entry = self._timers.get(key)
+        return entry[3] if entry else None
+
+    def schedule(self, key, when, payload):
+        """
+        Arm the timer with the given key, replacing any timer with the
+        same key which is already armed.
+
+        :param key: unique timer key
+        :type key: hashable
+        :param when: time at which the timer should fire
+        :type when: float
+        :param payload: data to return along with the timer once it
+            fires
+        :returns: None
+        """
+        self.cancel(key)
+        # The sequence number keeps timers with identical deadlines in
+        # the order they were armed in and prevents payloads from being
+        # compared
+        entry = [when, self._sequence, key, payload, True]
+        self._sequence += 1
+        self._timers[key] = entry
+        heapq.heappush(self._heap, entry)
+
+    def cancel(self, key):
+        """
+        Disarm the timer with the given key, if it is armed.
+
+        :param key: unique timer key
+        :type key: hashable
+        :returns: whether the timer was armed
+        :rtype: bool
+        """
+        entry = self._timers.pop(key, None)
+        if entry is None:
+            return False
+        entry[-1] = False
+        return True
+
+    def next_deadline(self):
+        """
+        Return the time at which the next timer fires.
+
+        :returns: time at which the next timer fires or `None` if no
+            timer is armed
+        :rtype: float
+        """
+        while self._heap and not self._heap[0][-1]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """
+        Disarm all timers which are due at the given time and return
+        them in the order of their deadlines.
+
+        :param now: current time
+        :type now: float
+        :returns: list of *(when, payload)* tuples
+        :rtype: list
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            (when, _, key, payload, active) = heapq.heappop(self._heap)
+            if active:
+                del self._timers[key]
+                due.append((when, payload))
+        return due
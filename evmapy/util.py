@@ -26,6 +26,9 @@ import os
 import pwd
 
 
+_APP_INFO = {}
+
+
 def as_list(var):
     """
     Return a one-element list containing `var` or `var` itself if it is
@@ -55,17 +58,29 @@ def first_element(var):
 def get_app_info():
     """
     Return a dictionary of frequently used application information.
+    The information is only gathered once for every effective user ID
+    as looking up the user database may be slow (e.g. when it is backed
+    by LDAP).
 
     :returns: frequently used application information
     :rtype: dict
     """
-    info = {
-        'name':     'evmapy',
-        'version':  '1.0',
-        'user':     pwd.getpwuid(os.geteuid()),
-    }
-    info['config_dir'] = os.path.join(info['user'].pw_dir, '.' + info['name'])
-    return info
+    euid = os.geteuid()
+    if euid not in _APP_INFO:
+        info = {
+            'name':     'evmapy',
+            'version':  '1.0',
+            'user':     pwd.getpwuid(euid),
+        }
+        info['config_dir'] = os.path.join(
+            info['user'].pw_dir, '.' + info['name']
+        )
+        info['control_socket'] = os.path.join(
+            info['config_dir'], '%s.socket' % info['name']
+        )
+        _APP_INFO[euid] = info
+    # Return a copy so that callers can't alter the cached information
+    return dict(_APP_INFO[euid])
 
 
 def ordered_dict(data):
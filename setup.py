@@ -14,6 +14,7 @@ setup(
     packages = [
         'evmapy',
     ],
+    python_requires = '>=3.8',
     install_requires = [
         'evdev',
     ],
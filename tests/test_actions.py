@@ -0,0 +1,367 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the actions module
+"""
+
+import copy
+import evdev
+
+import evmapy.actions
+import evmapy.config
+
+import tests.test_config
+import tests.util
+
+
+class TestActionsValidate(tests.test_config.TestConfigBase):
+
+    """
+    Test validate_action()
+    """
+
+    def check_bad_action(self, bad_action):
+        """
+        Test validate_action()
+        """
+        self.check_bad_config({'actions': [bad_action]})
+
+    def test_actions_bad_type(self):
+        """
+        Check validate_action() behavior when action's type is invalid
+        """
+        self.check_bad_action({
+            'trigger':  'Foo',
+            'type':     'foo',
+            'target':   'KEY_BACKSPACE',
+        })
+
+    def test_actions_error(self):
+        """
+        Check if compiling an invalid action raises ActionError, which
+        parse() reports as ConfigError
+        """
+        bad_action = {
+            'trigger':  'Foo',
+            'type':     'foo',
+            'target':   'KEY_BACKSPACE',
+        }
+        with self.assertRaises(evmapy.actions.ActionError):
+            evmapy.actions.compile_actions([dict(bad_action)], [])
+        config = dict(tests.util.FAKE_CONFIG, actions=[bad_action])
+        with self.assertRaises(evmapy.config.ConfigError):
+            evmapy.config.parse(config)
+
+    def test_actions_bad_mode(self):
+        """
+        Check validate_action() behavior when action's mode is invalid
+        """
+        self.check_bad_action({
+            'trigger':  ['Foo', 'Bar'],
+            'mode':     'foo',
+            'type':     'key',
+            'target':   'KEY_BACKSPACE',
+        })
+
+    def test_actions_hold_neg(self):
+        """
+        Check validate_action() behavior when action's hold time is
+        negative
+        """
+        self.check_bad_action({
+            'trigger':  'Foo',
+            'hold':     1.0 * -1,
+            'type':     'key',
+            'target':   'KEY_BACKSPACE',
+        })
+
+    def test_actions_repeat(self):
+        """
+        Check if the initial delay of a repeated action defaults to its
+        repeat interval and negative values are rejected
+        """
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['actions'] = [{
+            'trigger':  'Bar',
+            'repeat':   0.25,
+            'type':     'key',
+            'target':   'KEY_BACKSPACE',
+        }]
+        parsed = evmapy.config.parse(config)
+        [action] = parsed['map'][evdev.ecodes.EV_KEY, 200]
+        self.assertEqual(action['repeat_delay'], 0.25)
+        for changes in ({'repeat': -1}, {'repeat_delay': -1}):
+            bad_action = dict(config['actions'][0])
+            bad_action.update(changes)
+            self.check_bad_action(bad_action)
+
+    def test_actions_macro(self):
+        """
+        Check if a macro is compiled into a list of steps and invalid
+        macros are rejected
+        """
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['actions'] = [{
+            'trigger':  'Bar',
+            'type':     'macro',
+            'target':   [
+                0.5, '+KEY_LEFTSHIFT', 'KEY_A', 0.05, 0.05,
+                '-KEY_LEFTSHIFT', 'KEY_B', 1,
+            ],
+        }]
+        parsed = evmapy.config.parse(config)
+        [action] = parsed['map'][evdev.ecodes.EV_KEY, 200]
+        (shift, key_a, key_b) = (evdev.ecodes.KEY_LEFTSHIFT,
+                                 evdev.ecodes.KEY_A, evdev.ecodes.KEY_B)
+        self.assertListEqual(action['steps'], [
+            (0.5, shift, 1),
+            (0.0, key_a, 1),
+            (0.0, key_a, 0),
+            (0.1, shift, 0),
+            (0.0, key_b, 1),
+            (0.0, key_b, 0),
+        ])
+        for target in ([], [0.5], [-1, 'KEY_A'], ['KEY_FOO'], ['+FOO'],
+                       [True], [None, 'KEY_A']):
+            self.check_bad_action(dict(config['actions'][0], target=target))
+
+    def test_actions_exec(self):
+        """
+        Check if exec action targets are split into argument vectors
+        unless they are to be run by the shell and invalid commands are
+        rejected
+        """
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['actions'] = [
+            {
+                'trigger':  'Bar',
+                'type':     'exec',
+                'target':   ['foo --bar', "baz 'qux quux'"],
+            },
+            {
+                'trigger':  'Baz',
+                'type':     'exec',
+                'target':   'foo | bar',
+                'shell':    True,
+            },
+        ]
+        parsed = evmapy.config.parse(config)
+        [action] = parsed['map'][evdev.ecodes.EV_KEY, 200]
+        self.assertFalse(action['shell'])
+        self.assertListEqual(action['commands'], [
+            ['foo', '--bar'], ['baz', 'qux quux'],
+        ])
+        [action] = parsed['map'][evdev.ecodes.EV_KEY, 300]
+        self.assertListEqual(action['commands'], ['foo | bar'])
+        for target in ('', ' ', "foo 'bar", ['foo', ['bar']]):
+            self.check_bad_action(dict(config['actions'][0], target=target))
+
+    def test_actions_pipe(self):
+        """
+        Check if the command of a pipe action is split into an argument
+        vector unless it is to be run by the shell, if its target is
+        turned into lines to write and if invalid pipe actions are
+        rejected
+        """
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['actions'] = [
+            {
+                'trigger':  'Bar',
+                'type':     'pipe',
+                'command':  "mpc --host 'foo bar' idleloop",
+                'target':   ['pause', 'next'],
+            },
+            {
+                'trigger':  'Baz',
+                'type':     'pipe',
+                'command':  'foo | bar',
+                'shell':    True,
+                'target':   'baz',
+            },
+        ]
+        parsed = evmapy.config.parse(config)
+        [action] = parsed['map'][evdev.ecodes.EV_KEY, 200]
+        self.assertListEqual(
+            action['argv'], ['mpc', '--host', 'foo bar', 'idleloop']
+        )
+        self.assertEqual(action['data'], b'pause\nnext\n')
+        [action] = parsed['map'][evdev.ecodes.EV_KEY, 300]
+        self.assertListEqual(action['argv'], ['/bin/sh', '-c', 'foo | bar'])
+        self.assertEqual(action['data'], b'baz\n')
+        for changes in ({'target': 'foo\nbar'}, {'target': ['foo', 1]},
+                        {'command': ''}):
+            self.check_bad_action(dict(config['actions'][0], **changes))
+        bad_action = dict(config['actions'][0])
+        del bad_action['command']
+        self.check_bad_action(bad_action)
+        self.check_bad_action({
+            'trigger':  'Bar',
+            'type':     'exec',
+            'command':  'foo',
+            'target':   'bar',
+        })
+
+    def test_actions_bad_key(self):
+        """
+        Check validate_action() behavior when an unknown key is set as
+        the target
+        """
+        self.check_bad_action({
+            'trigger':  'Foo',
+            'type':     'key',
+            'target':   'Bar',
+        })
+
+    def test_actions_dup_target(self):
+        """
+        Check validate_action() behavior when target contains duplicate
+        events
+        """
+        self.check_bad_action({
+            'trigger':  'Foo',
+            'type':     'key',
+            'target':   ['KEY_BACKSPACE', 'KEY_BACKSPACE'],
+        })
+
+    def test_actions_hold_seq(self):
+        """
+        Check validate_action() behavior when contradicting properties
+        are set for an action
+        """
+        self.check_bad_action({
+            'trigger':  ['Foo:min', 'Foo:max'],
+            'mode':     'sequence',
+            'hold':     1.0,
+            'type':     'key',
+            'target':   'KEY_BACKSPACE',
+        })
+
+    def test_actions_seq_single(self):
+        """
+        Check validate_action() behavior when trigger sequence only
+        contains one event
+        """
+        self.check_bad_action({
+            'trigger':  'Foo',
+            'mode':     'sequence',
+            'type':     'key',
+            'target':   'KEY_BACKSPACE',
+        })
+
+    def test_actions_dup_trigger(self):
+        """
+        Check validate_action() behavior when a non-sequential trigger
+        list contains duplicate events
+        """
+        self.check_bad_action({
+            'trigger':  ['Foo', 'Foo'],
+            'type':     'key',
+            'target':   'KEY_BACKSPACE',
+        })
+
+
+class TestActionsAxis(tests.test_config.TestConfigBase):
+
+    """
+    Test actions translating input axes into output axes
+    """
+
+    def test_actions_axis_ok(self):
+        """
+        Check if an axis action is compiled into a lookup table
+        """
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['actions'].append({
+            'trigger':  'Foo',
+            'type':     'axis',
+            'target':   'REL_WHEEL',
+            'curve':    [[0.5, 0.5]],
+            'scale':    4,
+        })
+        parsed = evmapy.config.parse(config)
+        [(action, lut, minimum)] = parsed['analog'][evdev.ecodes.EV_ABS, 100]
+        self.assertEqual(action['target_type'], evdev.ecodes.EV_REL)
+        self.assertEqual(action['target_code'], evdev.ecodes.REL_WHEEL)
+        self.assertEqual(len(lut), 256)
+        self.assertEqual(lut[255], 4)
+        self.assertEqual(minimum, 0)
+        self.assertListEqual(parsed['analog'][evdev.ecodes.EV_ABS, 101], [])
+
+    def test_actions_mouse(self):
+        """
+        Check if a mouse action is compiled into a lookup table of
+        pointer velocities and refuses absolute targets
+        """
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['actions'].append({
+            'trigger':  'Foo',
+            'type':     'mouse',
+            'target':   'REL_X',
+        })
+        parsed = evmapy.config.parse(config)
+        [(action, lut, _)] = parsed['analog'][evdev.ecodes.EV_ABS, 100]
+        self.assertEqual(lut[255], evmapy.actions.MOUSE_ACTION_SCALE)
+        self.assertFalse(action['relative'])
+        self.check_bad_config({
+            'actions': [dict(config['actions'][-1], target='ABS_X')],
+        })
+
+    def test_actions_axis_bad(self):
+        """
+        Check parse() behavior when axis actions are invalid
+        """
+        valid = {
+            'trigger':  'Foo',
+            'type':     'axis',
+            'target':   'ABS_X',
+        }
+        invalid = [
+            {'trigger': 'Foo:min'},
+            {'trigger': ['Foo']},
+            {'trigger': 'Bar'},
+            {'trigger': 'Qux'},
+            {'hold': 1.0},
+            {'repeat': 0.5},
+            {'target': 'ABS_FOO'},
+            {'target': ['ABS_X']},
+            {'target': 'ABS_MT_POSITION_X'},
+            {'target': 'KEY_A'},
+            {'deadzone': 0.5, 'saturation': 0.5},
+            {'deadzone': -0.1},
+            {'saturation': 1.5},
+            {'scale': 0},
+            {'exponent': 0},
+            {'curve': 'foo'},
+            {'curve': []},
+            {'curve': [[0.5]]},
+            {'curve': [[-0.5, 0.5]]},
+            {'curve': [[0.5, 1.5]]},
+            {'curve': [[0.5, 0.5], [0.5, 0.6]]},
+            {'curve': [['foo', 0.5]]},
+            {'curve': [0.5]},
+        ]
+        for changes in invalid:
+            action = dict(valid)
+            action.update(changes)
+            self.check_bad_config({'actions': [action]})
+        self.check_bad_config({
+            'actions': [dict(valid, trigger='Qux')],
+            'axes': [{'name': 'Qux', 'code': 110, 'min': 1, 'max': 1}],
+        })
@@ -0,0 +1,125 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+
+"""
+Unit tests for the combo module
+"""
+
+import unittest
+
+import evmapy.combo
+import evmapy.config
+
+
+def parse_combos(*actions):
+    """
+    Return cross-device combos with the given triggers and modes
+    """
+    return evmapy.config.parse_combos({
+        'actions': [
+            {
+                'trigger':  trigger,
+                'mode':     mode,
+                'type':     'exec',
+                'target':   mode,
+            }
+            for (trigger, mode) in actions
+        ]
+    })
+
+
+class TestComboIndex(unittest.TestCase):
+
+    """
+    Test ComboIndex
+    """
+
+    def setUp(self):
+        """
+        Create a ComboIndex with one combo of each mode
+        """
+        actions = parse_combos(
+            (['Pedal/Left', 'Keyboard/Space'], 'all'),
+            (['Pedal/Left', 'Pad/Foo:max'], 'any'),
+            (['Pad/A', 'Pad/B', 'Pad/A'], 'sequence'),
+        )
+        self.index = evmapy.combo.ComboIndex(actions)
+        self.bits = {}
+        for device in ('Pedal', 'Keyboard', 'Pad'):
+            for (name, edge) in self.index.subscriptions(device).items():
+                self.bits['%s/%s' % (device, name)] = edge['bit']
+
+    def update(self, trigger, active):
+        """
+        Report a state change of the given event and return the modes of
+        the actions to perform, along with their new states
+        """
+        return [
+            (action['target'], start) for (action, start) in
+            self.index.update(self.bits[trigger], active)
+        ]
+
+    def test_combo_subscriptions(self):
+        """
+        Check if devices are only subscribed to their own events
+        """
+        self.assertSetEqual(
+            set(self.index.subscriptions('Pad')), set(['Foo:max', 'A', 'B'])
+        )
+        self.assertDictEqual(self.index.subscriptions('Mouse'), {})
+        self.assertEqual(len(set(self.bits.values())), 5)
+
+    def test_combo_all_any(self):
+        """
+        Check if combos in "all" and "any" modes are performed when
+        their triggers are active
+        """
+        self.assertListEqual(
+            self.update('Keyboard/Space', True), []
+        )
+        self.assertListEqual(
+            self.update('Pedal/Left', True), [('all', True), ('any', True)]
+        )
+        self.assertListEqual(self.update('Pad/Foo:max', True), [])
+        self.assertListEqual(
+            self.update('Pedal/Left', False), [('all', False)]
+        )
+        self.assertListEqual(self.update('Pedal/Left', False), [])
+        self.assertListEqual(
+            self.update('Pad/Foo:max', False), [('any', False)]
+        )
+
+    def test_combo_sequence(self):
+        """
+        Check if sequence combos are performed once their triggers
+        become active in order and stopped once the last one becomes
+        inactive
+        """
+        for (trigger, active) in (('Pad/B', True), ('Pad/A', True),
+                                  ('Pad/A', True), ('Pad/A', False)):
+            self.assertListEqual(self.update(trigger, active), [])
+        self.assertListEqual(self.update('Pad/B', True), [])
+        self.assertListEqual(
+            self.update('Pad/A', True), [('sequence', True)]
+        )
+        self.assertListEqual(self.update('Pad/B', False), [])
+        self.assertListEqual(
+            self.update('Pad/A', False), [('sequence', False)]
+        )
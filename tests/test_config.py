@@ -58,7 +58,7 @@ class TestConfigBase(unittest.TestCase):
 class TestConfig(TestConfigBase):
 
     """
-    Test all functions except validate_action()
+    Test configuration generation, saving, loading and parsing
     """
 
     def test_config_create_invalid_path(self):
@@ -116,10 +116,17 @@ class TestConfig(TestConfigBase):
         fake_buttons = [
             (['BTN_A', 'BTN_GAMEPAD', 'BTN_SOUTH'], 304),
             ('BTN_C', 306),
+            ('KEY_ESC', 1),
+        ]
+        fake_relative_axes = [
+            ('REL_X', 0),
+            ('REL_Y', 1),
+            ('REL_WHEEL', 8),
         ]
         fake_device_capabilities = {
             ('EV_ABS', 3): fake_axes,
             ('EV_KEY', 1): fake_buttons,
+            ('EV_REL', 2): fake_relative_axes,
         }
         fake_capabilities = fake_inputdevice.return_value.capabilities
         fake_capabilities.return_value = fake_device_capabilities
@@ -127,7 +134,17 @@ class TestConfig(TestConfigBase):
         config = evmapy.config.generate(device)
         self.assertEqual(len(config['axes']), len(fake_axes))
         self.assertEqual(len(config['buttons']), len(fake_buttons))
+        self.assertEqual(
+            len(config['relative_axes']), len(fake_relative_axes)
+        )
+        self.assertFalse(
+            [a for a in config['actions'] if a['trigger'].startswith('REL_')]
+        )
         self.assertFalse(config['grab'])
+        # Codes are only unique within an event type
+        parsed = evmapy.config.parse(config)
+        self.assertIn((evdev.ecodes.EV_KEY, 1), parsed['events'])
+        self.assertIn((evdev.ecodes.EV_REL, 1), parsed['events'])
 
     @unittest.mock.patch('os.mkdir')
     def test_config_save(self, fake_mkdir):
@@ -180,6 +197,7 @@ class TestConfig(TestConfigBase):
         """
         Check if load() properly sanitizes the provided file name
         """
+        fake_read.return_value = tests.util.FAKE_CONFIG
         evmapy.config.load(unittest.mock.Mock(), '../foo.json')
         read_arg = fake_read.call_args[0][0]
         with self.assertRaises(ValueError):
@@ -197,11 +215,16 @@ class TestConfig(TestConfigBase):
         fake_device.fn = '/dev/input/event0'
         with unittest.mock.patch('evmapy.config.open', fake_open, create=True):
             (config, _) = evmapy.config.load(fake_device, None)
-        self.assertSetEqual(set(config.keys()), set(['events', 'grab', 'map']))
-        self.assertEqual(len(config['map'][100]), 2)
-        self.assertEqual(len(config['map'][101]), 1)
-        self.assertEqual(len(config['map'][200]), 1)
-        self.assertEqual(len(config['map'][300]), 0)
+        self.assertSetEqual(
+            set(config.keys()),
+            set(['analog', 'budget', 'events', 'grab', 'layer', 'map',
+                 'capabilities', 'mapped', 'passthrough', 'priority',
+                 'tables'])
+        )
+        self.assertEqual(len(config['map'][evdev.ecodes.EV_ABS, 100]), 2)
+        self.assertEqual(len(config['map'][evdev.ecodes.EV_ABS, 101]), 1)
+        self.assertEqual(len(config['map'][evdev.ecodes.EV_KEY, 200]), 1)
+        self.assertEqual(len(config['map'][evdev.ecodes.EV_KEY, 300]), 0)
 
     @unittest.mock.patch('logging.getLogger')
     @unittest.mock.patch('evmapy.config.read')
@@ -213,16 +236,21 @@ class TestConfig(TestConfigBase):
             'actions':  [],
             'grab':     False,
         }
+        full_config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        full_config['relative_axes'] = [{'name': 'Wheel', 'code': 8}]
         fake_read.side_effect = [
-            tests.util.FAKE_CONFIG,
+            full_config,
             partial_config,
         ]
         fake_device = unittest.mock.Mock()
         (_, old_config) = evmapy.config.load(fake_device, 'Foo.Bar.json')
         try:
-            evmapy.config.load(fake_device, 'Foo.Bar.json', old_config)
+            (config, _) = evmapy.config.load(
+                fake_device, 'Foo.Bar.json', old_config
+            )
         except evmapy.config.ConfigError:
             self.fail("No ConfigError should be raised")
+        self.assertIn((evdev.ecodes.EV_REL, 8), config['events'])
 
     def test_config_param_req(self):
         """
@@ -260,6 +288,55 @@ class TestConfig(TestConfigBase):
             ]
         })
 
+    def test_config_parse_budget(self):
+        """
+        Check parse() behavior when the event budget is not positive
+        """
+        self.check_bad_config({
+            'budget': 0,
+        })
+
+    def test_config_parse_passthrough(self):
+        """
+        Check if parse() determines which events trigger actions and
+        rejects passthrough for devices which are not grabbed
+        """
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['grab'] = True
+        config['passthrough'] = True
+        parsed = evmapy.config.parse(config)
+        self.assertIn((evdev.ecodes.EV_ABS, 100), parsed['mapped'])
+        self.assertIn((evdev.ecodes.EV_KEY, 200), parsed['mapped'])
+        self.assertNotIn((evdev.ecodes.EV_KEY, 300), parsed['mapped'])
+        self.check_bad_config({'passthrough': True})
+
+    def test_config_parse_debounce(self):
+        """
+        Check if debounce times are converted to microseconds, with
+        per-button ones overriding the device one, and negative ones are
+        rejected
+        """
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['debounce'] = 0.005
+        config['buttons'][0]['debounce'] = 0.02
+        parsed = evmapy.config.parse(config)
+        events = parsed['events']
+        self.assertEqual(events[evdev.ecodes.EV_KEY, 200]['debounce'], 20000)
+        self.assertEqual(events[evdev.ecodes.EV_KEY, 201]['debounce'], 5000)
+        self.check_bad_config({'debounce': -1})
+        self.check_bad_config({
+            'buttons': [{'name': 'Qux', 'code': 400, 'debounce': -1}],
+        })
+
+    def test_config_parse_match(self):
+        """
+        Check parse() behavior when device matching criteria are invalid
+        """
+        for match in ({'foo': 'bar'}, {'uniq': 1}, {'id': '046d-c219'}):
+            self.check_bad_config({
+                'match': match,
+            })
+
     def test_config_parse_dup_name(self):
         """
         Check parse() behavior when two events have the same name
@@ -276,14 +353,14 @@ class TestConfig(TestConfigBase):
 
     def test_config_parse_dup_code(self):
         """
-        Check parse() behavior when two events have the same code
-        assigned
+        Check parse() behavior when two events of the same type have the
+        same code assigned
         """
         self.check_bad_config({
             'buttons': [
                 {
                     'name': 'foo',
-                    'code': 100,
+                    'code': 200,
                 },
             ],
         })
@@ -318,106 +395,265 @@ class TestConfig(TestConfigBase):
             ],
         })
 
-
-class TestConfigValidateAction(TestConfigBase):
-
-    """
-    Test validate_action()
-    """
-
-    def check_bad_action(self, bad_action):
+    def test_config_parse_relative(self):
         """
-        Test validate_action()
+        Check if relative axes are given default thresholds and their
+        events can only be used with direction suffixes
         """
-        self.check_bad_config({'actions': [bad_action]})
-
-    def test_config_action_bad_type(self):
-        """
-        Check validate_action() behavior when action's type is invalid
-        """
-        self.check_bad_action({
-            'trigger':  'Foo',
-            'type':     'foo',
-            'target':   'KEY_BACKSPACE',
-        })
-
-    def test_config_action_bad_mode(self):
-        """
-        Check validate_action() behavior when action's mode is invalid
-        """
-        self.check_bad_action({
-            'trigger':  ['Foo', 'Bar'],
-            'mode':     'foo',
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['relative_axes'] = [
+            {'name': 'Wheel', 'code': 8, 'threshold': 120},
+            {'name': 'Dial', 'code': 7},
+        ]
+        config['actions'].append({
+            'trigger':  ['Wheel:+', 'Dial:-'],
+            'mode':     'any',
             'type':     'key',
-            'target':   'KEY_BACKSPACE',
+            'target':   'KEY_ENTER',
+        })
+        parsed = evmapy.config.parse(config)
+        events = parsed['events']
+        self.assertEqual(events[evdev.ecodes.EV_REL, 8]['threshold'], 120)
+        self.assertEqual(events[evdev.ecodes.EV_REL, 7]['threshold'], 1)
+        self.assertEqual(events[evdev.ecodes.EV_REL, 7]['accumulated'], 0)
+        self.assertEqual(len(parsed['map'][evdev.ecodes.EV_REL, 8]), 1)
+        self.check_bad_config({
+            'relative_axes': [{'name': 'Wheel', 'code': 8, 'threshold': 0}],
+        })
+        self.check_bad_config({
+            'relative_axes': [{'name': 'Wheel', 'code': 8}],
+            'actions': [
+                {
+                    'trigger':  'Wheel:max',
+                    'type':     'key',
+                    'target':   'KEY_ENTER',
+                },
+            ],
         })
 
-    def test_config_action_hold_neg(self):
+    def test_config_parse_zones(self):
         """
-        Check validate_action() behavior when action's hold time is
-        negative
+        Check if axis zones are compiled into sorted thresholds
         """
-        self.check_bad_action({
-            'trigger':  'Foo',
-            'hold':     1.0 * -1,
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['axes'].append({
+            'name':     'Qux',
+            'code':     110,
+            'min':      0,
+            'max':      255,
+            'zones':    [
+                {'name': 'left', 'min': 0, 'max': 50},
+                {'name': 'center', 'min': 51, 'max': 200},
+                {'name': 'right', 'min': 220, 'max': 255},
+            ],
+        })
+        config['actions'].append({
+            'trigger':  'Qux:center',
             'type':     'key',
-            'target':   'KEY_BACKSPACE',
+            'target':   'KEY_ENTER',
         })
+        parsed = evmapy.config.parse(config)
+        axis = parsed['events'][evdev.ecodes.EV_ABS, 110]
+        self.assertListEqual(axis['thresholds'], [-1, 50, 200, 219, 255])
+        self.assertListEqual(
+            axis['zone_names'], [None, 'left', 'center', None, 'right', None]
+        )
+        self.assertEqual(axis['zone'], 2)
+        self.assertEqual(axis['hysteresis'], 0)
+        axis = parsed['events'][evdev.ecodes.EV_ABS, 100]
+        self.assertListEqual(axis['thresholds'], [0, 254])
+        self.assertListEqual(axis['zone_names'], ['min', None, 'max'])
+
+    def test_config_parse_zones_bad(self):
+        """
+        Check parse() behavior when axis zones are invalid
+        """
+        valid = {'name': 'Qux', 'code': 110, 'min': 0, 'max': 255}
+        invalid = [
+            {'zones': []},
+            {'zones': [{'name': 'foo', 'min': 0, 'max': 10}],
+             'hysteresis': -1},
+            {'zones': [{'name': 'foo', 'min': 0}]},
+            {'zones': [{'name': 'foo', 'min': 0, 'max': 1, 'bar': 2}]},
+            {'zones': [{'name': 1, 'min': 0, 'max': 10}]},
+            {'zones': [{'name': 'foo', 'min': 0, 'max': 10.0}]},
+            {'zones': [{'name': 'foo', 'min': True, 'max': 10}]},
+            {'zones': ['foo']},
+            {'zones': [1]},
+            {'zones': [{'name': 'foo', 'min': 10, 'max': 0}]},
+            {'zones': [{'name': 'foo', 'min': 0, 'max': 10},
+                       {'name': 'foo', 'min': 20, 'max': 30}]},
+            {'zones': [{'name': 'foo', 'min': 0, 'max': 10},
+                       {'name': 'bar', 'min': 10, 'max': 30}]},
+        ]
+        for changes in invalid:
+            axis = dict(valid)
+            axis.update(changes)
+            self.check_bad_config({'axes': [axis]})
+        self.check_bad_config({
+            'axes': [dict(
+                valid, zones=[{'name': 'foo', 'min': 0, 'max': 10}]
+            )],
+            'actions': [{
+                'trigger':  'Qux:min',
+                'type':     'key',
+                'target':   'KEY_ENTER',
+            }],
+        })
+
 
-    def test_config_action_bad_key(self):
+class TestConfigCombos(TestConfigBase):
+
+    """
+    Test cross-device combos
+    """
+
+    @unittest.mock.patch('logging.getLogger')
+    @unittest.mock.patch('evmapy.config.read')
+    def test_config_combos_ok(self, fake_read, _):
         """
-        Check validate_action() behavior when an unknown key is set as
-        the target
+        Check if cross-device combos are loaded and parsed
         """
-        self.check_bad_action({
-            'trigger':  'Foo',
-            'type':     'key',
-            'target':   'Bar',
-        })
+        fake_read.return_value = {
+            'actions': [{
+                'trigger':  ['Foot Pedal/Left', 'AT Keyboard/Bar:max'],
+                'type':     'key',
+                'target':   'KEY_ENTER',
+                'hold':     0.5,
+            }],
+        }
+        [action] = evmapy.config.load_combos()
+        self.assertTrue(
+            fake_read.call_args[0][0].endswith(evmapy.config.COMBOS_FILE)
+        )
+        self.assertListEqual(
+            action['trigger'], ['Foot Pedal/Left', 'AT Keyboard/Bar:max']
+        )
+        self.assertEqual(action['hold'], 0.5)
+        self.assertEqual(action['mode'], 'all')
 
-    def test_config_action_dup_target(self):
+    @unittest.mock.patch('evmapy.config.read')
+    def test_config_combos_bad(self, fake_read):
         """
-        Check validate_action() behavior when target contains duplicate
-        events
+        Check load_combos() behavior when cross-device combos are invalid
         """
-        self.check_bad_action({
-            'trigger':  'Foo',
+        valid = {
+            'trigger':  ['Foo/Bar', 'Baz/Qux'],
             'type':     'key',
-            'target':   ['KEY_BACKSPACE', 'KEY_BACKSPACE'],
-        })
+            'target':   'KEY_ENTER',
+        }
+        invalid = [
+            [],
+            {'actions': [valid], 'grab': True},
+            {'actions': [dict(valid, foo=1)]},
+            {'actions': [dict(valid, type='axis')]},
+            {'actions': [dict(valid, trigger=['Foo/Bar', 'Baz'])]},
+            {'actions': [dict(valid, trigger=['Foo/Bar', 'Baz/'])]},
+            {'actions': [dict(valid, mode='foo')]},
+        ]
+        for config in invalid:
+            fake_read.return_value = config
+            with self.assertRaises(evmapy.config.ConfigError):
+                evmapy.config.load_combos()
+        fake_read.side_effect = FileNotFoundError()
+        with self.assertRaises(evmapy.config.ConfigError) as context:
+            evmapy.config.load_combos()
+        self.assertTrue(context.exception.not_found)
 
-    def test_config_action_hold_seq(self):
+
+class TestConfigLayers(TestConfigBase):
+
+    """
+    Test layers
+    """
+
+    def test_config_capabilities(self):
         """
-        Check validate_action() behavior when contradicting properties
-        are set for an action
+        Check if get_capabilities() returns all keys and axes which can
+        be targeted by actions, along with buttons making the output
+        device classified properly
         """
-        self.check_bad_action({
-            'trigger':  ['Foo:min', 'Foo:max'],
-            'mode':     'sequence',
-            'hold':     1.0,
-            'type':     'key',
-            'target':   'KEY_BACKSPACE',
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['actions'] = [
+            {'trigger': 'Bar', 'type': 'key', 'target': ['KEY_A', 'KEY_B']},
+            {'trigger': 'Baz', 'type': 'macro', 'target': ['KEY_C', 0.1]},
+            {'trigger': 'Foobar', 'type': 'exec', 'target': 'foo'},
+            {'trigger': 'Foo', 'type': 'axis', 'target': 'ABS_X'},
+            {'trigger': 'Foofoo', 'type': 'mouse', 'target': 'REL_Y'},
+        ]
+        config['layers'] = {
+            'fn': [{'trigger': 'Bar', 'type': 'key', 'target': 'KEY_D'}],
+        }
+        parsed = evmapy.config.parse(config)
+        ecodes = evdev.ecodes
+        self.assertDictEqual(parsed['capabilities'], {
+            ecodes.EV_KEY:  {
+                ecodes.KEY_A, ecodes.KEY_B, ecodes.KEY_C, ecodes.KEY_D,
+                ecodes.BTN_GAMEPAD, ecodes.BTN_LEFT,
+            },
+            ecodes.EV_ABS:  {ecodes.ABS_X},
+            ecodes.EV_REL:  {ecodes.REL_Y},
         })
 
-    def test_config_action_seq_single(self):
+    def test_config_layers_ok(self):
         """
-        Check validate_action() behavior when trigger sequence only
-        contains one event
+        Check if layers are compiled into dispatch tables in which the
+        events used by a layer only trigger that layer's actions and
+        layer switching actions
         """
-        self.check_bad_action({
-            'trigger':  'Foo',
-            'mode':     'sequence',
-            'type':     'key',
-            'target':   'KEY_BACKSPACE',
-        })
+        config = copy.deepcopy(tests.util.FAKE_CONFIG)
+        config['actions'] = [
+            {'trigger': 'Bar', 'type': 'layer', 'target': 'fn'},
+            {'trigger': 'Foobar', 'type': 'key', 'target': 'KEY_A'},
+            {'trigger': 'Foobaz', 'type': 'key', 'target': 'KEY_C'},
+            {'trigger': 'Foo', 'type': 'axis', 'target': 'ABS_X'},
+        ]
+        config['layers'] = {
+            'fn': [
+                {'trigger': ['Foobar', 'Bar'], 'type': 'key',
+                 'target': 'KEY_B'},
+                {'trigger': 'Foo:max', 'type': 'key', 'target': 'KEY_D'},
+            ],
+        }
+        parsed = evmapy.config.parse(config)
+        self.assertIsNone(parsed['layer'])
+        base = parsed['tables'][None]
+        layer = parsed['tables']['fn']
+        self.assertIs(parsed['map'], base['map'])
+        self.assertIs(parsed['analog'], base['analog'])
+        ev_key = evdev.ecodes.EV_KEY
+        self.assertFalse(base['map'][ev_key, 200][0]['toggle'])
+        self.assertListEqual(
+            [a['target'] for a in layer['map'][ev_key, 200]], ['KEY_B', 'fn']
+        )
+        self.assertListEqual(
+            [a['target'] for a in layer['map'][ev_key, 201]], ['KEY_B']
+        )
+        self.assertIs(layer['map'][ev_key, 202], base['map'][ev_key, 202])
+        self.assertListEqual(layer['analog'][evdev.ecodes.EV_ABS, 100], [])
+        self.assertEqual(len(base['actions']), 4)
+        self.assertEqual(len(layer['actions']), 4)
+        self.assertSetEqual(
+            layer['ids'], set(a['id'] for a in layer['actions'])
+        )
 
-    def test_config_action_dup_trigger(self):
+    def test_config_layers_bad(self):
         """
-        Check validate_action() behavior when a non-sequential trigger
-        list contains duplicate events
+        Check parse() behavior when layers are invalid
         """
-        self.check_bad_action({
-            'trigger':  ['Foo', 'Foo'],
-            'type':     'key',
-            'target':   'KEY_BACKSPACE',
-        })
+        switch = {'trigger': 'Bar', 'type': 'layer', 'target': 'fn'}
+        invalid = [
+            ([switch], {}),
+            ([dict(switch, target=['fn'])], {'fn': []}),
+            ([dict(switch, hold=1.0)], {'fn': []}),
+            ([dict(switch, repeat=1.0)], {'fn': []}),
+            ([], {'fn': {}}),
+            ([], {'fn': [dict(switch, target='foo')]}),
+            ([], {'fn': [dict(switch, toggle=1)]}),
+        ]
+        for (actions, layers) in invalid:
+            self.check_bad_config({'actions': actions, 'layers': layers})
+        with self.assertRaises(evmapy.config.ConfigError):
+            evmapy.config.parse_combos({
+                'actions': [dict(switch, trigger=['Foo/Bar', 'Baz/Qux'])],
+            })
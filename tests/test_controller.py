@@ -226,6 +226,42 @@ class TestController(unittest.TestCase):
         self.assertEqual(self.socket.return_value.close.call_count, 1)
         self.assertEqual(fake_remove.call_count, 1)
 
+    @unittest.mock.patch('os.remove')
+    def test_controller_cleanup_handover(self, fake_remove):
+        """
+        Check if Controller leaves the control socket in place after
+        handing it over to another instance
+        """
+        self.controller.cleanup(unlink=False)
+        self.assertEqual(self.socket.return_value.close.call_count, 1)
+        self.assertFalse(fake_remove.called)
+
+    def test_controller_handover(self):
+        """
+        Check control command "handover"
+        """
+        request = {
+            'command':  'handover',
+            'socket':   '/foo.socket',
+        }
+        self.check_controller_process(request)
+        self.target.hand_over.assert_called_once_with('/foo.socket')
+
+    @unittest.mock.patch('socket.socket')
+    @unittest.mock.patch('evmapy.controller.send_request')
+    def test_controller_adopt(self, fake_send_request, fake_socket):
+        """
+        Check if Controller uses a control socket passed by another
+        instance as is
+        """
+        controller = evmapy.controller.Controller(self.target, 7)
+        fake_socket.assert_called_once_with(fileno=7)
+        self.assertFalse(fake_send_request.called)
+        self.assertFalse(fake_socket.return_value.bind.called)
+        self.assertIs(
+            controller.fileno(), fake_socket.return_value.fileno.return_value
+        )
+
 
 @unittest.mock.patch('os.remove')
 @unittest.mock.patch('os.chmod')
@@ -0,0 +1,121 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the Coprocess class
+"""
+
+import os
+import select
+import unittest
+import unittest.mock
+
+import evmapy.coprocess
+
+
+class TestCoprocess(unittest.TestCase):
+
+    """
+    Test Coprocess behavior
+    """
+
+    def setUp(self):
+        """
+        Create a fake poll object to use with all tests
+        """
+        self.poll = unittest.mock.Mock()
+
+    @unittest.mock.patch('os.waitpid')
+    @unittest.mock.patch('os.write')
+    @unittest.mock.patch('os.posix_spawnp')
+    def test_coprocess_write(self, fake_spawn, fake_write, fake_waitpid):
+        """
+        Check if Coprocess buffers data which cannot be written without
+        blocking, only waits for the pipe to become writable while some
+        data is buffered and reaps the program once it exits
+        """
+        fake_spawn.return_value = 42
+        coprocess = evmapy.coprocess.Coprocess(['foo', 'bar'], self.poll)
+        self.assertFalse(coprocess.running)
+        coprocess.start()
+        self.assertTrue(coprocess.running)
+        fake_spawn.assert_called_once_with(
+            'foo', ['foo', 'bar'], os.environ,
+            file_actions=[(os.POSIX_SPAWN_DUP2, unittest.mock.ANY, 0)]
+        )
+        self.poll.register.assert_called_once_with(coprocess, 0)
+        fake_write.side_effect = [3, BlockingIOError()]
+        coprocess.write(b'foobar')
+        self.poll.modify.assert_called_with(coprocess, select.POLLOUT)
+        fake_write.side_effect = [3]
+        self.assertListEqual(coprocess.process(), [])
+        self.assertEqual(fake_write.call_count, 3)
+        self.poll.modify.assert_called_with(coprocess, 0)
+        # Waking up with nothing to write means the program exited
+        with self.assertRaises(evmapy.coprocess.CoprocessExitedException):
+            coprocess.process()
+        fake_waitpid.return_value = (0, 0)
+        coprocess.stop()
+        self.assertFalse(coprocess.running)
+        self.poll.unregister.assert_called_once_with(coprocess)
+        fake_waitpid.assert_called_once_with(42, os.WNOHANG)
+        self.assertEqual(coprocess.pid, 42)
+        # The previous instance is reaped before starting a new one
+        fake_spawn.return_value = 43
+        fake_waitpid.side_effect = ChildProcessError()
+        coprocess.start()
+        self.assertEqual(coprocess.pid, 43)
+        fake_waitpid.return_value = (43, 0)
+        fake_waitpid.side_effect = None
+        coprocess.stop()
+        self.assertIsNone(coprocess.pid)
+
+    def test_coprocess_exit(self):
+        """
+        Check if Coprocess detects the program exiting both when data is
+        written to it and when it is idle and discards unwritten data once
+        stopped
+        """
+        poll = select.poll()
+        coprocess = evmapy.coprocess.Coprocess(['true'], poll)
+        coprocess.start()
+        self.assertListEqual(
+            poll.poll(5000), [(coprocess.fileno(), select.POLLERR)]
+        )
+        with self.assertRaises(evmapy.coprocess.CoprocessExitedException):
+            coprocess.process()
+        with self.assertRaises(evmapy.coprocess.CoprocessExitedException):
+            coprocess.write(b'foo\n')
+        with self.assertRaises(evmapy.coprocess.CoprocessExitedException):
+            coprocess.process()
+        coprocess.stop()
+        self.assertFalse(coprocess.running)
+        # Data which could not be written is discarded
+        with self.assertRaises(evmapy.coprocess.CoprocessExitedException):
+            coprocess.process()
+
+    def test_coprocess_start_bad(self):
+        """
+        Check Coprocess behavior when the program cannot be started
+        """
+        coprocess = evmapy.coprocess.Coprocess(['/nonexistent'], self.poll)
+        with self.assertRaises(OSError):
+            coprocess.start()
+        self.assertFalse(coprocess.running)
+        self.assertFalse(self.poll.register.called)
@@ -0,0 +1,95 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the curve module
+"""
+
+import unittest
+
+import evmapy.actions
+import evmapy.curve
+
+
+def shaping(**options):
+    """
+    Return the given shaping options merged with the defaults used for
+    axis actions
+    """
+    return dict(evmapy.actions.AXIS_ACTION_DEFAULTS, **options)
+
+
+class TestCurve(unittest.TestCase):
+
+    """
+    Test response curve lookup table generation
+    """
+
+    def test_curve_linear(self):
+        """
+        Check if a linear response curve is properly compiled
+        """
+        lut = evmapy.curve.build_lut(-100, 100, 1000, shaping())
+        self.assertEqual(len(lut), 201)
+        self.assertEqual(lut[0], -1000)
+        self.assertEqual(lut[100], 0)
+        self.assertEqual(lut[150], 500)
+        self.assertEqual(lut[200], 1000)
+
+    def test_curve_deadzone_saturation(self):
+        """
+        Check if deadzone and saturation are properly applied
+        """
+        lut = evmapy.curve.build_lut(
+            0, 200, 100,
+            shaping(deadzone=0.2, saturation=0.6, invert=True)
+        )
+        self.assertListEqual(list(lut[80:121]), [0] * 41)
+        self.assertEqual(lut[140], -50)
+        self.assertListEqual(list(lut[160:]), [-100] * 41)
+        self.assertListEqual(list(lut[:41]), [100] * 41)
+
+    def test_curve_exponential(self):
+        """
+        Check if an exponential response curve is properly compiled
+        """
+        lut = evmapy.curve.build_lut(
+            -100, 100, 1000, shaping(curve='exponential', exponent=3)
+        )
+        self.assertEqual(lut[150], 125)
+        self.assertEqual(lut[50], -125)
+
+    def test_curve_points(self):
+        """
+        Check if a response curve defined by points is properly compiled
+        """
+        lut = evmapy.curve.build_lut(
+            -100, 100, 100, shaping(curve=[[0.5, 0.1], [0.9, 0.9]])
+        )
+        self.assertEqual(lut[100], 0)
+        self.assertEqual(lut[125], 5)
+        self.assertEqual(lut[150], 10)
+        self.assertEqual(lut[170], 50)
+        self.assertEqual(lut[195], 95)
+        self.assertEqual(lut[200], 100)
+        lut = evmapy.curve.build_lut(
+            -100, 100, 100, shaping(curve=[[0, 0.5], [1, 0.5]])
+        )
+        self.assertEqual(lut[101], 50)
+        self.assertEqual(lut[200], 50)
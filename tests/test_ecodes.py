@@ -0,0 +1,46 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the ecodes module
+"""
+
+import unittest
+
+import evdev
+
+import evmapy.ecodes
+
+
+class TestEcodes(unittest.TestCase):
+
+    """
+    Test the precomputed event code table
+    """
+
+    def test_ecodes_in_sync(self):
+        """
+        Check if every name in the precomputed event code table is known
+        to evdev and maps to the same value; newer evdev versions may
+        know more names and raise the *_MAX and *_CNT bounds
+        """
+        for (name, code) in evmapy.ecodes.ECODES.items():
+            self.assertIn(name, evdev.ecodes.ecodes)
+            if not name.endswith(('_MAX', '_CNT')):
+                self.assertEqual(code, evdev.ecodes.ecodes[name], name)
@@ -0,0 +1,401 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the handover module
+"""
+
+import os
+import socket
+import struct
+import tempfile
+import threading
+import unittest
+import unittest.mock
+
+import evdev
+
+import evmapy.combo
+import evmapy.handover
+import evmapy.source
+import evmapy.timer
+import evmapy.util
+
+import tests.test_multiplexer
+import tests.util
+
+
+class TestHandover(unittest.TestCase):
+
+    """
+    Test passing runtime state and file descriptors between instances
+    """
+
+    def setUp(self):
+        """
+        Use a temporary directory for the handover socket
+        """
+        self.tempdir = tempfile.TemporaryDirectory()
+        info = evmapy.util.get_app_info()
+        info['config_dir'] = self.tempdir.name
+        patcher = unittest.mock.patch('evmapy.util.get_app_info')
+        patcher.start().return_value = info
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tempdir.cleanup)
+
+    def check_receive(self, sender):
+        """
+        Call receive() while simulating a running instance which
+        responds to the handover request by calling the given function
+        with the path to the handover socket in a separate thread
+        """
+        def fake_send_request(request):
+            """
+            Simulate sending a handover request to a running instance
+            """
+            self.assertEqual(request['command'], 'handover')
+            thread = threading.Thread(
+                target=sender, args=(request['socket'],), daemon=True
+            )
+            thread.start()
+
+        with unittest.mock.patch('evmapy.controller.send_request') as fake:
+            fake.side_effect = fake_send_request
+            return evmapy.handover.receive()
+
+    def test_handover_ok(self):
+        """
+        Check if runtime state and file descriptors are properly passed
+        """
+        pipes = [os.pipe() for _ in range(3)]
+        self.addCleanup(lambda: [os.close(fd) for p in pipes for fd in p])
+        state = {'foo': 'x' * (3 * evmapy.handover.CHUNK_SIZE)}
+        write_fds = [write_fd for (_, write_fd) in pipes]
+        with unittest.mock.patch('evmapy.handover.FDS_PER_MESSAGE', 2):
+            (received, fds) = self.check_receive(
+                lambda path: evmapy.handover.send(path, state, write_fds)
+            )
+        self.assertDictEqual(received, state)
+        self.assertEqual(len(fds), len(pipes))
+        for ((read_fd, _), fdesc) in zip(pipes, fds):
+            self.assertFalse(os.get_inheritable(fdesc))
+            os.write(fdesc, b'foo')
+            os.close(fdesc)
+            self.assertEqual(os.read(read_fd, 3), b'foo')
+        self.assertListEqual(os.listdir(self.tempdir.name), [])
+
+    def test_handover_not_running(self):
+        """
+        Check receive() behavior when no instance is running
+        """
+        with unittest.mock.patch('evmapy.controller.send_request') as fake:
+            fake.side_effect = FileNotFoundError()
+            with self.assertRaises(evmapy.handover.HandoverError):
+                evmapy.handover.receive()
+
+    def check_receive_error(self, messages):
+        """
+        Check receive() behavior when the running instance sends the
+        given messages and disconnects
+        """
+        def sender(path):
+            """
+            Simulate a misbehaving running instance
+            """
+            with socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET) as sock:
+                sock.connect(path)
+                for message in messages:
+                    sock.send(message)
+
+        with self.assertRaises(evmapy.handover.HandoverError):
+            self.check_receive(sender)
+
+    def test_handover_bad_header(self):
+        """
+        Check receive() behavior when the running instance sends an
+        invalid header
+        """
+        self.check_receive_error([b'foo'])
+
+    def test_handover_no_fds(self):
+        """
+        Check receive() behavior when the running instance does not pass
+        the announced file descriptors
+        """
+        self.check_receive_error([struct.pack('!II', 0, 1), b'\0'])
+
+    def test_handover_truncated(self):
+        """
+        Check receive() behavior when the running instance disconnects
+        before sending its whole state
+        """
+        self.check_receive_error([struct.pack('!II', 10, 0), b'foo'])
+
+    def test_handover_not_confirmed(self):
+        """
+        Check send() behavior when the new instance does not confirm the
+        receipt of state and file descriptors
+        """
+        def receiver(sock, reply):
+            """
+            Simulate a new instance which receives everything and then
+            sends the given reply
+            """
+            (connection, _) = sock.accept()
+            with connection:
+                connection.recv(evmapy.handover.CHUNK_SIZE)
+                connection.recv(evmapy.handover.CHUNK_SIZE)
+                connection.send(reply)
+
+        path = os.path.join(self.tempdir.name, 'foo.socket')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET) as sock:
+            sock.bind(path)
+            sock.listen(1)
+            thread = threading.Thread(target=receiver, args=(sock, b'\0'))
+            thread.start()
+            with self.assertRaises(evmapy.handover.HandoverError):
+                evmapy.handover.send(path, {}, [])
+            thread.join()
+        with self.assertRaises(evmapy.handover.HandoverError):
+            evmapy.handover.send(path, {}, [])
+
+    def test_handover_no_config_dir(self):
+        """
+        Check receive() behavior when the configuration directory does
+        not exist
+        """
+        self.tempdir.cleanup()
+        with self.assertRaises(evmapy.handover.HandoverError):
+            evmapy.handover.receive()
+
+    @unittest.mock.patch('evdev.InputDevice')
+    def test_handover_adopt_device(self, fake_inputdevice):
+        """
+        Check if adopt_device() makes the input device use the passed
+        file descriptor
+        """
+        (read_fd, write_fd) = os.pipe()
+        fake_inputdevice.return_value.fd = os.open(os.devnull, os.O_RDONLY)
+        device = evmapy.handover.adopt_device('/dev/input/event0', write_fd)
+        self.assertFalse(os.get_inheritable(device.fd))
+        os.write(device.fd, b'foo')
+        os.close(device.fd)
+        self.assertEqual(os.read(read_fd, 3), b'foo')
+        os.close(read_fd)
+        with self.assertRaises(OSError):
+            os.fstat(write_fd)
+
+    @unittest.mock.patch('evdev.InputDevice')
+    def test_handover_adopt_device_gone(self, fake_inputdevice):
+        """
+        Check adopt_device() behavior when the input device is no longer
+        available
+        """
+        (read_fd, write_fd) = os.pipe()
+        fake_inputdevice.side_effect = FileNotFoundError()
+        with self.assertRaises(OSError):
+            evmapy.handover.adopt_device('/dev/input/event0', write_fd)
+        with self.assertRaises(OSError):
+            os.fstat(write_fd)
+        os.close(read_fd)
+
+    @unittest.mock.patch('fcntl.ioctl')
+    def test_handover_uinput(self, fake_ioctl):
+        """
+        Check if AdoptedUInput properly writes events to the passed file
+        descriptor
+        """
+        (read_fd, write_fd) = os.pipe()
+        uinput = evmapy.handover.AdoptedUInput(write_fd)
+        uinput.write(1, 30, 1)
+        uinput.syn()
+        size = struct.calcsize(evmapy.handover.EVENT_FORMAT)
+        data = os.read(read_fd, 2 * size)
+        events = [
+            struct.unpack(evmapy.handover.EVENT_FORMAT, data[i:i+size])[2:]
+            for i in (0, size)
+        ]
+        self.assertListEqual(events, [(1, 30, 1), (0, 0, 0)])
+        uinput.close()
+        fake_ioctl.assert_called_once_with(
+            write_fd, evmapy.handover.UI_DEV_DESTROY
+        )
+        os.close(read_fd)
+
+
+class TestMultiplexerHandover(tests.test_multiplexer.TestMultiplexerBase):
+
+    """
+    Test handing everything over between Multiplexer instances
+    """
+
+    def add_fake_source(self):
+        """
+        Make the Multiplexer handle a fake source
+        """
+        source = unittest.mock.Mock()
+        source.device = {
+            'name': 'Foo Bar',
+            'path': '/dev/input/event0',
+            'fd':   tests.util.DEVICE_FD,
+        }
+        source.pending = True
+        source.deadline = None
+        source.passthrough = None
+        source.export_state.return_value = {'foo': 'bar'}
+        # pylint: disable=protected-access
+        self.multiplexer._add_source(source)
+        return source
+
+    @unittest.mock.patch('evmapy.handover.send')
+    def test_multiplexer_hand_over(self, fake_send):
+        """
+        Check if Multiplexer passes everything to the new instance and
+        stops without releasing anything
+        """
+        source = self.add_fake_source()
+        source.passthrough = unittest.mock.Mock(fd=42)
+        self.controller.process.side_effect = lambda: (
+            self.multiplexer.hand_over('/foo.socket')
+        )
+        self.poll.poll.side_effect = [
+            tests.test_multiplexer.CONTROL_POLL_EVENT
+        ]
+        self.multiplexer.run()
+        (path, state, fds) = fake_send.call_args[0]
+        self.assertEqual(path, '/foo.socket')
+        self.assertListEqual(fds, [
+            tests.util.CONTROL_FD, self.uinput.fd, tests.util.DEVICE_FD, 42
+        ])
+        self.assertListEqual(state['devices'], [{
+            'fd':           2,
+            'path':         '/dev/input/event0',
+            'source':       {'foo': 'bar'},
+            'passthrough':  3,
+        }])
+        self.assertFalse(source.passthrough.close.called)
+        self.assertTrue(state['uinput'])
+        self.controller.cleanup.assert_called_once_with(unlink=False)
+        self.assertFalse(self.uinput.close.called)
+
+    @unittest.mock.patch('evmapy.handover.send')
+    def test_multiplexer_hand_over_failed(self, fake_send):
+        """
+        Check if Multiplexer keeps running if handing over fails
+        """
+        source = self.add_fake_source()
+        fake_send.side_effect = evmapy.handover.HandoverError()
+        self.multiplexer.hand_over('/foo.socket')
+        self.assertListEqual(self.multiplexer.devices, [source])
+        # pylint: disable=protected-access
+        self.assertListEqual(self.multiplexer._backlog, [source])
+        self.assertEqual(self.logger.error.call_count, 1)
+
+    def test_multiplexer_hand_over_workers(self):
+        """
+        Check if Multiplexer refuses to hand over when worker processes
+        are used
+        """
+        # pylint: disable=protected-access
+        self.multiplexer._links = {unittest.mock.Mock(): []}
+        with unittest.mock.patch('evmapy.handover.send') as fake_send:
+            self.multiplexer.hand_over('/foo.socket')
+        self.assertFalse(fake_send.called)
+        self.assertEqual(self.logger.error.call_count, 1)
+
+    @unittest.mock.patch('os.close')
+    @unittest.mock.patch('evmapy.source.Source')
+    @unittest.mock.patch('evmapy.handover.AdoptedUInput')
+    @unittest.mock.patch('evmapy.handover.adopt_device')
+    @unittest.mock.patch('evmapy.handover.receive')
+    def test_multiplexer_take_over(self, *args):
+        """
+        Check if Multiplexer continues where the instance it took over
+        from stopped, destroying the passthrough devices of input devices
+        which disappeared in the meantime
+        """
+        (fake_receive, fake_adopt, fake_uinput, fake_source, fake_close) = args
+        timers = evmapy.timer.TimerQueue()
+        motion = {}
+        combos = evmapy.combo.ComboIndex()
+        state = {
+            'uinput':   True,
+            'devices':  [
+                {
+                    'fd':           2,
+                    'path':         '/dev/input/event%d' % i,
+                    'source':       {'foo': i},
+                    'passthrough':  3,
+                }
+                for i in (0, 1)
+            ],
+            'timers':   timers,
+            'motion':   motion,
+            'combos':   combos,
+            'capabilities': {evdev.ecodes.EV_KEY: {evdev.ecodes.KEY_ENTER}},
+            'keys':     {},
+        }
+        fake_receive.return_value = (state, [5, 6, 7, 8])
+        fake_adopt.side_effect = [unittest.mock.Mock(), OSError()]
+        fake_source.return_value.device = {
+            'name': 'Foo Bar',
+            'path': '/dev/input/event0',
+            'fd':   tests.util.DEVICE_FD,
+        }
+        fake_source.return_value.pending = True
+        fake_source.return_value.deadline = None
+        tests.util.set_attrs_from_dict(
+            self, tests.test_multiplexer.mock_multiplexer(None, handover=True)
+        )
+        self.assertListEqual(fake_uinput.call_args_list, [
+            unittest.mock.call(6), unittest.mock.call(8)
+        ])
+        # pylint: disable=protected-access
+        self.assertIs(self.multiplexer._uinput, fake_uinput.return_value)
+        fake_adopt.assert_has_calls([
+            unittest.mock.call('/dev/input/event0', 7),
+            unittest.mock.call('/dev/input/event1', 7),
+        ])
+        self.assertEqual(fake_source.call_count, 1)
+        self.assertDictEqual(fake_source.call_args[1]['state'], {'foo': 0})
+        self.assertIs(
+            fake_source.call_args[1]['passthrough'], fake_uinput.return_value
+        )
+        fake_close.assert_called_once_with(8)
+        self.assertIs(self.multiplexer._timers, timers)
+        self.assertIs(self.multiplexer._motion, motion)
+        self.assertIs(self.multiplexer._combos, combos)
+        self.assertIs(self.multiplexer._capabilities, state['capabilities'])
+        self.assertIs(self.multiplexer._keys, state['keys'])
+        self.assertListEqual(
+            self.multiplexer._backlog, [fake_source.return_value]
+        )
+
+    @unittest.mock.patch('evmapy.handover.receive')
+    def test_multiplexer_take_over_failed(self, fake_receive):
+        """
+        Check if Multiplexer starts from scratch if taking over fails
+        """
+        fake_receive.side_effect = evmapy.handover.HandoverError()
+        tests.util.set_attrs_from_dict(
+            self, tests.test_multiplexer.mock_multiplexer(None, handover=True)
+        )
+        self.assertEqual(self.logger.warning.call_count, 1)
+        # pylint: disable=protected-access
+        self.assertIs(self.multiplexer._uinput, self.uinput)
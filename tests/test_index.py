@@ -0,0 +1,151 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the ConfigIndex class
+"""
+
+import json
+import os
+import select
+import tempfile
+import unittest
+import unittest.mock
+
+import evmapy.index
+import evmapy.util
+
+
+class TestConfigIndex(unittest.TestCase):
+
+    """
+    Test ConfigIndex behavior
+    """
+
+    def setUp(self):
+        """
+        Create a ConfigIndex for a temporary configuration directory
+        """
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.config_dir = self.tempdir.name
+        self.write('Foo.Bar.json', {'grab': False})
+        self.write('pad.json', {'match': {'id': '046D:C219'}})
+        self.write('port.json', {'match': {'phys': 'usb-1/input0'}})
+        self.write('serial.json', {'match': {'uniq': '1234'}})
+        self.write('bad.json', {'match': {'foo': 'bar'}})
+        self.write('notes.txt', {})
+        info = evmapy.util.get_app_info()
+        info['config_dir'] = self.config_dir
+        with unittest.mock.patch('evmapy.util.get_app_info') as fake_info:
+            fake_info.return_value = info
+            self.on_change = unittest.mock.Mock()
+            self.index = evmapy.index.ConfigIndex(self.on_change)
+
+    def tearDown(self):
+        """
+        Remove the temporary configuration directory
+        """
+        self.index.cleanup()
+        self.tempdir.cleanup()
+
+    def write(self, filename, config):
+        """
+        Write a configuration file to the temporary configuration
+        directory
+        """
+        with open(os.path.join(self.config_dir, filename), 'w') as output:
+            json.dump(config, output)
+
+    def test_index_lookup(self):
+        """
+        Check if ConfigIndex finds proper configuration files
+        """
+        device = {
+            'name':     'Foo Bar',
+            'phys':     '',
+            'uniq':     '',
+            'vendor':   0x046d,
+            'product':  0xc219,
+            'version':  0x0111,
+        }
+        self.assertEqual(self.index.lookup(device), 'pad.json')
+        device['phys'] = 'usb-1/input0'
+        self.assertEqual(self.index.lookup(device), 'port.json')
+        device['uniq'] = '1234'
+        self.assertEqual(self.index.lookup(device), 'serial.json')
+        self.assertEqual(
+            self.index.lookup({'name': 'Foo Bar'}), 'Foo.Bar.json'
+        )
+        self.assertIsNone(self.index.lookup({'name': 'Baz'}))
+
+    def test_index_no_matchers(self):
+        """
+        Check ConfigIndex behavior when no configuration file contains
+        device matching criteria
+        """
+        for filename in ('pad.json', 'port.json', 'serial.json'):
+            os.remove(os.path.join(self.config_dir, filename))
+        self.index.rebuild()
+        self.assertEqual(
+            self.index.lookup({'name': 'Foo Bar', 'uniq': '1234'}),
+            'Foo.Bar.json'
+        )
+
+    def test_index_watch(self):
+        """
+        Check if ConfigIndex notices configuration file changes
+        """
+        if not self.index.watched:
+            self.skipTest("inotify not available")
+        poll = select.poll()
+        poll.register(self.index, select.POLLIN)
+        self.write('notes.txt', {})
+        self.assertTrue(poll.poll(1000))
+        self.assertListEqual(self.index.process(), [])
+        self.assertFalse(self.on_change.called)
+        self.write('Baz.json', {})
+        self.assertTrue(poll.poll(1000))
+        self.index.process()
+        self.on_change.assert_called_once_with()
+        self.assertEqual(self.index.lookup({'name': 'Baz'}), 'Baz.json')
+
+    def test_index_missing_dir(self):
+        """
+        Check ConfigIndex behavior when the configuration directory does
+        not exist
+        """
+        info = evmapy.util.get_app_info()
+        info['config_dir'] = os.path.join(self.config_dir, 'foo')
+        with unittest.mock.patch('evmapy.util.get_app_info') as fake_info:
+            fake_info.return_value = info
+            index = evmapy.index.ConfigIndex(None)
+        self.assertFalse(index.watched)
+        self.assertIsNone(index.lookup({'name': 'Foo Bar'}))
+        index.cleanup()
+
+    @unittest.mock.patch('ctypes.CDLL')
+    def test_index_no_inotify(self, fake_cdll):
+        """
+        Check ConfigIndex behavior when inotify is not available
+        """
+        fake_cdll.side_effect = OSError()
+        self.assertIsNone(evmapy.index._inotify_init(self.config_dir))
+        fake_cdll.side_effect = None
+        fake_cdll.return_value.inotify_init1.return_value = -1
+        self.assertIsNone(evmapy.index._inotify_init(self.config_dir))
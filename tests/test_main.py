@@ -25,6 +25,8 @@ import io
 import logging
 import logging.handlers
 import socket
+import subprocess
+import sys
 import unittest
 import unittest.mock
 
@@ -90,6 +92,11 @@ def check_main_calls(*args):
     fake_run = fake_multiplexer.return_value.run
     evmapy.__main__.main(params['argv'])
     fake_logging.assert_called_once_with(info['name'], params['debug'])
+    fake_multiplexer.assert_called_once_with(
+        threaded=params.get('threaded', False),
+        processes=params.get('processes', 1),
+        handover=params.get('handover', False),
+    )
     fake_run.assert_called_once_with()
 
 
@@ -100,13 +107,18 @@ class TestMain(unittest.TestCase):
     Test main()
     """
 
-    @unittest.mock.patch('evdev.InputDevice')
-    @unittest.mock.patch('evdev.list_devices')
-    def test_main_list_all(self, fake_list_devices, _, fake_stdout):
+    @unittest.mock.patch('evmapy.sysfs.list_devices')
+    def test_main_list_all(self, fake_list_devices, fake_stdout):
         """
         $ evmapy --list-all
         """
-        fake_devices = ['/dev/input/event%d' % i for i in range(0, 10)]
+        fake_devices = [
+            {
+                'name': 'Foo Bar',
+                'path': '/dev/input/event%d' % i,
+            }
+            for i in range(0, 10)
+        ]
         fake_list_devices.return_value = fake_devices
         evmapy.__main__.main(['--list-all'])
         lines_printed = fake_stdout.getvalue().splitlines()
@@ -191,3 +203,63 @@ class TestMain(unittest.TestCase):
         }
         check_main_calls(params)
         self.assertEqual(fake_stdout.getvalue(), '')
+
+    def test_main_threaded(self, fake_stdout):
+        """
+        $ evmapy --threaded
+        """
+        params = {
+            'argv':     ['--threaded'],
+            'debug':    False,
+            'threaded': True,
+        }
+        check_main_calls(params)
+        self.assertEqual(fake_stdout.getvalue(), '')
+
+    def test_main_processes(self, fake_stdout):
+        """
+        $ evmapy --processes 4
+        """
+        params = {
+            'argv':         ['--processes', '4'],
+            'debug':        False,
+            'processes':    4,
+        }
+        check_main_calls(params)
+        self.assertEqual(fake_stdout.getvalue(), '')
+
+    def test_main_handover(self, fake_stdout):
+        """
+        $ evmapy --handover
+        """
+        params = {
+            'argv':     ['--handover'],
+            'debug':    False,
+            'handover': True,
+        }
+        check_main_calls(params)
+        self.assertEqual(fake_stdout.getvalue(), '')
+
+    def test_main_handover_processes(self, _):
+        """
+        $ evmapy --handover --processes 4
+        """
+        with self.assertRaises(SystemExit):
+            evmapy.__main__.main(['--handover', '--processes', '4'])
+
+
+class TestImports(unittest.TestCase):
+
+    """
+    Test which modules get imported by the console script
+    """
+
+    def test_main_no_evdev(self):
+        """
+        Check if evdev is not imported unless it is really needed
+        """
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, evmapy.__main__; print("evdev" in sys.modules)'
+        ])
+        self.assertEqual(output.strip(), b'False')
@@ -21,20 +21,35 @@
 Unit tests for the Multiplexer class
 """
 
+import os
 import unittest
 import unittest.mock
 
 import evdev
 
+import evmapy.combo
 import evmapy.config
+import evmapy.coprocess
+import evmapy.handover
 import evmapy.multiplexer
+import evmapy.performer
 import evmapy.source
+import evmapy.timer
 
 import tests.util
 
 
 CONTROL_POLL_EVENT = [(tests.util.CONTROL_FD, 0)]
 DEVICE_POLL_EVENT = [(tests.util.DEVICE_FD, 0)]
+# Cross-device combos for a device which never shows up, making the
+# Multiplexer create the uinput device upon initialization
+PEDAL_COMBOS = {
+    'actions': [{
+        'trigger':  ['Foo Pedal/Left', 'Foo Pedal/Right'],
+        'type':     'key',
+        'target':   'KEY_ENTER',
+    }],
+}
 
 
 class FooError(Exception):
@@ -44,17 +59,34 @@ class FooError(Exception):
     pass
 
 
-@unittest.mock.patch('evdev.list_devices')
+@unittest.mock.patch('evmapy.config.load_combos')
+@unittest.mock.patch('evmapy.index.ConfigIndex')
+@unittest.mock.patch('evmapy.sysfs.list_devices')
 @unittest.mock.patch('select.poll')
-@unittest.mock.patch('evdev.UInput')
 @unittest.mock.patch('evmapy.controller.Controller')
 @unittest.mock.patch('logging.getLogger')
-def mock_multiplexer(*args):
+def mock_multiplexer(*args, **kwargs):
     """
-    Generate a Multiplexer with mocked attributes
+    Generate a Multiplexer with mocked attributes; as the uinput device
+    may be created at any time, evdev.UInput stays patched until
+    unittest.mock.patch.stopall() is called
     """
-    (exception, fake_logger, fake_controller, fake_uinput, fake_poll,
-     fake_listdevices) = args
+    (exception, fake_logger, fake_controller, fake_poll,
+     fake_listdevices, fake_index, fake_load_combos) = args
+    fake_uinput = unittest.mock.patch('evdev.UInput').start()
+    fake_load_combos.return_value = kwargs.pop(
+        'combos', evmapy.config.parse_combos(PEDAL_COMBOS)
+    )
+    if exception == 'combos':
+        fake_load_combos.side_effect = evmapy.config.ConfigError('foo')
+    index_fd = kwargs.pop('index_fd', None)
+    fake_index.return_value.watched = index_fd is not None
+    fake_index.return_value.fileno.return_value = index_fd
+    fake_index.return_value.device = 'socket'
+    fake_index.return_value.priority = 0
+    fake_index.return_value.pending = False
+    fake_index.return_value.process.return_value = []
+    fake_index.return_value.lookup.return_value = 'Foo.Bar.json'
     if exception == 'unhandled':
         fake_controller.side_effect = FooError()
     elif exception == 'controller':
@@ -65,15 +97,17 @@ def mock_multiplexer(*args):
     fake_controller.return_value.device = 'socket'
     fake_controller.return_value.fileno.return_value = tests.util.CONTROL_FD
     try:
-        multiplexer = evmapy.multiplexer.Multiplexer()
+        multiplexer = evmapy.multiplexer.Multiplexer(**kwargs)
     except FooError as exc:
         multiplexer = exc
     return {
         'controller':   fake_controller.return_value,
+        'index':        fake_index.return_value,
         'logger':       fake_logger.return_value,
         'multiplexer':  multiplexer,
         'poll':         fake_poll.return_value,
         'uinput':       fake_uinput.return_value,
+        'uinput_class': fake_uinput,
     }
 
 
@@ -86,12 +120,20 @@ class TestMultiplexerBase(unittest.TestCase):
         Create a Multiplexer to use with all tests
         """
         self.controller = None
+        self.index = None
         self.logger = None
         self.multiplexer = None
         self.poll = None
         self.uinput = None
+        self.uinput_class = None
         tests.util.set_attrs_from_dict(self, mock_multiplexer(None))
 
+    def tearDown(self):
+        """
+        Stop patching evdev.UInput
+        """
+        unittest.mock.patch.stopall()
+
 
 class TestMultiplexerExceptions(TestMultiplexerBase):
 
@@ -155,7 +197,7 @@ class TestMultiplexerLoop(TestMultiplexerBase):
     """
 
     @unittest.mock.patch('evdev.InputDevice')
-    @unittest.mock.patch('evdev.list_devices')
+    @unittest.mock.patch('evmapy.sysfs.list_devices')
     def multiplexer_loop(self, *args):
         """
         Add a fake device with the given path to Multiplexer, then run
@@ -163,12 +205,21 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         and finally interrupt it by simulating a KeyboardInterrupt
         """
         (poll_results, source, fake_list, _) = args
-        fake_list.return_value = ['/dev/input/event0']
+        fake_list.return_value = [{
+            'name': 'Foo Bar',
+            'path': '/dev/input/event0',
+        }]
         if source:
             source.return_value.device = {
+                'name': 'Foo Bar',
                 'path': '/dev/input/event0',
                 'fd':   tests.util.DEVICE_FD,
             }
+            if not isinstance(source.return_value.pending, bool):
+                source.return_value.pending = False
+            source.return_value.priority = 0
+            source.return_value.capabilities = {}
+            source.return_value.deadline = None
             fake_rescan = evmapy.multiplexer.SIGHUPReceivedException()
             poll_results.insert(0, fake_rescan)
         poll_results.append(KeyboardInterrupt())
@@ -186,6 +237,113 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         self.multiplexer_loop([], fake_source)
         self.assertEqual(self.poll.register.call_count, 1)
 
+    @unittest.mock.patch('evmapy.sysfs.list_devices')
+    def test_multiplexer_unconfigured(self, fake_list):
+        """
+        Check if Multiplexer doesn't open devices which have no
+        configuration file or which are already handled
+        """
+        fake_list.return_value = [
+            {
+                'name': 'Foo Bar',
+                'path': '/dev/input/event%d' % i,
+            }
+            for i in (0, 1)
+        ]
+        self.index.lookup.return_value = None
+        self.index.reset_mock()
+        handled = unittest.mock.Mock()
+        handled.device = {
+            'name': 'Foo Bar',
+            'path': '/dev/input/event1',
+            'fd':   tests.util.DEVICE_FD,
+        }
+        # pylint: disable=protected-access
+        self.multiplexer._fds[tests.util.DEVICE_FD] = handled
+        with unittest.mock.patch('evdev.InputDevice') as fake_device:
+            self.multiplexer._scan_devices()
+        self.assertFalse(fake_device.called)
+        self.assertEqual(self.index.lookup.call_count, 1)
+        self.assertEqual(self.index.rebuild.call_count, 1)
+
+    @unittest.mock.patch('evmapy.source.Source')
+    @unittest.mock.patch('evdev.InputDevice')
+    @unittest.mock.patch('evmapy.sysfs.list_devices')
+    def test_multiplexer_add_devices(self, fake_list, fake_device,
+                                     fake_source):
+        """
+        Check if Multiplexer opens multiple devices concurrently and
+        starts processing events from all which were opened successfully
+        """
+        paths = ['/dev/input/event%d' % i for i in range(5)]
+        fake_list.return_value = [
+            {'name': 'Foo Bar', 'path': path} for path in paths
+        ]
+
+        def fake_open(path):
+            """
+            Simulate opening an input device, failing for one of them
+            """
+            if path == paths[4]:
+                raise PermissionError()
+            device = unittest.mock.Mock()
+            device.fn = path
+            return device
+
+        def fake_load(device, _):
+            """
+            Simulate loading configuration for an input device, failing
+            for one of them
+            """
+            if device.fn == paths[2]:
+                raise evmapy.config.ConfigError('/foo.json', ValueError())
+            source = unittest.mock.Mock()
+            source.device = {
+                'name': 'Foo Bar',
+                'path': device.fn,
+                'fd':   tests.util.DEVICE_FD + int(device.fn[-1]),
+            }
+            source.capabilities = {}
+            source.deadline = None
+            return source
+
+        fake_device.side_effect = fake_open
+        fake_source.side_effect = fake_load
+        self.poll.reset_mock()
+        # pylint: disable=protected-access
+        self.multiplexer._scan_devices()
+        self.assertEqual(fake_source.call_count, 4)
+        self.assertEqual(self.poll.register.call_count, 3)
+        handled = sorted(s.device['path'] for s in self.multiplexer.devices)
+        self.assertListEqual(handled, paths[:2] + paths[3:4])
+
+    @unittest.mock.patch('evmapy.source.Source')
+    def test_multiplexer_index_watched(self, fake_source):
+        """
+        Check if Multiplexer monitors the configuration index for changes
+        and passes the configuration file found to the Source
+        """
+        index_fd = 4
+        tests.util.set_attrs_from_dict(
+            self, mock_multiplexer(None, index_fd=index_fd)
+        )
+        self.index.lookup.return_value = 'foo.json'
+        self.multiplexer_loop([[(index_fd, 0)]], fake_source)
+        self.index.process.assert_called_once_with()
+        self.assertFalse(self.index.rebuild.called)
+        self.index.cleanup.assert_called_once_with()
+        self.assertEqual(fake_source.call_args[0][1], 'foo.json')
+
+    @unittest.mock.patch('evmapy.source.Source')
+    def test_multiplexer_add_device_gone(self, fake_source):
+        """
+        Check Multiplexer behavior when a device is removed while being
+        added
+        """
+        fake_source.side_effect = evmapy.source.DeviceRemovedException()
+        self.multiplexer_loop([], fake_source)
+        self.assertEqual(self.poll.register.call_count, 1)
+
     @unittest.mock.patch('evmapy.source.Source')
     def test_multiplexer_add_device_ok(self, fake_source):
         """
@@ -205,6 +363,104 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         fake_source.return_value.process.side_effect = fake_exception
         self.multiplexer_loop([DEVICE_POLL_EVENT], fake_source)
         self.assertEqual(self.poll.unregister.call_count, 2)
+        fake_source.return_value.cleanup.assert_called_once_with()
+
+    def test_multiplexer_settle(self):
+        """
+        Check if Multiplexer performs the actions resulting from changes
+        of debounced buttons held back by a source once their debounce
+        windows end and stops doing so once the source is removed
+        """
+        action = {
+            'id':       1,
+            'hold':     0.0,
+            'repeat':   0.0,
+            'type':     'key',
+            'target':   'KEY_ENTER',
+        }
+        source = unittest.mock.Mock()
+        source.device = {
+            'name': 'Foo Bar',
+            'path': '/dev/input/event0',
+            'fd':   tests.util.DEVICE_FD,
+        }
+        type(source).deadline = unittest.mock.PropertyMock(
+            side_effect=[1.0, 1.5, None, 2.0]
+        )
+        source.settle.side_effect = [[(action, True)], [(action, False)]]
+        # pylint: disable=protected-access
+        self.multiplexer._require_capabilities(
+            {evdev.ecodes.EV_KEY: {evdev.ecodes.KEY_ENTER}}
+        )
+        self.multiplexer._update_uinput()
+        self.multiplexer._add_source(source)
+        self.assertEqual(self.multiplexer._timers.next_deadline(), 1.0)
+        self.multiplexer._run_timers(1.0)
+        self.multiplexer._run_timers(1.5)
+        self.assertListEqual(
+            [c[0][0] for c in source.settle.call_args_list], [1.0, 1.5]
+        )
+        self.assertListEqual(
+            [c[0][1:] for c in self.uinput.write.call_args_list],
+            [(evdev.ecodes.KEY_ENTER, 1), (evdev.ecodes.KEY_ENTER, 0)]
+        )
+        self.assertIsNone(self.multiplexer._timers.next_deadline())
+        self.multiplexer._schedule_settle(source)
+        self.multiplexer._remove_device(source, quiet=True)
+        self.assertIsNone(self.multiplexer._timers.next_deadline())
+        # Removing the source again does nothing
+        self.multiplexer._remove_device(source)
+        self.assertFalse(source.cleanup.called)
+
+    def test_multiplexer_combos(self):
+        """
+        Check if Multiplexer subscribes sources to events triggering
+        cross-device combos, performs the combos and releases the events
+        emitted by removed devices
+        """
+        combos = evmapy.config.parse_combos({
+            'actions': [{
+                'trigger':  ['Foo Bar/Bar', 'Baz Qux/Baz'],
+                'type':     'key',
+                'target':   'KEY_ENTER',
+            }],
+        })
+        tests.util.set_attrs_from_dict(
+            self, mock_multiplexer(None, combos=combos)
+        )
+        sources = []
+        for (index, name) in enumerate(('Foo Bar', 'Baz Qux')):
+            source = unittest.mock.MagicMock()
+            source.device = {
+                'name': name,
+                'path': '/dev/input/event%d' % index,
+                'fd':   tests.util.DEVICE_FD + index,
+            }
+            source.deadline = None
+            # pylint: disable=protected-access
+            self.multiplexer._add_source(source)
+            [edges] = source.subscribe.call_args[0]
+            source.edges = list(edges.values())
+            sources.append(source)
+        # pylint: disable=protected-access
+        self.multiplexer._perform_normal_actions([
+            (edge, True) for source in sources for edge in source.edges
+        ])
+        self.uinput.write.assert_called_once_with(
+            evdev.ecodes.EV_KEY, evdev.ecodes.KEY_ENTER, 1
+        )
+        self.multiplexer._remove_device(sources[0])
+        self.uinput.write.assert_called_with(
+            evdev.ecodes.EV_KEY, evdev.ecodes.KEY_ENTER, 0
+        )
+
+    def test_multiplexer_combos_error(self):
+        """
+        Check Multiplexer behavior when cross-device combos can't be
+        loaded
+        """
+        retval = mock_multiplexer('combos')
+        self.assertEqual(retval['logger'].error.call_count, 1)
 
     @unittest.mock.patch('evmapy.source.Source')
     def test_multiplexer_device_fd(self, fake_source):
@@ -215,6 +471,65 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         self.multiplexer_loop([DEVICE_POLL_EVENT], fake_source)
         fake_source.return_value.process.assert_called_once_with()
 
+    @unittest.mock.patch('evmapy.source.Source')
+    def test_multiplexer_device_backlog(self, fake_source):
+        """
+        Check if Multiplexer keeps processing a source which exhausted
+        its event budget without waiting for its file descriptor to
+        become readable again
+        """
+        def fake_process():
+            """
+            Simulate a source which needs two calls to process all
+            pending events
+            """
+            fake_source.return_value.pending = not processed
+            processed.append(True)
+            return []
+        processed = []
+        fake_source.return_value.process.side_effect = fake_process
+        fake_source.return_value.pending = False
+        self.multiplexer_loop([DEVICE_POLL_EVENT, []], fake_source)
+        self.assertEqual(fake_source.return_value.process.call_count, 2)
+        self.assertEqual(self.poll.poll.call_args_list[-2][0][0], 0)
+
+    @unittest.mock.patch('evmapy.source.Source')
+    def test_multiplexer_device_backlog_removed(self, fake_source):
+        """
+        Check if Multiplexer forgets about queued events of a device
+        which is no longer handled
+        """
+        fake_source.return_value.process.return_value = []
+        fake_source.return_value.pending = True
+        self.multiplexer_loop([DEVICE_POLL_EVENT], fake_source)
+        # pylint: disable=protected-access
+        self.assertListEqual(self.multiplexer._backlog, [])
+
+    def test_multiplexer_priority(self):
+        """
+        Check if Multiplexer processes sources in descending order of
+        their priorities, skipping those removed in the meantime
+        """
+        order = []
+        processors = []
+        for priority in (0, 10, 5):
+            processor = unittest.mock.Mock()
+            processor.priority = priority
+            processor.pending = False
+            processor.deadline = None
+            processor.process.side_effect = (
+                lambda p=priority: order.append(p) or []
+            )
+            processors.append(processor)
+        # pylint: disable=protected-access
+        for (fdesc, processor) in enumerate(processors, start=100):
+            self.multiplexer._fds[fdesc] = processor
+        self.multiplexer._process_all(processors)
+        self.assertListEqual(order, [10, 5, 0])
+        del self.multiplexer._fds[101]
+        self.multiplexer._process_all(processors)
+        self.assertListEqual(order, [10, 5, 0, 5, 0])
+
     def test_multiplexer_control_fd(self):
         """
         Check if Multiplexer properly reacts to control socket activity
@@ -222,7 +537,8 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         self.multiplexer_loop([CONTROL_POLL_EVENT], None)
         self.controller.process.assert_called_once_with()
 
-    @unittest.mock.patch('os.system')
+    @unittest.mock.patch('os.waitpid')
+    @unittest.mock.patch('os.posix_spawnp')
     @unittest.mock.patch('evmapy.source.Source')
     def multiplexer_check_action(self, *args):
         """
@@ -230,7 +546,7 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         both directions and returning either the input device file
         descriptor or an empty list on each subsequent poll() call
         """
-        (action, poll_device, fake_source, fake_system) = args
+        (action, poll_device, fake_source, fake_spawn, _) = args
         actions = [
             [(action, True)],
             [(action, False)],
@@ -238,7 +554,7 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         fake_source.return_value.process.side_effect = actions
         poll_results = [DEVICE_POLL_EVENT if d else [] for d in poll_device]
         self.multiplexer_loop(poll_results, fake_source)
-        return fake_system
+        return fake_spawn
 
     def test_multiplexer_normal_key(self):
         """
@@ -247,6 +563,7 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         action = {
             'id':       1,
             'hold':     0.0,
+            'repeat':   0.0,
             'type':     'key',
             'target':   'KEY_ENTER',
         }
@@ -261,12 +578,15 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         action = {
             'id':       1,
             'hold':     0.0,
+            'repeat':   0.0,
             'type':     'exec',
             'target':   'foo',
+            'shell':    False,
+            'commands': [['foo']],
         }
         poll_device = (True, True)
-        fake_system = self.multiplexer_check_action(action, poll_device)
-        fake_system.assert_called_once_with(action['target'])
+        fake_spawn = self.multiplexer_check_action(action, poll_device)
+        fake_spawn.assert_called_once_with('foo', ['foo'], os.environ)
 
     def test_multiplexer_long_key_full(self):
         """
@@ -275,6 +595,7 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         action = {
             'id':       1,
             'hold':     1.0,
+            'repeat':   0.0,
             'type':     'key',
             'target':   'KEY_ENTER',
         }
@@ -289,12 +610,15 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         action = {
             'id':       1,
             'hold':     1.0,
+            'repeat':   0.0,
             'type':     'exec',
             'target':   'foo',
+            'shell':    False,
+            'commands': [['foo']],
         }
         poll_device = (True, False, True)
-        fake_system = self.multiplexer_check_action(action, poll_device)
-        fake_system.assert_called_once_with(action['target'])
+        fake_spawn = self.multiplexer_check_action(action, poll_device)
+        fake_spawn.assert_called_once_with('foo', ['foo'], os.environ)
 
     def test_multiplexer_long_key_stop(self):
         """
@@ -303,6 +627,7 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         action = {
             'id':       1,
             'hold':     1.0,
+            'repeat':   0.0,
             'type':     'key',
             'target':   'KEY_ENTER',
         }
@@ -317,12 +642,219 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         action = {
             'id':       1,
             'hold':     1.0,
+            'repeat':   0.0,
             'type':     'exec',
             'target':   'foo',
+            'shell':    False,
+            'commands': [['foo']],
         }
         poll_device = (True, True)
-        fake_system = self.multiplexer_check_action(action, poll_device)
-        self.assertFalse(fake_system.called)
+        fake_spawn = self.multiplexer_check_action(action, poll_device)
+        self.assertFalse(fake_spawn.called)
+
+    @unittest.mock.patch('evmapy.coprocess.Coprocess')
+    def test_multiplexer_pipe(self, fake_coprocess):
+        """
+        Check if helper programs of pipe actions are started lazily,
+        shared by actions with identical commands and started again
+        after they exit
+        """
+        # pylint: disable=protected-access
+        (action_1, action_2, action_3) = [
+            {
+                'id':       index,
+                'hold':     hold,
+                'repeat':   0.0,
+                'type':     'pipe',
+                'argv':     [argv],
+                'data':     b'bar\n',
+            }
+            for (index, hold, argv) in ((1, 0.0, 'foo'), (2, 1.0, 'foo'),
+                                        (3, 0.0, 'baz'))
+        ]
+        (helper, bad_helper) = [
+            unittest.mock.Mock(running=False, argv=a['argv'], device='socket')
+            for a in (action_1, action_3)
+        ]
+
+        def set_running(running):
+            """
+            Return a function marking the helper program as (not)
+            running
+            """
+            return lambda: setattr(helper, 'running', running)
+
+        helper.start.side_effect = set_running(True)
+        helper.stop.side_effect = set_running(False)
+        bad_helper.start.side_effect = FileNotFoundError(2, 'No such file')
+        fake_coprocess.side_effect = [helper, bad_helper]
+        self.multiplexer._perform_normal_actions([
+            (action_1, True), (action_1, False),
+        ])
+        self.multiplexer._timer_hold(action_2, 0.0)
+        self.multiplexer._perform_normal_actions([(action_3, True)])
+        fake_coprocess.assert_has_calls([
+            unittest.mock.call(['foo'], self.poll),
+            unittest.mock.call(['baz'], self.poll),
+        ])
+        self.assertEqual(helper.start.call_count, 1)
+        self.assertEqual(helper.write.call_count, 2)
+        self.assertFalse(bad_helper.write.called)
+        self.assertIs(self.multiplexer._fds[helper.fileno()], helper)
+        # Helper program exiting while being written to
+        helper.write.side_effect = (
+            evmapy.coprocess.CoprocessExitedException()
+        )
+        self.multiplexer._perform_normal_actions([(action_1, True)])
+        self.assertEqual(helper.stop.call_count, 1)
+        self.assertNotIn(helper.fileno(), self.multiplexer._fds)
+        # ... after poll() reported it as exited in the same batch
+        self.multiplexer._process_all([helper])
+        self.assertFalse(helper.process.called)
+        self.multiplexer._stop_pipe(helper)
+        self.assertEqual(helper.stop.call_count, 1)
+        # Helper program exiting while idle
+        helper.write.side_effect = None
+        self.multiplexer._perform_normal_actions([(action_1, True)])
+        self.assertEqual(helper.start.call_count, 2)
+        helper.process.side_effect = (
+            evmapy.coprocess.CoprocessExitedException()
+        )
+        self.multiplexer._process_all([helper])
+        self.assertEqual(helper.stop.call_count, 2)
+        # Running helper programs are stopped upon shutdown
+        self.multiplexer._perform_normal_actions([(action_1, True)])
+        self.multiplexer_loop([], None)
+        self.assertEqual(helper.stop.call_count, 3)
+
+    def test_multiplexer_uinput_capabilities(self):
+        """
+        Check if the uinput device is only able to report the keys and
+        axes targeted by actions and is rebuilt once any other one needs
+        to be reported
+        """
+        ecodes = evdev.ecodes
+        self.uinput_class.assert_called_once_with(
+            events={ecodes.EV_KEY: [ecodes.KEY_ENTER]}, name=unittest.mock.ANY
+        )
+        # pylint: disable=protected-access
+        capabilities = evmapy.performer._uinput_capabilities({
+            ecodes.EV_ABS:  {ecodes.ABS_Y, ecodes.ABS_X},
+            ecodes.EV_REL:  {ecodes.REL_WHEEL},
+        })
+        self.assertListEqual(
+            [code for (code, _) in capabilities[ecodes.EV_ABS]],
+            [ecodes.ABS_X, ecodes.ABS_Y]
+        )
+        self.assertListEqual(capabilities[ecodes.EV_REL], [ecodes.REL_WHEEL])
+        # A source requiring a key which the device can't report
+        source = unittest.mock.Mock()
+        source.device = {
+            'name': 'Foo Bar',
+            'path': '/dev/input/event0',
+            'fd':   tests.util.DEVICE_FD,
+        }
+        source.capabilities = {ecodes.EV_KEY: {ecodes.KEY_A}}
+        source.actions = []
+        self.multiplexer._add_source(source)
+        self.multiplexer.load_device_config('/dev/input/event0', None)
+        self.assertEqual(self.uinput_class.call_count, 2)
+        self.assertListEqual(
+            self.uinput_class.call_args[1]['events'][ecodes.EV_KEY],
+            [ecodes.KEY_ENTER, ecodes.KEY_A]
+        )
+        self.uinput.close.assert_called_once_with()
+        # Keys already reported don't cause the device to be rebuilt
+        self.multiplexer._uinput_key(ecodes.KEY_A, 1, 1)
+        self.assertEqual(self.uinput_class.call_count, 2)
+        # The old device is kept if a new one can't be created
+        self.uinput_class.side_effect = evdev.uinput.UInputError()
+        self.multiplexer._uinput_key(ecodes.KEY_B, 1, 1)
+        self.assertIs(self.multiplexer._uinput, self.uinput)
+        self.assertEqual(self.logger.warning.call_count, 1)
+
+    def test_multiplexer_abandon_keys(self):
+        """
+        Check if Multiplexer releases keys held by the actions of a
+        device once that device loads another configuration or gets
+        removed, or passes these actions to the coordinating process in
+        a worker process
+        """
+        ecodes = evdev.ecodes
+        (first, second) = [
+            {
+                'id':       index,
+                'hold':     0.0,
+                'repeat':   0.0,
+                'type':     'key',
+                'target':   target,
+            }
+            for (index, target) in ((1, 'KEY_A'), (2, 'KEY_B'))
+        ]
+        source = unittest.mock.Mock()
+        source.device = {
+            'name': 'Foo Bar',
+            'path': '/dev/input/event0',
+            'fd':   tests.util.DEVICE_FD,
+        }
+        source.capabilities = {ecodes.EV_KEY: {ecodes.KEY_A, ecodes.KEY_B}}
+        source.deadline = None
+        source.edges = []
+        source.actions = [first]
+        # pylint: disable=protected-access
+        self.multiplexer._add_source(source)
+        self.multiplexer._require_capabilities(source.capabilities)
+        self.multiplexer._update_uinput()
+        self.multiplexer._perform_normal_actions([(first, True)])
+        # Actions are kept if the configuration fails to load
+        source.load_config.side_effect = evmapy.config.ConfigError(
+            '/foo.json', ValueError()
+        )
+        self.multiplexer.load_device_config('/dev/input/event0', None)
+        self.assertListEqual(list(self.multiplexer._keys), [ecodes.KEY_A])
+        source.load_config.side_effect = None
+        self.multiplexer.load_device_config('/dev/input/event0', None)
+        self.assertDictEqual(self.multiplexer._keys, {})
+        self.uinput.write.assert_called_with(ecodes.EV_KEY, ecodes.KEY_A, 0)
+        # Keys are released if the device disappears while loading
+        source.actions = [second]
+        self.multiplexer._perform_normal_actions([(second, True)])
+        source.load_config.side_effect = (
+            evmapy.source.DeviceRemovedException()
+        )
+        self.multiplexer.load_device_config('/dev/input/event0', None)
+        self.assertDictEqual(self.multiplexer._keys, {})
+        self.assertListEqual(self.multiplexer.devices, [])
+        # Actions abandoned by a worker process
+        self.multiplexer._perform_normal_actions([(first, True)])
+        self.multiplexer.do_abandon(None, [first])
+        self.assertDictEqual(self.multiplexer._keys, {})
+        self.multiplexer._upstream = unittest.mock.Mock()
+        self.multiplexer._abandon_actions([second])
+        self.multiplexer._upstream.send.assert_called_once_with(
+            'abandon', [second]
+        )
+
+    def test_multiplexer_uinput_worker(self):
+        """
+        Check if worker processes report the keys and axes targeted by
+        actions to the coordinating process instead of creating uinput
+        devices themselves
+        """
+        ecodes = evdev.ecodes
+        # pylint: disable=protected-access
+        self.multiplexer._upstream = unittest.mock.Mock()
+        self.multiplexer._require_capabilities(
+            {ecodes.EV_KEY: {ecodes.KEY_A, ecodes.KEY_ENTER}}
+        )
+        self.multiplexer._upstream.send.assert_called_once_with(
+            'capabilities', {ecodes.EV_KEY: {ecodes.KEY_A}}
+        )
+        self.multiplexer._upstream = None
+        self.multiplexer.do_capabilities(
+            None, {ecodes.EV_REL: {ecodes.REL_X}}
+        )
+        self.assertEqual(self.uinput_class.call_count, 2)
 
     def test_multiplexer_no_uinput(self):
         """
@@ -333,6 +865,7 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         action = {
             'id':       1,
             'hold':     0.0,
+            'repeat':   0.0,
             'type':     'key',
             'target':   'KEY_ENTER',
         }
@@ -357,3 +890,61 @@ class TestMultiplexerLoop(TestMultiplexerBase):
         fake_source.return_value.load_config.side_effect = fake_error
         self.multiplexer_loop([CONTROL_POLL_EVENT], fake_source)
         self.assertEqual(self.logger.error.call_count, 1)
+
+    @unittest.mock.patch('evmapy.reader.Reader')
+    @unittest.mock.patch('evmapy.reader.Handoff')
+    @unittest.mock.patch('evmapy.source.Source')
+    def test_multiplexer_threaded(self, fake_source, fake_handoff, *args):
+        """
+        Check if Multiplexer in threaded mode starts a Reader for every
+        handled device, performs the actions passed to it by the Handoff
+        and stops all Readers upon shutdown
+        """
+        (fake_reader, ) = args
+        handoff_fd = 3
+        fake_handoff.return_value.fileno.return_value = handoff_fd
+        fake_handoff.return_value.device = 'socket'
+        fake_handoff.return_value.pending = False
+        fake_handoff.return_value.priority = 0
+        fake_handoff.return_value.process.return_value = [({
+            'id':       1,
+            'hold':     0.0,
+            'repeat':   0.0,
+            'type':     'key',
+            'target':   'KEY_ENTER',
+        }, True)]
+        tests.util.set_attrs_from_dict(
+            self, mock_multiplexer(None, threaded=True)
+        )
+        self.controller.process.side_effect = lambda: (
+            self.multiplexer.load_device_config('/dev/input/event0', None)
+        )
+        self.multiplexer_loop(
+            [[(handoff_fd, 0)], CONTROL_POLL_EVENT], fake_source
+        )
+        fake_reader.return_value.start.assert_called_once_with()
+        fake_reader.return_value.load_config.assert_called_once_with(None)
+        fake_reader.return_value.stop.assert_called_once_with()
+        fake_handoff.return_value.cleanup.assert_called_once_with()
+        self.assertFalse(fake_source.return_value.process.called)
+        self.assertEqual(self.uinput.write.call_count, 1)
+        self.assertEqual(self.poll.register.call_count, 2)
+
+    @unittest.mock.patch('evmapy.source.Source')
+    def test_multiplexer_device_config_gone(self, fake_source):
+        """
+        Check if load_device_config() stops handling a device which was
+        removed while its configuration was being loaded
+        """
+        def fake_do_config():
+            """
+            Simulate a load_device_config() call
+            """
+            self.multiplexer.load_device_config(
+                '/dev/input/event0', 'foo.json'
+            )
+        self.controller.process.side_effect = fake_do_config
+        fake_error = evmapy.source.DeviceRemovedException()
+        fake_source.return_value.load_config.side_effect = fake_error
+        self.multiplexer_loop([CONTROL_POLL_EVENT], fake_source)
+        self.assertEqual(self.poll.unregister.call_count, 2)
@@ -0,0 +1,484 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the performer module
+"""
+
+import os
+import unittest
+import unittest.mock
+
+import evdev
+
+import evmapy.performer
+
+
+class TestPerformer(unittest.TestCase):
+
+    """
+    Test performing actions
+    """
+
+    def setUp(self):
+        """
+        Create a Performer to use with all tests, patching evdev.UInput
+        as the uinput device may be created at any time
+        """
+        patcher = unittest.mock.patch('logging.getLogger')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = unittest.mock.patch('evdev.UInput')
+        self.uinput_class = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.uinput = self.uinput_class.return_value
+        self.performer = evmapy.performer.Performer()
+
+    def fail_uinput(self):
+        """
+        Replace the Performer with one which is unable to create a
+        uinput device
+        """
+        self.uinput_class.side_effect = evdev.uinput.UInputError()
+        self.uinput.reset_mock()
+        self.performer = evmapy.performer.Performer()
+
+    @unittest.mock.patch('time.time')
+    def test_performer_repeat_key(self, fake_time):
+        """
+        Check if a repeated key is pressed immediately, then after the
+        initial delay and then at a fixed rate until released
+        """
+        # pylint: disable=protected-access
+        action = {
+            'id':           1,
+            'hold':         0.0,
+            'repeat':       0.1,
+            'repeat_delay': 0.5,
+            'type':         'key',
+            'target':       'KEY_ENTER',
+        }
+        fake_time.return_value = 0.0
+        self.performer._perform_normal_actions([(action, True)])
+        self.assertEqual(self.uinput.write.call_count, 1)
+        for when in (0.05, 0.5, 0.55, 0.6, 0.65):
+            fake_time.return_value = when
+            self.performer._run_timers(when)
+        # 3 presses and 3 releases
+        self.assertEqual(self.uinput.write.call_count, 6)
+        self.assertEqual(self.performer._timers.next_deadline(), 0.7)
+        self.performer._perform_normal_actions([(action, False)])
+        self.assertEqual(len(self.performer._timers), 0)
+        # Retriggering before the release releases the key first
+        self.uinput.reset_mock()
+        self.performer._perform_normal_actions([(action, True)])
+        self.performer._perform_normal_actions([(action, False)])
+        self.performer._perform_normal_actions([(action, True)])
+        self.assertListEqual(
+            [c[0][2] for c in self.uinput.write.call_args_list], [1, 0, 1]
+        )
+
+    @unittest.mock.patch('os.system')
+    @unittest.mock.patch('time.time')
+    def test_performer_repeat_exec(self, fake_time, fake_system):
+        """
+        Check if a repeated exec action with hold is first performed
+        after the hold time and then repeated without catching up after
+        stalls
+        """
+        # pylint: disable=protected-access
+        action = {
+            'id':           1,
+            'hold':         1.0,
+            'repeat':       0.1,
+            'repeat_delay': 0.5,
+            'type':         'exec',
+            'target':       'foo',
+            'shell':        True,
+            'commands':     ['foo'],
+        }
+        fake_time.return_value = 0.0
+        self.performer._perform_normal_actions([(action, True)])
+        self.assertFalse(fake_system.called)
+        for when in (1.0, 1.5, 2.0):
+            fake_time.return_value = when
+            self.performer._run_timers(when)
+        self.assertEqual(fake_system.call_count, 3)
+        self.assertEqual(self.performer._timers.next_deadline(), 2.0)
+        self.performer._perform_normal_actions([(action, False)])
+        self.assertEqual(len(self.performer._timers), 0)
+
+    @unittest.mock.patch('os.waitpid')
+    @unittest.mock.patch('os.posix_spawnp')
+    def test_performer_exec_spawn(self, fake_spawn, fake_waitpid):
+        """
+        Check if every command of an exec action is spawned directly and
+        waited for, and if a command which cannot be spawned does not
+        prevent the remaining ones from being run
+        """
+        # pylint: disable=protected-access
+        action = {
+            'id':       1,
+            'type':     'exec',
+            'shell':    False,
+            'commands': [['foo', 'bar baz'], ['qux']],
+        }
+        fake_spawn.side_effect = [FileNotFoundError(2, 'No such file'), 42]
+        self.performer._execute_program(action)
+        fake_spawn.assert_has_calls([
+            unittest.mock.call('foo', ['foo', 'bar baz'], os.environ),
+            unittest.mock.call('qux', ['qux'], os.environ),
+        ])
+        fake_waitpid.assert_called_once_with(42, 0)
+
+    @unittest.mock.patch('time.time')
+    def test_performer_macro(self, fake_time):
+        """
+        Check if a macro is played back one step per timer expiry and
+        restarted (releasing the keys it pressed) when retriggered
+        """
+        # pylint: disable=protected-access
+        (shift, key_a) = (evdev.ecodes.KEY_LEFTSHIFT, evdev.ecodes.KEY_A)
+        action = {
+            'id':       1,
+            'hold':     0.0,
+            'repeat':   0.0,
+            'type':     'macro',
+            'steps':    [
+                (0.0, shift, 1),
+                (0.1, key_a, 1),
+                (0.0, key_a, 0),
+                (0.1, shift, 0),
+            ],
+        }
+
+        def written():
+            """
+            Return (code, value) tuples written to uinput so far
+            """
+            return [c[0][1:] for c in self.uinput.write.call_args_list]
+
+        self.performer._require_capabilities(
+            {evdev.ecodes.EV_KEY: {shift, key_a}}
+        )
+        self.performer._update_uinput()
+        fake_time.return_value = 0.0
+        self.performer._perform_normal_actions([(action, True)])
+        self.performer._perform_normal_actions([(action, False)])
+        self.assertFalse(self.uinput.write.called)
+        for when in (0.0, 0.1, 0.1):
+            self.performer._run_timers(when)
+        self.assertListEqual(written(), [(shift, 1), (key_a, 1), (key_a, 0)])
+        # Retriggering releases the shift key and starts over
+        fake_time.return_value = 0.15
+        self.performer._perform_normal_actions([(action, True)])
+        self.assertEqual(written()[-1], (shift, 0))
+        for when in (0.15, 0.25, 0.25, 0.35):
+            self.performer._run_timers(when)
+        self.assertListEqual(written()[-4:], [
+            (shift, 1), (key_a, 1), (key_a, 0), (shift, 0)
+        ])
+        self.assertEqual(self.uinput.syn.call_count, 8)
+        self.assertEqual(len(self.performer._timers), 0)
+        # Macros can also be delayed
+        self.performer._timer_hold(action, 1.0)
+        self.assertEqual(len(self.performer._timers), 1)
+        # Without a uinput device, nothing is written
+        self.fail_uinput()
+        self.performer._perform_normal_actions([(action, True)])
+        self.performer._run_timers(0.15)
+        self.assertFalse(self.uinput.write.called)
+
+    def test_performer_axis(self):
+        """
+        Check axis action
+        """
+        action = {
+            'id':           1,
+            'hold':         0.0,
+            'type':         'axis',
+            'target_type':  evdev.ecodes.EV_ABS,
+            'target_code':  evdev.ecodes.ABS_X,
+        }
+        # pylint: disable=protected-access
+        self.performer._perform_normal_actions([(action, 100)])
+        self.uinput.write.assert_called_once_with(
+            evdev.ecodes.EV_ABS, evdev.ecodes.ABS_X, 100
+        )
+        self.uinput.syn.assert_called_once_with()
+        self.fail_uinput()
+        self.performer._perform_normal_actions([(action, 100)])
+        self.assertFalse(self.uinput.write.called)
+
+    @unittest.mock.patch('time.time')
+    def test_performer_mouse(self, fake_time):
+        """
+        Check mouse action
+        """
+        # pylint: disable=protected-access
+        tick = 1 / evmapy.performer.MOUSE_RATE
+        fast = {
+            'id':           1,
+            'hold':         0.0,
+            'type':         'mouse',
+            'target_type':  evdev.ecodes.EV_REL,
+            'target_code':  evdev.ecodes.REL_X,
+        }
+        slow = dict(fast, id=2, target_code=evdev.ecodes.REL_Y)
+        fake_time.return_value = 0.0
+        self.performer._perform_normal_actions([
+            (fast, 2 * evmapy.performer.MOUSE_RATE),
+            (slow, -evmapy.performer.MOUSE_RATE / 2),
+        ])
+        self.assertEqual(self.performer._timers.next_deadline(), tick)
+        self.assertFalse(self.uinput.write.called)
+        # First tick: only the fast action moves the pointer
+        fake_time.return_value = tick
+        self.performer._run_timers(tick)
+        self.uinput.write.assert_called_once_with(
+            evdev.ecodes.EV_REL, evdev.ecodes.REL_X, 2
+        )
+        self.assertEqual(self.uinput.syn.call_count, 1)
+        self.assertEqual(self.performer._timers.next_deadline(), 2 * tick)
+        # Second tick: fractional movement of the slow action adds up
+        self.uinput.reset_mock()
+        fake_time.return_value = 5 * tick
+        self.performer._run_timers(5 * tick)
+        self.uinput.write.assert_has_calls([
+            unittest.mock.call(evdev.ecodes.EV_REL, evdev.ecodes.REL_X, 2),
+            unittest.mock.call(evdev.ecodes.EV_REL, evdev.ecodes.REL_Y, -1),
+        ])
+        self.assertEqual(self.uinput.syn.call_count, 1)
+        # The timer does not try to catch up after a stall
+        self.assertEqual(self.performer._timers.next_deadline(), 5 * tick)
+        # Releasing one stick keeps the timer armed
+        self.performer._perform_normal_actions([(fast, 0)])
+        self.assertEqual(len(self.performer._timers), 1)
+        self.uinput.reset_mock()
+        self.performer._run_timers(5 * tick)
+        self.assertFalse(self.uinput.write.called)
+        self.assertFalse(self.uinput.syn.called)
+        # Releasing the other one disarms it
+        self.performer._perform_normal_actions([(slow, 0)])
+        self.assertEqual(len(self.performer._timers), 0)
+        self.assertDictEqual(self.performer._motion, {})
+        # Without a uinput device, nothing is written
+        self.fail_uinput()
+        self.performer._perform_normal_actions([(fast, 1000)])
+        self.performer._run_timers(1.0)
+        self.assertFalse(self.uinput.write.called)
+
+    @unittest.mock.patch('time.time')
+    def test_performer_abandon_timers(self, fake_time):
+        """
+        Check if Performer cancels the pending repetitions, releases
+        and macro steps of abandoned actions and releases the keys they
+        pressed
+        """
+        ecodes = evdev.ecodes
+        repeated = {
+            'id':           1,
+            'hold':         0.0,
+            'repeat':       0.1,
+            'repeat_delay': 0.1,
+            'type':         'key',
+            'target':       'KEY_A',
+        }
+        macro = {
+            'id':       2,
+            'hold':     0.0,
+            'repeat':   0.0,
+            'type':     'macro',
+            'steps':    [
+                (0.0, ecodes.KEY_LEFTSHIFT, 1),
+                (0.1, ecodes.KEY_B, 1),
+                (0.0, ecodes.KEY_B, 0),
+                (0.0, ecodes.KEY_LEFTSHIFT, 0),
+            ],
+        }
+        # pylint: disable=protected-access
+        self.performer._require_capabilities({ecodes.EV_KEY: {
+            ecodes.KEY_A, ecodes.KEY_B, ecodes.KEY_LEFTSHIFT
+        }})
+        self.performer._update_uinput()
+        fake_time.return_value = 0.0
+        self.performer._perform_normal_actions(
+            [(repeated, True), (macro, True)]
+        )
+        self.performer._run_timers(0.0)
+        self.assertListEqual(
+            sorted(self.performer._keys),
+            [ecodes.KEY_A, ecodes.KEY_LEFTSHIFT]
+        )
+        self.assertEqual(len(self.performer._timers), 3)
+        self.performer._abandon_actions([repeated, macro])
+        self.assertDictEqual(self.performer._keys, {})
+        self.assertEqual(len(self.performer._timers), 0)
+
+    @unittest.mock.patch('time.time')
+    def test_performer_abandon_analog(self, fake_time):
+        """
+        Check if Performer stops the pointer moved by abandoned mouse
+        actions and centers the output axes of abandoned axis actions
+        """
+        mouse = {
+            'id':           1,
+            'hold':         0.0,
+            'type':         'mouse',
+            'target_type':  evdev.ecodes.EV_REL,
+            'target_code':  evdev.ecodes.REL_X,
+        }
+        (deflected, idle) = [
+            {
+                'id':           index,
+                'hold':         0.0,
+                'type':         'axis',
+                'target_type':  evdev.ecodes.EV_ABS,
+                'target_code':  code,
+                'value':        value,
+            }
+            for (index, code, value) in (
+                (2, evdev.ecodes.ABS_X, 100),
+                (3, evdev.ecodes.ABS_Y, 0),
+            )
+        ]
+        fake_time.return_value = 0.0
+        # pylint: disable=protected-access
+        self.performer._perform_normal_actions([(mouse, 1000)])
+        self.assertEqual(len(self.performer._timers), 1)
+        self.performer._abandon_actions([mouse, deflected, idle])
+        self.assertDictEqual(self.performer._motion, {})
+        self.assertEqual(len(self.performer._timers), 0)
+        self.uinput.write.assert_called_once_with(
+            evdev.ecodes.EV_ABS, evdev.ecodes.ABS_X, 0
+        )
+
+    @unittest.mock.patch('time.time')
+    def test_performer_abandon_worker(self, fake_time):
+        """
+        Check if Performer stops all actions performed on behalf of a
+        worker process which exited, leaving actions of other processes
+        intact
+        """
+        ecodes = evdev.ecodes
+        (pressed, delayed, other) = [
+            {
+                'id':       action_id,
+                'hold':     hold,
+                'repeat':   0.0,
+                'type':     'key',
+                'target':   target,
+            }
+            for (action_id, hold, target) in (
+                ((1000, 1), 0.0, 'KEY_A'),
+                ((1000, 2), 1.0, 'KEY_B'),
+                ((1001, 1), 0.0, 'KEY_C'),
+            )
+        ]
+        mouse = {
+            'id':           (1000, 3),
+            'hold':         0.0,
+            'type':         'mouse',
+            'target_type':  ecodes.EV_REL,
+            'target_code':  ecodes.REL_X,
+        }
+        (deflected, centered) = [
+            {
+                'id':           action_id,
+                'hold':         0.0,
+                'type':         'axis',
+                'target_type':  ecodes.EV_ABS,
+                'target_code':  code,
+                'value':        value,
+            }
+            for (action_id, code, value) in (
+                ((1000, 4), ecodes.ABS_X, 100),
+                ((1000, 5), ecodes.ABS_Y, 0),
+            )
+        ]
+        fake_time.return_value = 0.0
+        # pylint: disable=protected-access
+        self.performer._require_capabilities({
+            ecodes.EV_ABS: {ecodes.ABS_X, ecodes.ABS_Y},
+            ecodes.EV_KEY: {ecodes.KEY_A, ecodes.KEY_B, ecodes.KEY_C},
+            ecodes.EV_REL: {ecodes.REL_X},
+        })
+        self.performer._update_uinput()
+        self.performer._perform_normal_actions([
+            (pressed, True), (delayed, True), (other, True), (mouse, 1000),
+            (deflected, 100), (centered, 100), (centered, 0),
+        ])
+        self.uinput.write.reset_mock()
+        self.performer._abandon_worker(1000)
+        self.assertListEqual(list(self.performer._keys), [ecodes.KEY_C])
+        self.assertDictEqual(self.performer._motion, {})
+        self.assertDictEqual(self.performer._axes, {})
+        self.assertEqual(len(self.performer._timers), 0)
+        self.uinput.write.assert_has_calls([
+            unittest.mock.call(ecodes.EV_ABS, ecodes.ABS_X, 0),
+            unittest.mock.call(ecodes.EV_KEY, ecodes.KEY_A, 0),
+        ])
+        self.assertEqual(self.uinput.write.call_count, 2)
+
+    def test_performer_shared_keys(self):
+        """
+        Check if a key targeted by several actions is only pressed by
+        the first one and released by the last one, without injecting
+        redundant events, and is pressed again after the uinput device
+        is rebuilt
+        """
+        (first, second) = [
+            {
+                'id':       index,
+                'hold':     0.0,
+                'repeat':   0.0,
+                'type':     'key',
+                'target':   'KEY_ENTER',
+            }
+            for index in (1, 2)
+        ]
+
+        def written():
+            """
+            Return values written to uinput so far
+            """
+            return [c[0][2] for c in self.uinput.write.call_args_list]
+
+        # pylint: disable=protected-access
+        self.performer._perform_normal_actions([
+            (first, True), (second, True), (first, True),
+        ])
+        self.assertListEqual(written(), [1])
+        self.performer._perform_normal_actions([
+            (first, False), (first, False),
+        ])
+        self.assertListEqual(written(), [1])
+        self.performer._perform_normal_actions([
+            (second, False), (second, False),
+        ])
+        self.assertListEqual(written(), [1, 0])
+        self.performer._perform_normal_actions([(first, True)])
+        self.performer._require_capabilities(
+            {evdev.ecodes.EV_KEY: {evdev.ecodes.KEY_A}}
+        )
+        self.performer._update_uinput()
+        self.assertListEqual(written(), [1, 0, 1, 1])
+        self.uinput.write.assert_called_with(
+            evdev.ecodes.EV_KEY, evdev.ecodes.KEY_ENTER, 1
+        )
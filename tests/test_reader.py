@@ -0,0 +1,166 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the Reader and Handoff classes
+"""
+
+import os
+import time
+import unittest
+import unittest.mock
+
+import evmapy.reader
+import evmapy.source
+
+
+class TestHandoff(unittest.TestCase):
+
+    """
+    Test Handoff behavior
+    """
+
+    def setUp(self):
+        """
+        Create a Handoff to use with all tests
+        """
+        self.on_removed = unittest.mock.Mock()
+        self.handoff = evmapy.reader.Handoff(self.on_removed)
+
+    def tearDown(self):
+        """
+        Close the Handoff's wakeup pipe
+        """
+        self.handoff.cleanup()
+
+    def test_handoff_order(self):
+        """
+        Check if Handoff returns queued actions in the order they were
+        queued in and handles removal notifications
+        """
+        self.handoff.put('foo', [1, 2])
+        self.handoff.put('bar', None)
+        self.handoff.put('baz', [3])
+        self.assertTrue(os.read(self.handoff.fileno(), 1))
+        self.assertListEqual(self.handoff.process(), [1, 2, 3])
+        self.on_removed.assert_called_once_with('bar')
+        self.assertListEqual(self.handoff.process(), [])
+
+    @unittest.mock.patch('os.write')
+    def test_handoff_pipe_full(self, fake_write):
+        """
+        Check Handoff behavior when its wakeup pipe is full
+        """
+        fake_write.side_effect = BlockingIOError()
+        self.handoff.put('foo', [1])
+        self.assertListEqual(self.handoff.process(), [1])
+
+
+class TestReader(unittest.TestCase):
+
+    """
+    Test Reader behavior
+    """
+
+    def setUp(self):
+        """
+        Create a Reader for a fake source whose device is simulated
+        using a pipe
+        """
+        (self.device_read_fd, self.device_write_fd) = os.pipe()
+        self.source = unittest.mock.Mock()
+        self.source.device = {
+            'fd':   self.device_read_fd,
+            'path': '/dev/input/event0',
+        }
+        self.source.pending = False
+        self.source.deadline = None
+        self.handoff = unittest.mock.Mock()
+        self.reader = evmapy.reader.Reader(self.source, self.handoff)
+
+    def tearDown(self):
+        """
+        Close the pipe simulating the input device
+        """
+        os.close(self.device_read_fd)
+        os.close(self.device_write_fd)
+
+    def test_reader_process(self):
+        """
+        Check if Reader passes the actions generated by its source to
+        the Handoff
+        """
+        self.source.process.side_effect = [
+            ['foo'],
+            ['bar'],
+            evmapy.source.DeviceRemovedException(),
+        ]
+        type(self.source).pending = unittest.mock.PropertyMock(
+            side_effect=[True, False]
+        )
+        os.write(self.device_write_fd, b'\0')
+        self.reader.start()
+        self.reader.join(5)
+        self.assertFalse(self.reader.is_alive())
+        self.assertListEqual(self.handoff.put.call_args_list, [
+            unittest.mock.call(self.source, ['foo', 'bar']),
+            unittest.mock.call(self.source, None),
+        ])
+        self.reader.stop()
+
+    def test_reader_settle(self):
+        """
+        Check if Reader asks its source to report the changes held back
+        until the end of their debounce windows once these windows end,
+        both when no events are emitted and when events keep coming
+        """
+        deadline = time.time() + 0.01
+        type(self.source).deadline = unittest.mock.PropertyMock(
+            side_effect=[deadline, deadline, None, deadline - 1, None]
+        )
+        self.source.settle.side_effect = [['foo'], ['bar']]
+        self.source.process.side_effect = [
+            [],
+            evmapy.source.DeviceRemovedException(),
+        ]
+        self.reader.start()
+        time.sleep(0.05)
+        os.write(self.device_write_fd, b'\0')
+        self.reader.join(5)
+        self.assertFalse(self.reader.is_alive())
+        (first, second) = [c[0][0] for c in self.source.settle.call_args_list]
+        self.assertGreaterEqual(first, deadline)
+        self.assertGreaterEqual(second, first)
+        self.assertListEqual(self.handoff.put.call_args_list, [
+            unittest.mock.call(self.source, ['foo']),
+            unittest.mock.call(self.source, ['bar']),
+            unittest.mock.call(self.source, None),
+        ])
+        self.reader.stop()
+
+    def test_reader_stop(self):
+        """
+        Check if Reader stops when requested to
+        """
+        self.reader.start()
+        self.reader.load_config('foo.json')
+        self.source.load_config.assert_called_once_with('foo.json')
+        self.reader.stop()
+        self.assertFalse(self.reader.is_alive())
+        self.assertFalse(self.source.process.called)
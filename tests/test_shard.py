@@ -0,0 +1,307 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the shard module
+"""
+
+import unittest
+import unittest.mock
+
+import evmapy.index
+import evmapy.multiplexer
+import evmapy.shard
+import evmapy.source
+import evmapy.sysfs
+
+import tests.test_multiplexer
+import tests.util
+
+
+class TestShard(unittest.TestCase):
+
+    """
+    Test all functions and classes
+    """
+
+    def setUp(self):
+        """
+        Create a pair of connected Links to use with all tests
+        """
+        self.target = unittest.mock.Mock()
+        self.target.do_foo.return_value = ['bar']
+        self.target.do_baz.return_value = None
+        (ours, theirs) = evmapy.shard.Link.pair()
+        self.ours = evmapy.shard.Link(ours, self.target, 1234)
+        self.theirs = evmapy.shard.Link(theirs, self.target)
+
+    def tearDown(self):
+        """
+        Close both Links
+        """
+        self.ours.close()
+        self.theirs.close()
+
+    def test_shard_get_shard(self):
+        """
+        Test get_shard()
+        """
+        shards = set(
+            evmapy.shard.get_shard('/dev/input/event%d' % i, 4)
+            for i in range(0, 64)
+        )
+        self.assertSetEqual(shards, set([0, 1, 2, 3]))
+        self.assertEqual(
+            evmapy.shard.get_shard('/dev/input/foo', 4),
+            evmapy.shard.get_shard('/dev/input/foo', 4)
+        )
+
+    def test_shard_link(self):
+        """
+        Check if messages sent over a Link are processed by the target
+        at the other end
+        """
+        self.assertIsInstance(self.ours.fileno(), int)
+        self.ours.send('foo', 1, {'bar': 2})
+        self.assertListEqual(self.theirs.process(), ['bar'])
+        self.target.do_foo.assert_called_once_with(self.theirs, 1, {'bar': 2})
+        self.theirs.send('baz')
+        self.assertListEqual(self.ours.process(), [])
+        self.assertEqual(self.ours.pid, 1234)
+
+    def test_shard_link_closed(self):
+        """
+        Check Link behavior when the other end gets closed
+        """
+        self.theirs.close()
+        with self.assertRaises(evmapy.shard.LinkClosedException):
+            self.ours.process()
+
+    def test_shard_remote_source(self):
+        """
+        Check if RemoteSource passes configuration requests to the
+        worker process and leaves stopping its actions to it
+        """
+        device = {
+            'name': 'Foo Bar',
+            'path': '/dev/input/event0',
+        }
+        remote = evmapy.shard.RemoteSource(self.ours, device)
+        self.assertListEqual(remote.actions, [])
+        remote.load_config('foo.json')
+        self.theirs.process()
+        self.target.do_config.assert_called_once_with(
+            self.theirs, '/dev/input/event0', 'foo.json'
+        )
+
+
+class TestMultiplexerProcesses(tests.test_multiplexer.TestMultiplexerBase):
+
+    """
+    Test Multiplexer behavior when worker processes are used
+    """
+
+    @unittest.mock.patch('os.waitpid')
+    @unittest.mock.patch('os.fork')
+    @unittest.mock.patch('evmapy.shard.Link')
+    def test_multiplexer_coordinator(self, fake_link, fake_fork, fake_wait):
+        """
+        Check if the coordinating process performs actions passed by
+        worker processes, keeps track of the devices they handle and
+        forwards control requests to them
+        """
+        links = []
+
+        def fake_link_init(*_):
+            """
+            Create a fake Link with a unique file descriptor
+            """
+            link = unittest.mock.Mock()
+            link.fileno.return_value = 10 + len(links)
+            link.pid = 1000 + len(links)
+            link.device = 'socket'
+            link.priority = 0
+            link.pending = False
+            links.append(link)
+            return link
+        fake_link.pair.return_value = (
+            unittest.mock.Mock(), unittest.mock.Mock()
+        )
+        fake_link.side_effect = fake_link_init
+        fake_fork.return_value = 1000
+        tests.util.set_attrs_from_dict(
+            self, tests.test_multiplexer.mock_multiplexer(None, processes=2)
+        )
+        device = {
+            'name': 'Foo Bar',
+            'path': '/dev/input/event0',
+            'fd':   tests.util.DEVICE_FD,
+        }
+        action = {
+            'id':       (1000, 1),
+            'hold':     0.0,
+            'repeat':   0.0,
+            'type':     'key',
+            'target':   'KEY_ENTER',
+        }
+        links[0].process.side_effect = lambda: (
+            self.multiplexer.do_devices(links[0], [device]) or
+            self.multiplexer.do_actions(links[0], [(action, True)])
+        )
+        links[1].process.side_effect = evmapy.shard.LinkClosedException()
+        self.controller.process.side_effect = lambda: (
+            self.multiplexer.load_device_config('/dev/input/event0', None)
+        )
+        self.poll.poll.side_effect = [
+            [(10, 0), (11, 0)],
+            tests.test_multiplexer.CONTROL_POLL_EVENT,
+            evmapy.multiplexer.SIGHUPReceivedException(),
+            KeyboardInterrupt(),
+        ]
+        self.multiplexer.run()
+        self.assertEqual(fake_fork.call_count, 2)
+        # The key pressed on behalf of the first worker process is only
+        # released once that process is stopped on shutdown
+        self.assertListEqual(
+            [c[0][2] for c in self.uinput.write.call_args_list], [1, 0]
+        )
+        links[0].send.assert_has_calls([
+            unittest.mock.call('config', '/dev/input/event0', None),
+            unittest.mock.call('scan'),
+        ])
+        self.assertEqual(fake_wait.call_count, 2)
+        self.assertEqual(self.logger.error.call_count, 1)
+
+    @unittest.mock.patch('os.fork')
+    @unittest.mock.patch('evmapy.shard.Link')
+    def test_multiplexer_fork(self, fake_link, fake_fork):
+        """
+        Check if forked worker processes run the worker loop
+        """
+        ours = unittest.mock.Mock()
+        theirs = unittest.mock.Mock()
+        fake_link.pair.return_value = (ours, theirs)
+        fake_fork.return_value = 0
+        with unittest.mock.patch.object(
+            evmapy.multiplexer.Multiplexer, '_run_worker'
+        ) as fake_run_worker:
+            fake_run_worker.side_effect = SystemExit()
+            with self.assertRaises(SystemExit):
+                tests.test_multiplexer.mock_multiplexer(None, processes=2)
+        ours.close.assert_called_once_with()
+        fake_run_worker.assert_called_once_with(theirs, (0, 2), False)
+
+    @unittest.mock.patch('os._exit')
+    @unittest.mock.patch('select.poll')
+    @unittest.mock.patch('evmapy.index.ConfigIndex')
+    @unittest.mock.patch('evdev.InputDevice')
+    @unittest.mock.patch('evmapy.sysfs.list_devices')
+    @unittest.mock.patch('evmapy.source.Source')
+    @unittest.mock.patch('evmapy.shard.Link')
+    def check_worker(self, *args):
+        """
+        Run a worker process loop, replacing poll() results with the
+        provided values, and return the fake upstream Link, Source and
+        os._exit()
+        """
+        (poll_results, fake_link, fake_source, fake_list, _, fake_index,
+         fake_poll, fake_exit) = args
+        fake_poll.return_value = self.poll
+        fake_index.return_value.watched = False
+        fake_index.return_value.lookup.return_value = 'Foo.Bar.json'
+        fake_list.return_value = [
+            {
+                'name': 'Foo Bar',
+                'path': '/dev/input/event%d' % i,
+            }
+            for i in (0, 1)
+        ]
+        upstream = fake_link.return_value
+        upstream.fileno.return_value = 10
+        upstream.device = 'socket'
+        upstream.priority = 0
+        upstream.pending = False
+        upstream.deadline = None
+        upstream.process.side_effect = evmapy.shard.LinkClosedException()
+        source = fake_source.return_value
+        source.device = {
+            'name': 'Foo Bar',
+            'path': '/dev/input/event0',
+            'fd':   tests.util.DEVICE_FD,
+        }
+        source.priority = 0
+        source.pending = False
+        source.deadline = None
+        source.process.return_value = [({
+            'id':       1,
+            'hold':     0.0,
+            'repeat':   0.0,
+            'type':     'key',
+            'target':   'KEY_ENTER',
+        }, True)]
+        self.poll.poll.side_effect = poll_results
+        stale_link = unittest.mock.Mock()
+        # pylint: disable=protected-access
+        self.multiplexer._links = {stale_link: []}
+        shard = (evmapy.shard.get_shard('/dev/input/event0', 2), 2)
+        self.multiplexer._run_worker(unittest.mock.Mock(), shard, False)
+        stale_link.close.assert_called_once_with()
+        self.assertEqual(fake_source.call_count, 1)
+        return (upstream, source, fake_exit)
+
+    def test_multiplexer_worker(self):
+        """
+        Check if a worker process passes actions and device information
+        to the coordinating process and exits once the latter does
+        """
+        poll_results = [tests.test_multiplexer.DEVICE_POLL_EVENT, [(10, 0)]]
+        (upstream, source, fake_exit) = self.check_worker(poll_results)
+        fake_exit.assert_called_once_with(0)
+        sent = [c[0][0] for c in upstream.send.call_args_list]
+        self.assertListEqual(sent, ['devices', 'actions'])
+        self.assertEqual(source.process.call_count, 1)
+        self.assertFalse(self.uinput.write.called)
+
+    def test_multiplexer_worker_exception(self):
+        """
+        Check worker process behavior when an unhandled exception is
+        raised
+        """
+        (_, _, fake_exit) = self.check_worker(
+            [tests.test_multiplexer.FooError()]
+        )
+        fake_exit.assert_called_once_with(1)
+        self.assertEqual(self.logger.exception.call_count, 1)
+
+    def test_multiplexer_worker_config(self):
+        """
+        Check if a worker process handles requests sent by the
+        coordinating process
+        """
+        # pylint: disable=protected-access
+        with unittest.mock.patch.object(self.multiplexer, '_scan_devices'):
+            self.multiplexer.do_scan(None)
+            self.multiplexer._scan_devices.assert_called_once_with()
+        with unittest.mock.patch.object(
+            self.multiplexer, 'load_device_config'
+        ):
+            self.multiplexer.do_config(None, '/dev/input/event0', 'foo')
+            self.multiplexer.load_device_config.assert_called_once_with(
+                '/dev/input/event0', 'foo'
+            )
@@ -34,6 +34,23 @@ import evmapy.util
 import tests.util
 
 
+def fake_absinfo(values):
+    """
+    Generate a replacement for evdev.InputDevice.absinfo() which reports
+    the given current values of axes and fails for other axes
+    """
+    def absinfo(code):
+        """
+        Return current information about the given axis
+        """
+        if code not in values:
+            raise OSError(errno.EINVAL, "Invalid argument")
+        return evdev.device.AbsInfo(
+            value=values[code], min=0, max=255, fuzz=0, flat=0, resolution=0
+        )
+    return absinfo
+
+
 @unittest.mock.patch('evmapy.config.load')
 @unittest.mock.patch('logging.getLogger')
 @unittest.mock.patch('evdev.InputDevice')
@@ -48,6 +65,8 @@ def mock_source(*args):
         'fd':   tests.util.DEVICE_FD,
     }
     tests.util.set_attrs_from_dict(fake_inputdevice.return_value, device_attrs)
+    fake_inputdevice.return_value.active_keys.return_value = []
+    fake_inputdevice.return_value.absinfo.side_effect = fake_absinfo({})
     fake_config = evmapy.config.parse(tests.util.FAKE_CONFIG)
     fake_config_load.return_value = (fake_config, None)
     device = fake_inputdevice()
@@ -79,6 +98,7 @@ class TestSource(unittest.TestCase):
         """
         event_list = [
             (evdev.ecodes.ecodes['EV_SYN'], 0, 0),
+            (evdev.ecodes.ecodes['EV_MSC'], 4, 0),
             (evdev.ecodes.ecodes['EV_KEY'], 400, evdev.KeyEvent.key_down),
             (evdev.ecodes.ecodes['EV_KEY'], 300, evdev.KeyEvent.key_down),
             (evdev.ecodes.ecodes['EV_KEY'], 200, evdev.KeyEvent.key_down),
@@ -149,6 +169,127 @@ class TestSource(unittest.TestCase):
             self.assertTupleEqual((action['target'], direction), expected)
         self.assertEqual(expected_list, [])
 
+    def test_source_budget(self):
+        """
+        Check if Source stops processing events once its event budget is
+        exhausted and resumes without reading from the device again
+        """
+        # pylint: disable=protected-access
+        self.source._config['budget'] = 2
+        fake_events = [
+            evdev.events.InputEvent(
+                0, 0, evdev.ecodes.ecodes['EV_KEY'], 200, value
+            )
+            for value in (1, 0, 1)
+        ]
+        self.device.read.return_value = fake_events
+        actions = self.source.process()
+        self.assertEqual(len(actions), 2)
+        self.assertTrue(self.source.pending)
+        actions = self.source.process()
+        self.assertEqual(len(actions), 1)
+        self.assertFalse(self.source.pending)
+        self.assertEqual(self.device.read.call_count, 1)
+        self.assertEqual(self.source.priority, 0)
+
+    def test_source_syn_dropped(self):
+        """
+        Check if Source discards the incomplete frame following a
+        SYN_DROPPED event up to the next SYN_REPORT event and synthesizes
+        the events it missed
+        """
+        ev_syn = evdev.ecodes.ecodes['EV_SYN']
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        event_list = [
+            (ev_key, 200, evdev.KeyEvent.key_down),
+            (ev_syn, evdev.ecodes.ecodes['SYN_REPORT'], 0),
+            (ev_syn, evdev.ecodes.ecodes['SYN_DROPPED'], 0),
+            (ev_key, 201, evdev.KeyEvent.key_down),
+            (ev_syn, evdev.ecodes.ecodes['SYN_MT_REPORT'], 0),
+            (ev_syn, evdev.ecodes.ecodes['SYN_CONFIG'], 0),
+            (ev_key, 202, evdev.KeyEvent.key_down),
+            (ev_syn, evdev.ecodes.ecodes['SYN_REPORT'], 0),
+        ]
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, etype, ecode, evalue)
+            for (etype, ecode, evalue) in event_list
+        ]
+        self.device.active_keys.return_value = [201]
+        self.device.absinfo.side_effect = fake_absinfo({100: 0})
+        actions = self.source.process()
+        expected_list = [
+            ('KEY_ENTER', True),
+            ('KEY_ENTER', False),
+            ('KEY_LEFT', True),
+        ]
+        self.assertListEqual(
+            [(action['target'], direction) for (action, direction) in actions],
+            expected_list
+        )
+
+    def test_source_syn_dropped_removed(self):
+        """
+        Test Source behavior when the input device associated with it
+        gets disconnected while resynchronizing its state
+        """
+        ev_syn = evdev.ecodes.ecodes['EV_SYN']
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, ev_syn, code, 0)
+            for code in (evdev.ecodes.ecodes['SYN_DROPPED'],
+                         evdev.ecodes.ecodes['SYN_REPORT'])
+        ]
+        self.device.active_keys.side_effect = OSError(errno.ENODEV, "Foo")
+        with self.assertRaises(evmapy.source.DeviceRemovedException):
+            self.source.process()
+        self.device.active_keys.side_effect = OSError()
+        with self.assertRaises(OSError):
+            self.source.process()
+        self.device.active_keys.side_effect = None
+        self.device.absinfo.side_effect = OSError(errno.ENODEV, "Foo")
+        with self.assertRaises(evmapy.source.DeviceRemovedException):
+            self.source.process()
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_load_config_state(self, fake_config_load):
+        """
+        Check if Source seeds the state of a freshly loaded
+        configuration from the current state of its underlying device
+        (rather than from the axis information cached when the device
+        was opened) without performing any actions
+        """
+        fake_config = evmapy.config.parse(tests.util.FAKE_CONFIG)
+        fake_config_load.return_value = (fake_config, None)
+        self.device.active_keys.return_value = [200, 201]
+        self.device.capabilities.return_value = {
+            evdev.ecodes.ecodes['EV_ABS']: [
+                (100, evdev.device.AbsInfo(
+                    value=0, min=0, max=255, fuzz=0, flat=0, resolution=0
+                )),
+            ],
+        }
+        self.device.absinfo.side_effect = fake_absinfo({100: 255})
+        self.source.load_config()
+        ev_abs = evdev.ecodes.ecodes['EV_ABS']
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        events = fake_config['events']
+        self.assertEqual(events[ev_abs, 100]['previous'], 255)
+        self.assertEqual(events[ev_key, 200]['previous'], 1)
+        self.assertEqual(events[ev_key, 202]['previous'], 0)
+        self.device.active_keys.return_value = [201, 202]
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, ev_key, 200, 0),
+            evdev.events.InputEvent(0, 0, ev_key, 202, 1),
+        ]
+        actions = self.source.process()
+        expected_list = [
+            ('KEY_ENTER', False),
+            ('KEY_ESC', True),
+        ]
+        self.assertListEqual(
+            [(action['target'], direction) for (action, direction) in actions],
+            expected_list
+        )
+
     def test_source_device_removed(self):
         """
         Test Source behavior when the input device associated with it
@@ -174,8 +315,8 @@ class TestSource(unittest.TestCase):
         requested to
         """
         fake_config_load.side_effect = [
-            ({'grab': False}, None),
-            ({'grab': True}, None),
+            ({'events': {}, 'grab': False, 'passthrough': False}, None),
+            ({'events': {}, 'grab': True, 'passthrough': False}, None),
         ]
         self.source.load_config()
         self.source.load_config()
@@ -188,9 +329,625 @@ class TestSource(unittest.TestCase):
         requested to
         """
         fake_config_load.side_effect = [
-            ({'grab': True}, None),
-            ({'grab': False}, None),
+            ({'events': {}, 'grab': True, 'passthrough': False}, None),
+            ({'events': {}, 'grab': False, 'passthrough': False}, None),
         ]
         self.source.load_config()
         self.source.load_config()
         self.assertEqual(self.device.ungrab.call_count, 1)
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_export_state(self, fake_config_load):
+        """
+        Check if a Source created using state exported by another one
+        continues where the latter stopped, without loading
+        configuration or grabbing its underlying device again
+        """
+        # pylint: disable=protected-access
+        self.source._config['budget'] = 1
+        self.source._grabbed = True
+        self.device.read.return_value = [
+            evdev.events.InputEvent(
+                0, 0, evdev.ecodes.ecodes['EV_KEY'], 200, value
+            )
+            for value in (1, 0)
+        ]
+        self.assertEqual(len(self.source.process()), 1)
+        source = evmapy.source.Source(
+            self.device, state=self.source.export_state()
+        )
+        self.assertFalse(fake_config_load.called)
+        self.assertTrue(source.pending)
+        self.assertEqual(len(source.process()), 1)
+        fake_config_load.return_value = (
+            {'events': {}, 'grab': False, 'passthrough': False}, None
+        )
+        source.load_config()
+        self.device.ungrab.assert_called_once_with()
+        self.assertFalse(self.device.grab.called)
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_axis_action(self, fake_config_load):
+        """
+        Check if Source translates input axis events into output axis
+        values, reporting absolute axes only when they change and
+        relative axes for as long as the input axis is deflected
+        """
+        config = dict(tests.util.FAKE_CONFIG)
+        config['actions'] = [
+            {
+                'trigger':  'Foo',
+                'type':     'axis',
+                'target':   'ABS_X',
+                'deadzone': 0.5,
+            },
+            {
+                'trigger':  'Foo',
+                'type':     'axis',
+                'target':   'REL_X',
+                'deadzone': 0.5,
+            },
+        ]
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        self.source.load_config()
+        ev_abs = evdev.ecodes.ecodes['EV_ABS']
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, ev_abs, 100, value)
+            for value in (130, 255, 255, 300, 0)
+        ]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [
+                ('ABS_X', 32767),
+                ('REL_X', 10),
+                ('REL_X', 10),
+                ('REL_X', 10),
+                ('ABS_X', -32767),
+                ('REL_X', -10),
+            ]
+        )
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_axis_zones(self, fake_config_load):
+        """
+        Check if Source reports leaving and entering configured axis
+        zones, taking hysteresis into account
+        """
+        config = dict(tests.util.FAKE_CONFIG)
+        config['axes'] = [{
+            'name':         'Foo',
+            'code':         100,
+            'min':          0,
+            'max':          255,
+            'hysteresis':   10,
+            'zones':        [
+                {'name': 'left', 'min': 0, 'max': 50},
+                {'name': 'center', 'min': 100, 'max': 155},
+                {'name': 'right', 'min': 205, 'max': 255},
+            ],
+        }]
+        config['buttons'] = []
+        config['actions'] = [
+            {
+                'trigger':  'Foo:' + zone,
+                'type':     'exec',
+                'target':   zone,
+            }
+            for zone in ('left', 'center', 'right')
+        ]
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        self.source.load_config()
+        ev_abs = evdev.ecodes.ecodes['EV_ABS']
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, ev_abs, 100, value)
+            for value in (0, 55, 65, 150, 250, 200, 190)
+        ]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [
+                ('left', True),
+                ('left', False),
+                ('center', True),
+                ('center', False),
+                ('right', True),
+                ('right', False),
+            ]
+        )
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_debounce(self, fake_config_load):
+        """
+        Check if Source discards switch bounce based on event timestamps
+        and reports a change held back until the end of the debounce
+        window before the next one
+        """
+        config = dict(tests.util.FAKE_CONFIG)
+        config['debounce'] = 0.01
+        config['axes'] = []
+        config['buttons'] = [
+            {'name': 'Bar', 'code': 200, 'debounce': 0},
+            {'name': 'Baz', 'code': 300},
+        ]
+        config['actions'] = [
+            {
+                'trigger':  button,
+                'type':     'exec',
+                'target':   button,
+            }
+            for button in ('Bar', 'Baz')
+        ]
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        self.source.load_config()
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        self.device.read.return_value = [
+            evdev.events.InputEvent(sec, usec, ev_key, code, value)
+            for (sec, usec, code, value) in (
+                # Bouncing press and release
+                (0, 0, 300, 1),
+                (0, 1000, 300, 0),
+                (0, 2000, 300, 1),
+                (0, 100000, 300, 0),
+                (0, 101000, 300, 1),
+                (0, 109000, 300, 0),
+                # Button without debouncing
+                (0, 109000, 200, 1),
+                (0, 109500, 200, 0),
+                # Press shorter than the debounce time
+                (1, 0, 300, 1),
+                (1, 5000, 300, 0),
+                (2, 0, 300, 1),
+            )
+        ]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [
+                ('Baz', True),
+                ('Baz', False),
+                ('Bar', True),
+                ('Bar', False),
+                ('Baz', True),
+                ('Baz', False),
+                ('Baz', True),
+            ]
+        )
+        # pylint: disable=protected-access
+        self.assertSetEqual(self.source._held_back, set())
+        self.assertIsNone(self.source.deadline)
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_debounce_settle(self, fake_config_load):
+        """
+        Check if Source reports the release ending a tap shorter than the
+        debounce window once that window ends
+        """
+        config = dict(tests.util.FAKE_CONFIG)
+        config['debounce'] = 0.01
+        config['axes'] = []
+        config['buttons'] = [{'name': 'Baz', 'code': 300}]
+        config['actions'] = [{
+            'trigger':  'Baz',
+            'type':     'exec',
+            'target':   'Baz',
+        }]
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        self.source.load_config()
+        self.assertIsNone(self.source.deadline)
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        self.device.read.return_value = [
+            evdev.events.InputEvent(1, 0, ev_key, 300, 1),
+            evdev.events.InputEvent(1, 3000, ev_key, 300, 0),
+        ]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [('Baz', True)]
+        )
+        # pylint: disable=protected-access
+        self.assertSetEqual(self.source._held_back, {(ev_key, 300)})
+        self.assertEqual(self.source.deadline, 1.01)
+        self.assertListEqual(self.source.settle(1.005), [])
+        source = evmapy.source.Source(
+            self.device, state=self.source.export_state()
+        )
+        self.assertEqual(source.deadline, 1.01)
+        actions = source.settle(1.01)
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [('Baz', False)]
+        )
+        self.assertSetEqual(source._held_back, set())
+        self.assertIsNone(source.deadline)
+        self.assertListEqual(source.settle(1.02), [])
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_relative(self, fake_config_load):
+        """
+        Check if Source sums up the movement of relative axes per frame
+        and translates every threshold crossed into a momentary event
+        """
+        config = dict(tests.util.FAKE_CONFIG)
+        config['axes'] = []
+        config['buttons'] = [{'name': 'Seven', 'code': 8}]
+        config['relative_axes'] = [
+            {'name': 'Wheel', 'code': 8, 'threshold': 120},
+            {'name': 'Dial', 'code': 7},
+        ]
+        config['actions'] = [
+            {
+                'trigger':  trigger,
+                'type':     'exec',
+                'target':   trigger,
+            }
+            for trigger in ('Wheel:+', 'Wheel:-', 'Dial:+', 'Seven')
+        ]
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        self.source.load_config()
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        ev_rel = evdev.ecodes.ecodes['EV_REL']
+        ev_syn = evdev.ecodes.ecodes['EV_SYN']
+        syn_report = (ev_syn, evdev.ecodes.ecodes['SYN_REPORT'], 0)
+        event_list = [
+            # Movement below the threshold
+            (ev_rel, 8, 60),
+            (ev_rel, 8, 30),
+            syn_report,
+            # Accumulated movement crossing the threshold
+            (ev_rel, 8, 60),
+            syn_report,
+            # Movement in the other direction discards the remainder
+            (ev_rel, 8, -120),
+            syn_report,
+            # Several thresholds crossed in a single frame
+            (ev_rel, 7, 1),
+            (ev_rel, 7, 1),
+            (ev_rel, 7, 1),
+            syn_report,
+            # Movement cancelled out within a frame
+            (ev_rel, 7, 1),
+            (ev_rel, 7, -1),
+            syn_report,
+            # Unconfigured relative axis and a button with the same code
+            # as a configured relative axis
+            (ev_rel, 9, 5),
+            (ev_key, 8, 1),
+            (ev_rel, 7, 1),
+            syn_report,
+            # Incomplete frame
+            (ev_rel, 8, 120),
+            (ev_syn, evdev.ecodes.ecodes['SYN_DROPPED'], 0),
+            syn_report,
+        ]
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, etype, ecode, evalue)
+            for (etype, ecode, evalue) in event_list
+        ]
+        self.device.active_keys.return_value = [8]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [
+                ('Wheel:+', True),
+                ('Wheel:+', False),
+                ('Wheel:-', True),
+                ('Wheel:-', False),
+            ] + [
+                ('Dial:+', True),
+                ('Dial:+', False),
+            ] * 3 + [
+                ('Seven', True),
+                ('Dial:+', True),
+                ('Dial:+', False),
+            ]
+        )
+
+    @unittest.mock.patch('os.write')
+    @unittest.mock.patch('evdev.UInput.from_device')
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_passthrough(self, *args):
+        """
+        Check if Source forwards whole frames of events which do not
+        trigger any action to the passthrough device, never leaving
+        forwarded keys stuck
+        """
+        (fake_config_load, fake_from_device, fake_write) = args
+        fake_from_device.return_value.fd = 99
+        config = dict(tests.util.FAKE_CONFIG)
+        config['grab'] = True
+        config['passthrough'] = True
+        config['axes'] = []
+        config['buttons'] = [
+            {'name': 'Bar', 'code': 200},
+            {'name': 'Baz', 'code': 300},
+            {'name': 'Qux', 'code': 400},
+        ]
+        config['relative_axes'] = [{'name': 'Wheel', 'code': 8}]
+        config['actions'] = [
+            {'trigger': 'Bar', 'type': 'exec', 'target': 'bar'},
+            {'trigger': 'Qux', 'type': 'layer', 'target': 'fn'},
+            {'trigger': 'Wheel:+', 'type': 'exec', 'target': 'wheel'},
+        ]
+        config['layers'] = {
+            'fn': [{'trigger': 'Baz', 'type': 'exec', 'target': 'baz'}],
+        }
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        self.source.load_config()
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        ev_msc = evdev.ecodes.ecodes['EV_MSC']
+        ev_rel = evdev.ecodes.ecodes['EV_REL']
+        ev_syn = evdev.ecodes.ecodes['EV_SYN']
+        syn_report = (ev_syn, evdev.ecodes.ecodes['SYN_REPORT'], 0)
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, etype, code, value)
+            for (etype, code, value) in (
+                # Unmapped events are forwarded, mapped ones are not
+                (ev_key, 300, 1),
+                (ev_key, 200, 1),
+                (ev_msc, 4, 30),
+                (ev_rel, 8, 1),
+                syn_report,
+                # Autorepeat is left to the passthrough device
+                (ev_key, 300, 2),
+                (ev_key, 200, 0),
+                syn_report,
+                # Releases of forwarded keys are forwarded even if the
+                # key triggers an action in the current layer
+                (ev_key, 400, 1),
+                syn_report,
+                (ev_key, 300, 0),
+                syn_report,
+                (ev_key, 300, 1),
+                (ev_key, 400, 0),
+                syn_report,
+                # Lost releases of forwarded keys are synthesized
+                (ev_key, 500, 1),
+                syn_report,
+                (ev_syn, evdev.ecodes.ecodes['SYN_DROPPED'], 0),
+                (ev_key, 500, 0),
+                syn_report,
+            )
+        ]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [
+                ('bar', True),
+                ('wheel', True),
+                ('wheel', False),
+                ('bar', False),
+                ('baz', True),
+                ('baz', False),
+            ]
+        )
+        written = []
+        for call in fake_write.call_args_list:
+            (fdesc, data) = call[0]
+            self.assertEqual(fdesc, 99)
+            written.append([
+                event[2:]
+                for event in evmapy.source._INPUT_EVENT.iter_unpack(data)
+            ])
+        self.assertListEqual(written, [
+            [(ev_key, 300, 1), (ev_msc, 4, 30), syn_report],
+            [(ev_key, 300, 0), syn_report],
+            [(ev_key, 500, 1), syn_report],
+            # Unmapped releases are forwarded even if the key was
+            # pressed while it triggered an action
+            [(ev_key, 300, 0), (ev_key, 500, 0), syn_report],
+        ])
+
+    @unittest.mock.patch('evdev.UInput.from_device')
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_passthrough_setup(self, *args):
+        """
+        Check if Source creates and destroys the passthrough device as
+        requested by its configuration and if a Source created using
+        state exported by another one keeps using its passthrough device
+        """
+        (fake_config_load, fake_from_device) = args
+        config = dict(tests.util.FAKE_CONFIG)
+        config['grab'] = True
+        config['passthrough'] = True
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        fake_from_device.side_effect = evdev.uinput.UInputError()
+        self.source.load_config()
+        self.assertEqual(self.logger.warning.call_count, 1)
+        fake_from_device.side_effect = None
+        self.source.load_config()
+        self.source.subscribe({'Bar': {'type': 'edge', 'bit': 0}})
+        # pylint: disable=protected-access
+        self.source._forwarded.add(300)
+        source = evmapy.source.Source(
+            self.device, state=self.source.export_state(),
+            passthrough=self.source.passthrough
+        )
+        # The passthrough device is taken over rather than recreated
+        self.assertEqual(fake_from_device.call_count, 2)
+        self.assertIs(source.passthrough, fake_from_device.return_value)
+        self.assertSetEqual(source._forwarded, {300})
+        config['passthrough'] = False
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        source.load_config()
+        source.cleanup()
+        fake_from_device.return_value.close.assert_called_once_with()
+
+    def test_source_subscribe(self):
+        """
+        Check if Source reports state changes of events it is subscribed
+        to, along with the actions they trigger
+        """
+        edge = {'type': 'edge', 'bit': 0}
+        self.source.subscribe({'Bar': edge, 'Foo:min': edge})
+        self.assertListEqual(self.source.edges, [edge, edge])
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, ev_key, 200, value)
+            for value in (1, 0)
+        ]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['type'], direction) for (action, direction) in actions],
+            [('key', True), ('edge', True), ('key', False), ('edge', False)]
+        )
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_layers(self, fake_config_load):
+        """
+        Check if Source switches between momentary and toggled layers,
+        stopping actions which are no longer reachable
+        """
+        config = dict(tests.util.FAKE_CONFIG)
+        config['actions'] = [
+            {'trigger': 'Bar', 'type': 'layer', 'target': 'fn'},
+            {'trigger': 'Foobaz', 'type': 'layer', 'target': 'alt',
+             'toggle': True},
+            {'trigger': 'Foobar', 'type': 'key', 'target': 'KEY_A'},
+            {'trigger': 'Foo', 'type': 'mouse', 'target': 'REL_X'},
+        ]
+        config['layers'] = {
+            'fn': [
+                {'trigger': 'Foobar', 'type': 'key', 'target': 'KEY_B'},
+            ],
+            'alt': [
+                {'trigger': 'Foo:min', 'type': 'exec', 'target': 'foo'},
+            ],
+        }
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        self.source.load_config()
+        ev_abs = evdev.ecodes.ecodes['EV_ABS']
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, etype, code, value)
+            for (etype, code, value) in (
+                (ev_key, 201, 1),
+                (ev_key, 200, 1),
+                (ev_key, 201, 0),
+                (ev_key, 201, 1),
+                (ev_key, 201, 0),
+                (ev_key, 200, 0),
+                (ev_abs, 100, 0),
+                (ev_key, 202, 1),
+                (ev_key, 202, 0),
+                (ev_abs, 100, 128),
+                (ev_abs, 100, 0),
+                (ev_key, 202, 1),
+            )
+        ]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [
+                ('KEY_A', True),
+                ('KEY_A', False),
+                ('KEY_B', True),
+                ('KEY_B', False),
+                ('REL_X', -1000),
+                ('REL_X', 0),
+                ('foo', True),
+                ('foo', False),
+            ]
+        )
+        self.assertIn(
+            evdev.ecodes.KEY_B,
+            self.source.capabilities[evdev.ecodes.EV_KEY]
+        )
+        # Actions of all layers are listed once
+        self.assertListEqual(
+            sorted(
+                evmapy.util.as_list(action['target'])[0]
+                for action in self.source.actions
+            ),
+            ['KEY_A', 'KEY_B', 'REL_X', 'alt', 'fn', 'foo']
+        )
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_layers_shadowed(self, fake_config_load):
+        """
+        Check if actions shadowed by a layer forget triggers released
+        while that layer was active
+        """
+        config = dict(tests.util.FAKE_CONFIG)
+        config['actions'] = [
+            {'trigger': 'Bar', 'type': 'layer', 'target': 'fn'},
+            {'trigger': ['Foobar', 'Foobaz'], 'type': 'key',
+             'target': 'KEY_ESC'},
+        ]
+        config['layers'] = {
+            'fn': [
+                {'trigger': 'Foobar', 'type': 'key', 'target': 'KEY_B'},
+            ],
+        }
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        self.source.load_config()
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, ev_key, code, value)
+            for (code, value) in (
+                (201, 1),
+                (200, 1),
+                (201, 0),
+                (200, 0),
+                (202, 1),
+                (201, 1),
+            )
+        ]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [('KEY_ESC', True)]
+        )
+
+    @unittest.mock.patch('evmapy.config.load')
+    def test_source_layers_sweep(self, fake_config_load):
+        """
+        Check if running sequence and "any" actions are stopped when a
+        layer shadowing them gets activated and if releasing a momentary
+        layer switch does nothing when another layer is active
+        """
+        config = dict(tests.util.FAKE_CONFIG)
+        config['actions'] = [
+            {'trigger': 'Bar', 'type': 'layer', 'target': 'fn'},
+            {'trigger': 'Barbar:max', 'type': 'layer', 'target': 'alt',
+             'toggle': True},
+            {'trigger': ['Foobar', 'Foobaz'], 'mode': 'sequence',
+             'type': 'exec', 'target': 'sequence'},
+            {'trigger': ['Baz'], 'mode': 'any', 'type': 'exec',
+             'target': 'any'},
+        ]
+        config['layers'] = {
+            'fn': [
+                {'trigger': ['Foobaz', 'Baz'], 'mode': 'any',
+                 'type': 'exec', 'target': 'fn'},
+            ],
+            'alt': [],
+        }
+        fake_config_load.return_value = (evmapy.config.parse(config), None)
+        self.source.load_config()
+        ev_abs = evdev.ecodes.ecodes['EV_ABS']
+        ev_key = evdev.ecodes.ecodes['EV_KEY']
+        self.device.read.return_value = [
+            evdev.events.InputEvent(0, 0, etype, code, value)
+            for (etype, code, value) in (
+                (ev_key, 201, 1),
+                (ev_key, 201, 0),
+                (ev_key, 202, 1),
+                (ev_key, 300, 1),
+                (ev_key, 200, 1),
+                (ev_abs, 102, 255),
+                (ev_key, 200, 0),
+            )
+        ]
+        actions = self.source.process()
+        self.assertListEqual(
+            [(action['target'], value) for (action, value) in actions],
+            [
+                ('sequence', True),
+                ('any', True),
+                ('sequence', False),
+                ('any', False),
+            ]
+        )
+        # pylint: disable=protected-access
+        self.assertEqual(self.source._config['layer'], 'alt')
@@ -0,0 +1,89 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Unit tests for the sysfs module
+"""
+
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+import evmapy.sysfs
+
+
+def create_fake_device(root, node, attributes):
+    """
+    Create a fake sysfs directory for the given event node
+    """
+    device_dir = os.path.join(root, node, 'device')
+    for (attribute, value) in attributes.items():
+        path = os.path.join(device_dir, attribute)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as attribute_file:
+            attribute_file.write(value + '\n')
+
+
+class TestSysfs(unittest.TestCase):
+
+    """
+    Test all functions
+    """
+
+    def test_sysfs_list_devices(self):
+        """
+        Test list_devices() with sysfs available
+        """
+        with tempfile.TemporaryDirectory() as root:
+            create_fake_device(root, 'event10', {
+                'name':         'Foo Bar',
+                'phys':         'usb-0000:00:1d.0-1/input0',
+                'id/vendor':    '046d',
+                'id/product':   'c219',
+            })
+            create_fake_device(root, 'event2', {
+                'name':         'Baz',
+            })
+            with unittest.mock.patch('evmapy.sysfs.SYSFS_INPUT_DIR', root):
+                devices = evmapy.sysfs.list_devices()
+        self.assertListEqual(
+            [(d['path'], d['name']) for d in devices],
+            [('/dev/input/event2', 'Baz'), ('/dev/input/event10', 'Foo Bar')]
+        )
+        self.assertEqual(devices[1]['vendor'], 0x046d)
+        self.assertEqual(devices[1]['product'], 0xc219)
+        self.assertEqual(devices[1]['version'], 0)
+        self.assertEqual(devices[1]['uniq'], '')
+
+    @unittest.mock.patch('evdev.InputDevice')
+    @unittest.mock.patch('evdev.list_devices')
+    def test_sysfs_list_devices_fallback(self, fake_list, fake_device):
+        """
+        Test list_devices() without sysfs available
+        """
+        fake_list.return_value = ['/dev/input/event1', '/dev/input/event0']
+        fake_device.return_value.name = 'Foo Bar'
+        with unittest.mock.patch('evmapy.sysfs.SYSFS_INPUT_DIR', '/foo/bar'):
+            devices = evmapy.sysfs.list_devices()
+        self.assertListEqual(
+            [d['path'] for d in devices],
+            ['/dev/input/event0', '/dev/input/event1']
+        )
+        self.assertEqual(fake_device.return_value.close.call_count, 2)
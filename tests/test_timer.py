@@ -0,0 +1,92 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+
+"""
+Unit tests for the timer module
+"""
+
+import unittest
+
+import evmapy.timer
+
+
+class TestTimerQueue(unittest.TestCase):
+
+    """
+    Test TimerQueue
+    """
+
+    def setUp(self):
+        """
+        Create a TimerQueue to use with all tests
+        """
+        self.timers = evmapy.timer.TimerQueue()
+
+    def test_timer_empty(self):
+        """
+        Check behavior when no timer is armed
+        """
+        self.assertIsNone(self.timers.next_deadline())
+        self.assertListEqual(self.timers.pop_due(100.0), [])
+        self.assertFalse(self.timers.cancel('foo'))
+
+    def test_timer_order(self):
+        """
+        Check if timers fire in the order of their deadlines and only
+        once they are due
+        """
+        self.timers.schedule('foo', 3.0, 'foo')
+        self.timers.schedule('bar', 1.0, 'bar')
+        self.timers.schedule('baz', 1.0, 'baz')
+        self.assertEqual(len(self.timers), 3)
+        self.assertListEqual(sorted(self.timers), ['bar', 'baz', 'foo'])
+        self.assertEqual(self.timers.next_deadline(), 1.0)
+        self.assertListEqual(
+            self.timers.pop_due(2.0), [(1.0, 'bar'), (1.0, 'baz')]
+        )
+        self.assertNotIn('bar', self.timers)
+        self.assertIn('foo', self.timers)
+        self.assertEqual(self.timers.next_deadline(), 3.0)
+
+    def test_timer_replace(self):
+        """
+        Check if arming an already armed timer replaces it
+        """
+        self.timers.schedule('foo', 1.0, 'old')
+        self.timers.schedule('foo', 2.0, 'new')
+        self.assertEqual(len(self.timers), 1)
+        self.assertEqual(self.timers.get('foo'), 'new')
+        self.assertIsNone(self.timers.get('bar'))
+        self.assertEqual(self.timers.next_deadline(), 2.0)
+        self.assertListEqual(self.timers.pop_due(2.0), [(2.0, 'new')])
+
+    def test_timer_cancel(self):
+        """
+        Check if cancelled timers never fire
+        """
+        self.timers.schedule('foo', 1.0, 'foo')
+        self.timers.schedule('bar', 2.0, 'bar')
+        self.assertTrue(self.timers.cancel('foo'))
+        self.assertFalse(self.timers.cancel('foo'))
+        self.assertEqual(self.timers.next_deadline(), 2.0)
+        self.timers.schedule('baz', 1.0, 'baz')
+        self.timers.cancel('baz')
+        self.assertListEqual(self.timers.pop_due(3.0), [(2.0, 'bar')])
+        self.assertEqual(len(self.timers), 0)
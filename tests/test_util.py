@@ -63,3 +63,19 @@ class TestUtil(unittest.TestCase):
         self.assertIsInstance(info['version'], str)
         self.assertIsInstance(info['user'], pwd.struct_passwd)
         self.assertIsInstance(info['config_dir'], str)
+        self.assertIsInstance(info['control_socket'], str)
+
+    @unittest.mock.patch('pwd.getpwuid')
+    def test_util_app_info_cached(self, fake_getpwuid):
+        """
+        Check if get_app_info() only looks up the user database once
+        and protects the cached information from being modified
+        """
+        fake_getpwuid.return_value.pw_dir = '/foo'
+        with unittest.mock.patch.dict('evmapy.util._APP_INFO', clear=True):
+            info = evmapy.util.get_app_info()
+            info['config_dir'] = '/bar'
+            info = evmapy.util.get_app_info()
+        self.assertEqual(fake_getpwuid.call_count, 1)
+        self.assertEqual(info['config_dir'], '/foo/.evmapy')
+        self.assertEqual(info['control_socket'], '/foo/.evmapy/evmapy.socket')
@@ -0,0 +1,98 @@
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Regenerate evmapy/ecodes.py from the event code table of the installed
+evdev version, e.g. after upgrading evdev in order to make new event
+code names usable in configuration files.
+
+Usage: python tools/generate_ecodes.py
+"""
+
+import os
+
+import evdev
+
+
+HEADER = '''\
+#
+# Copyright (C) 2015 Michał Kępień <github@kempniu.pl>
+#
+# This file is part of evmapy.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA
+
+"""
+Precomputed table mapping input event code names to their numeric
+values, allowing configuration to be validated without importing
+:py:mod:`evdev`, whose own tables take a long time to load.  Generated
+from :py:data:`evdev.ecodes.ecodes` by ``tools/generate_ecodes.py``,
+which has to be rerun for names added by newer evdev versions to be
+accepted.
+"""
+
+'''
+
+
+def render(ecodes):
+    """
+    Return the source code of a module defining the given event code
+    table, with names grouped by their prefixes and sorted by value
+    within each group.
+
+    :param ecodes: dictionary mapping event code names to their numeric
+        values
+    :type ecodes: dict
+    :returns: module source code
+    :rtype: str
+    """
+    items = sorted(ecodes.items(),
+                   key=lambda item: (item[0].split('_')[0], item[1]))
+    lines = ["    '%s': %d," % (name, code) for (name, code) in items]
+    return HEADER + 'ECODES = {\n' + '\n'.join(lines) + '\n}\n'
+
+
+def main():
+    """
+    Overwrite evmapy/ecodes.py with a table generated from
+    :py:data:`evdev.ecodes.ecodes`.
+
+    :returns: None
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = os.path.join(root, 'evmapy', 'ecodes.py')
+    with open(path, 'w', encoding='utf-8') as ecodes_file:
+        ecodes_file.write(render(evdev.ecodes.ecodes))
+    print("%s: %d event codes" % (path, len(evdev.ecodes.ecodes)))
+
+
+if __name__ == '__main__':
+    main()